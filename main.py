@@ -14,6 +14,9 @@ from src.config import config
 from src.logger import get_logger
 from src.bot import bot
 from src.vacancy_checker import checker
+from src.vacancy_api import vacancy_api
+from src.async_database import adb
+from src.database import db
 
 logger = get_logger(__name__)
 
@@ -71,6 +74,11 @@ async def main_async():
             pass  # Ignore errors during shutdown
         
         logger.info("Services stopped successfully")
+    finally:
+        # Release pooled upstream and database connections
+        await vacancy_api.aclose()
+        await adb.close()
+        db.close()
 
 
 def main():
@@ -92,6 +100,8 @@ def main():
         logger.info("Initializing database...")
         from src.database import db
         db.init_database()
+        # Everything after startup runs on the async pool; free the sync connections
+        db.close()
         
         # Start both bot and checker
         logger.info("Starting Telegram bot and vacancy checker...")
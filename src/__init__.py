@@ -7,10 +7,12 @@ __version__ = "1.0.0"
 
 from .config import config
 from .database import db
+from .async_database import adb
 from .logger import get_logger
 from .bot import bot
 from .vacancy_checker import checker
 from .vacancy_api import vacancy_api
 from .vacancy_parser import VacancyParser
+from .models import IndexInfo, ClassSession
 
-__all__ = ['config', 'db', 'get_logger', 'bot', 'checker', 'vacancy_api', 'VacancyParser']
+__all__ = ['config', 'db', 'adb', 'get_logger', 'bot', 'checker', 'vacancy_api', 'VacancyParser', 'IndexInfo', 'ClassSession']
@@ -0,0 +1,1125 @@
+"""
+Async Database Module
+Native asyncio PostgreSQL access for the bot handlers and the vacancy checker
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date
+import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from .config import config
+from .database import (
+    HISTORY_DEFAULT_MONTHS_QUERY,
+    HISTORY_PARTITIONS_QUERY,
+    SUBSCRIPTION_BATCH_SIZE,
+    _add_months,
+    _expired_history_partitions,
+    _history_expiry_statement,
+    _history_partition_months,
+    _history_partition_statements,
+    _log_history_maintenance,
+    _missing_history_months,
+    _subscription_group
+)
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class AsyncDatabase:
+    """
+    Async database class implementing the Singleton pattern.
+    Mirrors the runtime methods of Database (psycopg2) on psycopg 3, so
+    queries are awaited instead of blocking the event loop. It has its own
+    connection pool; the sync Database stays for scripts like setup_database.py.
+    
+    Attributes:
+        conninfo (str): libpq connection string
+    """
+    
+    _instance = None
+    
+    def __new__(cls):
+        """Singleton pattern implementation"""
+        if cls._instance is None:
+            cls._instance = super(AsyncDatabase, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+    
+    def __init__(self):
+        """Initialize async database connection settings"""
+        if self._initialized:
+            return
+        
+        db_config = config.get_db_config()
+        self.conninfo = make_conninfo(
+            host=db_config['host'],
+            port=db_config['port'],
+            dbname=db_config['database'],
+            user=db_config['user'],
+            password=db_config['password']
+        )
+        
+        # Connection pool, opened on first use
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+        self._initialized = True
+        logger.info("Async database instance initialized")
+    
+    async def _get_pool(self):
+        """
+        Get the connection pool, opening it on first use.
+        
+        Returns:
+            psycopg_pool.AsyncConnectionPool: Shared connection pool
+        """
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    db_pool = AsyncConnectionPool(
+                        self.conninfo,
+                        min_size=config.DB_POOL_MIN_SIZE,
+                        max_size=config.DB_POOL_MAX_SIZE,
+                        timeout=config.DB_POOL_TIMEOUT,
+                        check=AsyncConnectionPool.check_connection,
+                        open=False
+                    )
+                    await db_pool.open()
+                    self._pool = db_pool
+                    logger.info(
+                        f"Async database pool opened (min={config.DB_POOL_MIN_SIZE}, "
+                        f"max={config.DB_POOL_MAX_SIZE})"
+                    )
+        return self._pool
+    
+    @asynccontextmanager
+    async def get_connection(self):
+        """
+        Async context manager for pooled database connections.
+        Commits on success, rolls back on error and returns the connection to the pool.
+        
+        Yields:
+            psycopg.AsyncConnection: Database connection object
+        
+        Raises:
+            psycopg.Error: If database connection or operation fails
+            psycopg_pool.PoolTimeout: If no connection became free in time
+        """
+        db_pool = await self._get_pool()
+        try:
+            async with db_pool.connection() as conn:
+                yield conn
+        except psycopg.Error as e:
+            logger.error(f"Database error: {e}")
+            raise
+    
+    def get_pool_stats(self):
+        """
+        Get connection pool statistics.
+        
+        Returns:
+            dict: Pool size, utilisation, checkout wait times and error counters
+        """
+        if self._pool is None:
+            return {'max_size': config.DB_POOL_MAX_SIZE, 'in_use': 0, 'utilisation': 0.0}
+        
+        stats = self._pool.get_stats()
+        in_use = stats.get('pool_size', 0) - stats.get('pool_available', 0)
+        requests = stats.get('requests_num', 0)
+        return {
+            'max_size': config.DB_POOL_MAX_SIZE,
+            'size': stats.get('pool_size', 0),
+            'in_use': in_use,
+            'utilisation': in_use / config.DB_POOL_MAX_SIZE,
+            'checkouts': requests,
+            'waiting': stats.get('requests_waiting', 0),
+            'wait_time_avg': stats.get('requests_wait_ms', 0) / 1000 / requests if requests else 0.0,
+            'timeouts': stats.get('requests_errors', 0),
+            'discarded': stats.get('connections_lost', 0)
+        }
+    
+    async def close(self):
+        """Close every pooled connection"""
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+            logger.info("Async database pool closed")
+    
+    # User operations
+    async def add_user(self, telegram_id, username):
+        """
+        Add or update a user in the database.
+        
+        Args:
+            telegram_id (int): Telegram user ID
+            username (str): Telegram username
+        
+        Returns:
+            bool: True if successful
+        """
+        try:
+            async with self.get_connection() as conn:
+                await conn.execute("""
+                    INSERT INTO users (telegram_id, username)
+                    VALUES (%s, %s)
+                    ON CONFLICT (telegram_id)
+                    DO UPDATE SET
+                        username = EXCLUDED.username,
+                        updated_at = CURRENT_TIMESTAMP,
+                        is_active = TRUE
+                """, (telegram_id, username))
+                logger.info(f"User {telegram_id} ({username}) added/updated successfully")
+                return True
+        except Exception as e:
+            logger.error(f"Failed to add/update user {telegram_id}: {e}")
+            raise
+    
+    async def get_user(self, telegram_id):
+        """
+        Get user by telegram ID.
+        
+        Args:
+            telegram_id (int): Telegram user ID
+        
+        Returns:
+            dict: User data, or None if not found
+        """
+        try:
+            async with self.get_connection() as conn:
+                cursor = conn.cursor(row_factory=dict_row)
+                await cursor.execute("""
+                    SELECT * FROM users WHERE telegram_id = %s AND is_active = TRUE
+                """, (telegram_id,))
+                return await cursor.fetchone()
+        except Exception as e:
+            logger.error(f"Failed to get user {telegram_id}: {e}")
+            return None
+    
+    async def deactivate_user(self, telegram_id):
+        """
+        Deactivate a user (soft delete).
+        Also deactivates all their alerts.
+        
+        Args:
+            telegram_id (int): Telegram user ID
+        
+        Returns:
+            bool: True if user was deactivated
+        """
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute("""
+                    UPDATE users SET is_active = FALSE WHERE telegram_id = %s
+                """, (telegram_id,))
+                affected = cursor.rowcount
+                
+                if affected > 0:
+                    logger.info(f"User {telegram_id} deactivated")
+                return affected > 0
+        except Exception as e:
+            logger.error(f"Failed to deactivate user {telegram_id}: {e}")
+            raise
+    
+    async def delete_user(self, telegram_id):
+        """
+        Completely delete a user and all their data from the database.
+        This will cascade delete all alerts and notification records.
+        
+        Args:
+            telegram_id (int): Telegram user ID
+        
+        Returns:
+            bool: True if user was deleted
+        """
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute("""
+                    DELETE FROM users WHERE telegram_id = %s
+                """, (telegram_id,))
+                affected = cursor.rowcount
+                
+                if affected > 0:
+                    logger.info(f"User {telegram_id} and all associated data deleted")
+                return affected > 0
+        except Exception as e:
+            logger.error(f"Failed to delete user {telegram_id}: {e}")
+            raise
+    
+    async def pause_user(self, telegram_id, duration_minutes=20):
+        """
+        Pause alert checking for a user temporarily.
+        
+        Args:
+            telegram_id (int): Telegram user ID
+            duration_minutes (int): Duration to pause in minutes (default: 20)
+        
+        Returns:
+            bool: True if user was paused
+        """
+        try:
+            async with self.get_connection() as conn:
+                # Parameters are bound server-side, so build the interval with make_interval
+                cursor = await conn.execute("""
+                    UPDATE users
+                    SET is_paused = TRUE,
+                        paused_until = CURRENT_TIMESTAMP + make_interval(mins => %s),
+                        pause_reason = 'manual',
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE telegram_id = %s
+                """, (duration_minutes, telegram_id))
+                affected = cursor.rowcount
+                
+                if affected > 0:
+                    logger.info(f"User {telegram_id} paused for {duration_minutes} minutes")
+                return affected > 0
+        except Exception as e:
+            logger.error(f"Failed to pause user {telegram_id}: {e}")
+            raise
+    
+    async def resume_user(self, telegram_id):
+        """
+        Resume alert checking for a paused user.
+        
+        Args:
+            telegram_id (int): Telegram user ID
+        
+        Returns:
+            bool: True if user was resumed
+        """
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute("""
+                    UPDATE users
+                    SET is_paused = FALSE,
+                        paused_until = NULL,
+                        pause_reason = NULL,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE telegram_id = %s
+                """, (telegram_id,))
+                affected = cursor.rowcount
+                
+                if affected > 0:
+                    logger.info(f"User {telegram_id} resumed")
+                return affected > 0
+        except Exception as e:
+            logger.error(f"Failed to resume user {telegram_id}: {e}")
+            raise
+    
+    async def stop_user(self, telegram_id):
+        """
+        Stop all alerts for a user permanently.
+        Pauses the user indefinitely and deactivates all alerts.
+        
+        Args:
+            telegram_id (int): Telegram user ID
+        
+        Returns:
+            bool: True if user was stopped
+        """
+        try:
+            async with self.get_connection() as conn:
+                # Pause user indefinitely
+                await conn.execute("""
+                    UPDATE users
+                    SET is_paused = TRUE,
+                        paused_until = NULL,
+                        pause_reason = 'stopped',
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE telegram_id = %s
+                """, (telegram_id,))
+                
+                # Deactivate all alerts
+                cursor = await conn.execute("""
+                    UPDATE alerts
+                    SET is_active = FALSE
+                    WHERE telegram_id = %s
+                """, (telegram_id,))
+                
+                alerts_affected = cursor.rowcount
+                
+                logger.info(f"User {telegram_id} stopped ({alerts_affected} alerts deactivated)")
+                return True
+        except Exception as e:
+            logger.error(f"Failed to stop user {telegram_id}: {e}")
+            raise
+    
+    async def check_user_pause_status(self, telegram_id):
+        """
+        Check if a user is paused and auto-resume if pause period expired.
+        
+        Args:
+            telegram_id (int): Telegram user ID
+        
+        Returns:
+            dict: Pause status with keys 'is_paused', 'paused_until', 'pause_reason'
+        """
+        try:
+            async with self.get_connection() as conn:
+                cursor = conn.cursor(row_factory=dict_row)
+                await cursor.execute("""
+                    SELECT is_paused, paused_until, pause_reason
+                    FROM users
+                    WHERE telegram_id = %s
+                """, (telegram_id,))
+                
+                result = await cursor.fetchone()
+                if not result:
+                    return {'is_paused': False, 'paused_until': None, 'pause_reason': None}
+                
+                # Auto-resume if pause period expired
+                if result['is_paused'] and result['paused_until'] and result['pause_reason'] == 'manual':
+                    await cursor.execute("""
+                        UPDATE users
+                        SET is_paused = FALSE,
+                            paused_until = NULL,
+                            pause_reason = NULL,
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE telegram_id = %s
+                        AND paused_until < CURRENT_TIMESTAMP
+                        RETURNING is_paused
+                    """, (telegram_id,))
+                    
+                    updated = await cursor.fetchone()
+                    if updated:
+                        logger.info(f"User {telegram_id} auto-resumed after pause expiry")
+                        result['is_paused'] = False
+                        result['paused_until'] = None
+                        result['pause_reason'] = None
+                
+                return result
+        except Exception as e:
+            logger.error(f"Failed to check pause status for {telegram_id}: {e}")
+            return {'is_paused': False, 'paused_until': None, 'pause_reason': None}
+    
+    # Alert operations
+    async def add_alert(self, telegram_id, course_code, index_number, academic_year=None, semester=None):
+        """
+        Add a new alert for a user.
+        If academic_year and semester are not provided, uses the configured defaults.
+        
+        Args:
+            telegram_id (int): Telegram user ID
+            course_code (str): Course code (e.g., 'SC2103')
+            index_number (str): Index number (e.g., '10272')
+            academic_year (str, optional): Academic year
+            semester (str, optional): Semester
+        
+        Returns:
+            int: Alert ID if created, None if already exists
+        """
+        if academic_year is None:
+            academic_year = config.DEFAULT_ACADEMIC_YEAR
+            logger.debug(f"Using academic year: {academic_year}")
+        if semester is None:
+            semester = config.DEFAULT_SEMESTER
+            logger.debug(f"Using semester: {semester}")
+        
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute("""
+                    INSERT INTO alerts (telegram_id, course_code, index_number, academic_year, semester)
+                    VALUES (%s, %s, %s, %s, %s)
+                    RETURNING id
+                """, (telegram_id, course_code.upper(), index_number, academic_year, semester))
+                alert_id = (await cursor.fetchone())[0]
+                logger.info(f"Alert created: ID={alert_id}, User={telegram_id}, Course={course_code}, Index={index_number}")
+                return alert_id
+        except psycopg.IntegrityError:
+            # Alert already exists
+            logger.warning(f"Alert already exists: User={telegram_id}, Course={course_code}, Index={index_number}")
+            return None
+        except Exception as e:
+            logger.error(f"Failed to create alert: {e}")
+            raise
+    
+    async def get_user_alerts(self, telegram_id):
+        """
+        Get all active alerts for a user.
+        
+        Args:
+            telegram_id (int): Telegram user ID
+        
+        Returns:
+            list: List of alert dictionaries
+        """
+        try:
+            async with self.get_connection() as conn:
+                cursor = conn.cursor(row_factory=dict_row)
+                await cursor.execute("""
+                    SELECT * FROM alerts
+                    WHERE telegram_id = %s AND is_active = TRUE
+                    ORDER BY created_at DESC
+                """, (telegram_id,))
+                return await cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Failed to get alerts for user {telegram_id}: {e}")
+            return []
+    
+    async def get_all_active_alerts(self):
+        """
+        Get all active alerts.
+        Excludes alerts for paused users.
+        
+        Returns:
+            list: List of alert dictionaries
+        """
+        try:
+            async with self.get_connection() as conn:
+                cursor = conn.cursor(row_factory=dict_row)
+                await cursor.execute("""
+                    SELECT
+                        a.id, a.telegram_id, a.course_code, a.index_number,
+                        a.academic_year, a.semester, a.last_vacancy_count
+                    FROM alerts a
+                    JOIN users u ON a.telegram_id = u.telegram_id
+                    WHERE a.is_active = TRUE
+                    AND u.is_active = TRUE
+                    AND (
+                        u.is_paused = FALSE
+                        OR (u.is_paused = TRUE AND u.paused_until IS NOT NULL AND u.paused_until < CURRENT_TIMESTAMP)
+                    )
+                    ORDER BY a.last_checked ASC NULLS FIRST
+                """)
+                return await cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Failed to get all active alerts: {e}")
+            return []
+    
+    async def get_subscription_groups(self):
+        """
+        Get active alerts pre-grouped by course/index.
+        Aggregated in SQL and streamed through a server-side cursor, so one
+        row is transferred per course/index instead of one per alert.
+        Excludes alerts for paused users.
+        
+        Returns:
+            list: Work units ordered by course, each a dict with 'course_code',
+                  'index_number' and 'alerts' (alert dicts with 'id', 'telegram_id',
+                  'course_code', 'index_number' and 'last_vacancy_count')
+        """
+        try:
+            async with self.get_connection() as conn:
+                cursor = conn.cursor(name='subscription_groups')
+                cursor.itersize = SUBSCRIPTION_BATCH_SIZE
+                await cursor.execute("""
+                    SELECT
+                        a.course_code, a.index_number,
+                        array_agg(a.id ORDER BY a.id) AS alert_ids,
+                        array_agg(a.telegram_id ORDER BY a.id) AS telegram_ids,
+                        array_agg(a.last_vacancy_count ORDER BY a.id) AS last_vacancy_counts
+                    FROM alerts a
+                    JOIN users u ON a.telegram_id = u.telegram_id
+                    WHERE a.is_active = TRUE
+                    AND u.is_active = TRUE
+                    AND (
+                        u.is_paused = FALSE
+                        OR (u.is_paused = TRUE AND u.paused_until IS NOT NULL AND u.paused_until < CURRENT_TIMESTAMP)
+                    )
+                    GROUP BY a.course_code, a.index_number
+                    ORDER BY a.course_code, a.index_number
+                """)
+                return [_subscription_group(*row) async for row in cursor]
+        except Exception as e:
+            logger.error(f"Failed to get subscription groups: {e}")
+            return []
+    
+    async def get_subscriptions(self, alert_ids=None, telegram_ids=None):
+        """
+        Get active alerts of active users with their owner's pause state,
+        for loading the checker's in-memory subscription index.
+        Paused users are included so the index can apply pause expiry itself.
+        
+        Args:
+            alert_ids (list, optional): Only these alerts
+            telegram_ids (list, optional): Only alerts of these users
+                (with neither filter, every active alert is returned)
+        
+        Returns:
+            list: Alert dicts with 'id', 'telegram_id', 'course_code', 'index_number',
+                  'last_vacancy_count', 'is_paused' and 'pause_remaining'
+                  (seconds until the pause ends, None if it has no end)
+        
+        Raises:
+            psycopg.Error: If the query fails (an empty result means no subscriptions)
+        """
+        query = """
+            SELECT
+                a.id, a.telegram_id, a.course_code, a.index_number, a.last_vacancy_count,
+                u.is_paused,
+                EXTRACT(EPOCH FROM (u.paused_until - CURRENT_TIMESTAMP))::float AS pause_remaining
+            FROM alerts a
+            JOIN users u ON a.telegram_id = u.telegram_id
+            WHERE a.is_active = TRUE
+            AND u.is_active = TRUE
+        """
+        params = ()
+        if alert_ids is not None or telegram_ids is not None:
+            query += " AND (a.id = ANY(%s::integer[]) OR a.telegram_id = ANY(%s::bigint[]))"
+            params = (list(alert_ids or ()), list(telegram_ids or ()))
+        
+        try:
+            async with self.get_connection() as conn:
+                cursor = conn.cursor(name='subscriptions', row_factory=dict_row)
+                cursor.itersize = SUBSCRIPTION_BATCH_SIZE
+                await cursor.execute(query, params)
+                return [row async for row in cursor]
+        except Exception as e:
+            logger.error(f"Failed to get subscriptions: {e}")
+            raise
+    
+    async def remove_alert(self, alert_id, telegram_id):
+        """
+        Remove an alert (soft delete).
+        
+        Args:
+            alert_id (int): Alert ID
+            telegram_id (int): Telegram user ID (for verification)
+        
+        Returns:
+            bool: True if alert was removed
+        """
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute("""
+                    UPDATE alerts
+                    SET is_active = FALSE
+                    WHERE id = %s AND telegram_id = %s
+                """, (alert_id, telegram_id))
+                affected = cursor.rowcount
+                
+                if affected > 0:
+                    logger.info(f"Alert {alert_id} removed by user {telegram_id}")
+                return affected > 0
+        except Exception as e:
+            logger.error(f"Failed to remove alert {alert_id}: {e}")
+            raise
+    
+    async def _record_index_states(self, conn, states):
+        """
+        Store the latest counts of each course/index and log history rows
+        only for indexes whose vacancy or waitlist actually changed.
+        
+        Args:
+            conn (psycopg.AsyncConnection): Connection of the caller's transaction
+            states (dict): (course_code, index_number) -> (vacancy_count, waitlist_count)
+        
+        Returns:
+            int: Number of indexes that changed
+        """
+        if not states:
+            return 0
+        
+        course_codes, index_numbers, vacancy_counts, waitlist_counts = [], [], [], []
+        for (course_code, index_number), (vacancy_count, waitlist_count) in states.items():
+            course_codes.append(course_code)
+            index_numbers.append(index_number)
+            vacancy_counts.append(vacancy_count)
+            waitlist_counts.append(waitlist_count)
+        
+        # Same change-only upsert as Database, fed by arrays instead of a VALUES list
+        cursor = await conn.execute("""
+            WITH observed AS (
+                SELECT * FROM unnest(%s::varchar[], %s::varchar[], %s::integer[], %s::integer[])
+                    AS o(course_code, index_number, vacancy_count, waitlist_count)
+            ),
+            changed AS (
+                INSERT INTO index_state AS s (
+                    course_code, index_number, vacancy_count, waitlist_count, changed_at
+                )
+                SELECT course_code, index_number, vacancy_count, waitlist_count, CURRENT_TIMESTAMP
+                FROM observed
+                ON CONFLICT (course_code, index_number) DO UPDATE
+                SET vacancy_count = EXCLUDED.vacancy_count,
+                    waitlist_count = EXCLUDED.waitlist_count,
+                    changed_at = EXCLUDED.changed_at
+                WHERE (s.vacancy_count, s.waitlist_count)
+                      IS DISTINCT FROM (EXCLUDED.vacancy_count, EXCLUDED.waitlist_count)
+                RETURNING s.course_code, s.index_number, s.vacancy_count, s.waitlist_count, s.changed_at
+            )
+            INSERT INTO index_history (
+                course_code, index_number, vacancy_count, waitlist_count, checked_at
+            )
+            SELECT * FROM changed
+        """, (course_codes, index_numbers, vacancy_counts, waitlist_counts))
+        return cursor.rowcount
+    
+    async def update_alert_check(self, alert_id, vacancy_count, waitlist_count):
+        """
+        Update alert check information and log index history on change.
+        
+        Args:
+            alert_id (int): Alert ID
+            vacancy_count (int): Current vacancy count
+            waitlist_count (int): Current waitlist count
+        
+        Returns:
+            bool: True if successful
+        """
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute("""
+                    UPDATE alerts
+                    SET last_checked = CURRENT_TIMESTAMP,
+                        last_vacancy_count = %s
+                    WHERE id = %s
+                    RETURNING course_code, index_number
+                """, (vacancy_count, alert_id))
+                alert_info = await cursor.fetchone()
+                
+                if not alert_info:
+                    logger.warning(f"Alert {alert_id} not found for update")
+                    return False
+                
+                course_code, index_number = alert_info
+                await self._record_index_states(conn, {(course_code, index_number): (vacancy_count, waitlist_count)})
+                return True
+        except Exception as e:
+            logger.error(f"Failed to update alert check for {alert_id}: {e}")
+            raise
+    
+    async def record_checks(self, results, unchanged_ids=()):
+        """
+        Record a whole check cycle in one transaction.
+        Same statement as Database.record_checks: updates every alert, logs
+        index history on change and queues an outbox notification for every
+        alert whose vacancies went from 0 to positive.
+        
+        Args:
+            results (list): Check results, each a dict with 'alert_id', 'course_code',
+                            'index_number', 'vacancy' and 'waitlist'
+            unchanged_ids (list): Alerts checked on an unchanged page; only their
+                                  last_checked is bumped
+        
+        Returns:
+            dict: 'recorded' alerts (alerts deleted meanwhile are skipped) and
+                  'queued' notifications
+        """
+        if not results and not unchanged_ids:
+            return {'recorded': 0, 'queued': 0}
+        
+        alert_ids = [result['alert_id'] for result in results]
+        vacancy_counts = [result['vacancy'] for result in results]
+        waitlist_counts = [result['waitlist'] for result in results]
+        states = {
+            (result['course_code'], result['index_number']): (result['vacancy'], result['waitlist'])
+            for result in results
+        }
+        
+        try:
+            async with self.get_connection() as conn:
+                if unchanged_ids:
+                    await conn.execute(
+                        "UPDATE alerts SET last_checked = CURRENT_TIMESTAMP WHERE id = ANY(%s)",
+                        (list(unchanged_ids),)
+                    )
+                if not results:
+                    return {'recorded': 0, 'queued': 0}
+                
+                cursor = await conn.execute("""
+                    WITH checks AS (
+                        SELECT * FROM unnest(%s::integer[], %s::integer[], %s::integer[])
+                            AS c(alert_id, vacancy_count, waitlist_count)
+                    ),
+                    previous AS (
+                        SELECT a.id, a.last_vacancy_count
+                        FROM alerts a
+                        JOIN checks c ON a.id = c.alert_id
+                    ),
+                    updated AS (
+                        UPDATE alerts AS a
+                        SET last_checked = CURRENT_TIMESTAMP,
+                            last_vacancy_count = c.vacancy_count
+                        FROM checks c
+                        WHERE a.id = c.alert_id
+                        RETURNING a.id, a.telegram_id, a.course_code, a.index_number,
+                                  c.vacancy_count, c.waitlist_count
+                    ),
+                    queued AS (
+                        INSERT INTO notification_outbox (
+                            alert_id, telegram_id, course_code, index_number,
+                            vacancy_count, waitlist_count
+                        )
+                        SELECT u.id, u.telegram_id, u.course_code, u.index_number,
+                               u.vacancy_count, u.waitlist_count
+                        FROM updated u
+                        JOIN previous p ON p.id = u.id
+                        WHERE COALESCE(p.last_vacancy_count, 0) = 0 AND u.vacancy_count > 0
+                        ON CONFLICT (alert_id, created_at) DO NOTHING
+                        RETURNING 1
+                    )
+                    SELECT (SELECT COUNT(*) FROM updated), (SELECT COUNT(*) FROM queued)
+                """, (alert_ids, vacancy_counts, waitlist_counts))
+                recorded, queued = await cursor.fetchone()
+                
+                changed = await self._record_index_states(conn, states)
+                
+                logger.debug(
+                    f"Recorded {recorded} alert checks in one transaction "
+                    f"({changed} of {len(states)} indexes changed, {queued} notifications queued)"
+                )
+                return {'recorded': recorded, 'queued': queued}
+        except Exception as e:
+            logger.error(f"Failed to record {len(results)} alert checks: {e}")
+            raise
+    
+    # Notification outbox
+    async def claim_outbox(self, limit, lease_seconds):
+        """
+        Claim the due outbox notifications of up to `limit` chats.
+        All due rows of a chat are claimed together so they can be sent as
+        one message. Claimed rows are leased by pushing next_attempt_at
+        forward, so other workers skip them and a crashed worker's rows
+        become due again once the lease runs out.
+        
+        Rows whose alert was removed or whose user stopped or paused since
+        they were queued are cancelled instead of being claimed.
+        
+        Args:
+            limit (int): Maximum chats to claim, longest waiting first
+            lease_seconds (float): How long the claim lasts
+        
+        Returns:
+            list: Outbox row dictionaries, oldest first
+        """
+        try:
+            async with self.get_connection() as conn:
+                cursor = conn.cursor(row_factory=dict_row)
+                await cursor.execute("""
+                    UPDATE notification_outbox AS o
+                    SET status = 'cancelled',
+                        last_error = 'alert or user no longer active'
+                    FROM alerts a, users u
+                    WHERE o.status = 'pending' AND o.next_attempt_at <= CURRENT_TIMESTAMP
+                    AND a.id = o.alert_id
+                    AND u.telegram_id = o.telegram_id
+                    AND NOT (
+                        a.is_active = TRUE
+                        AND u.is_active = TRUE
+                        AND (
+                            u.is_paused = FALSE
+                            OR (u.is_paused = TRUE AND u.paused_until IS NOT NULL AND u.paused_until < CURRENT_TIMESTAMP)
+                        )
+                    )
+                """)
+                if cursor.rowcount:
+                    logger.info(f"Cancelled {cursor.rowcount} outbox notifications for inactive alerts")
+                
+                await cursor.execute("""
+                    WITH chats AS (
+                        SELECT telegram_id
+                        FROM notification_outbox
+                        WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP
+                        GROUP BY telegram_id
+                        ORDER BY MIN(id)
+                        LIMIT %s
+                    ),
+                    due AS (
+                        SELECT id
+                        FROM notification_outbox
+                        WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP
+                          AND telegram_id IN (SELECT telegram_id FROM chats)
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    UPDATE notification_outbox AS o
+                    SET attempts = o.attempts + 1,
+                        next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+                    FROM due
+                    WHERE o.id = due.id
+                    RETURNING o.id, o.alert_id, o.telegram_id, o.course_code, o.index_number,
+                              o.vacancy_count, o.waitlist_count, o.attempts, o.created_at
+                """, (limit, lease_seconds))
+                return sorted(await cursor.fetchall(), key=lambda row: row['id'])
+        except Exception as e:
+            logger.error(f"Failed to claim outbox notifications: {e}")
+            raise
+    
+    async def mark_outbox_delivered(self, outbox_ids):
+        """
+        Mark outbox notifications delivered and record them in alert_notifications.
+        
+        Args:
+            outbox_ids (list): Outbox row IDs
+        
+        Returns:
+            int: Number of rows marked
+        """
+        if not outbox_ids:
+            return 0
+        
+        try:
+            async with self.get_connection() as conn:
+                # Timestamped with the transition so it lines up with that history row
+                cursor = await conn.execute("""
+                    WITH delivered AS (
+                        UPDATE notification_outbox
+                        SET status = 'delivered',
+                            delivered_at = CURRENT_TIMESTAMP,
+                            last_error = NULL
+                        WHERE id = ANY(%s::bigint[]) AND status = 'pending'
+                        RETURNING alert_id, telegram_id, course_code, index_number,
+                                  vacancy_count, waitlist_count, created_at
+                    )
+                    INSERT INTO alert_notifications (
+                        alert_id, telegram_id, course_code, index_number,
+                        vacancy_count, waitlist_count, notified_at
+                    )
+                    SELECT * FROM delivered
+                """, (list(outbox_ids),))
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Failed to mark {len(outbox_ids)} outbox notifications delivered: {e}")
+            raise
+    
+    async def mark_outbox_failed(self, outbox_ids, error, max_attempts, retry_delay):
+        """
+        Schedule failed outbox notifications for another attempt with
+        exponential backoff, or give up on rows out of attempts.
+        
+        Args:
+            outbox_ids (list): Outbox row IDs
+            error (str): Reason recorded on the rows
+            max_attempts (int): Attempts after which a row is marked 'failed'
+            retry_delay (float): Delay before the second attempt; doubles each attempt
+        
+        Returns:
+            int: Number of rows given up on
+        """
+        if not outbox_ids:
+            return 0
+        
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute("""
+                    UPDATE notification_outbox
+                    SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+                        next_attempt_at = CURRENT_TIMESTAMP
+                            + make_interval(secs => %s * power(2, attempts - 1)),
+                        last_error = %s
+                    WHERE id = ANY(%s::bigint[]) AND status = 'pending'
+                    RETURNING status
+                """, (max_attempts, retry_delay, error, list(outbox_ids)))
+                return sum(1 for (status,) in await cursor.fetchall() if status == 'failed')
+        except Exception as e:
+            logger.error(f"Failed to reschedule {len(outbox_ids)} outbox notifications: {e}")
+            raise
+    
+    async def purge_outbox(self, days):
+        """
+        Delete delivered and failed outbox rows older than the given age.
+        
+        Args:
+            days (int): Age in days after which finished rows are deleted
+        
+        Returns:
+            int: Number of rows deleted
+        """
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute("""
+                    DELETE FROM notification_outbox
+                    WHERE status <> 'pending'
+                      AND created_at < CURRENT_TIMESTAMP - make_interval(days => %s)
+                """, (days,))
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Failed to purge outbox: {e}")
+            raise
+    
+    async def mark_notification_sent(self, alert_id):
+        """
+        Record that the alert's user was notified about its current counts.
+        
+        Args:
+            alert_id (int): Alert ID
+        
+        Returns:
+            bool: True if successful
+        """
+        try:
+            async with self.get_connection() as conn:
+                # Timestamped with the index's last change so it lines up with that history row
+                await conn.execute("""
+                    INSERT INTO alert_notifications (
+                        alert_id, telegram_id, course_code, index_number,
+                        vacancy_count, waitlist_count, notified_at
+                    )
+                    SELECT a.id, a.telegram_id, a.course_code, a.index_number,
+                           a.last_vacancy_count, COALESCE(s.waitlist_count, 0),
+                           COALESCE(s.changed_at, CURRENT_TIMESTAMP)
+                    FROM alerts a
+                    LEFT JOIN index_state s
+                        ON s.course_code = a.course_code AND s.index_number = a.index_number
+                    WHERE a.id = %s
+                """, (alert_id,))
+                return True
+        except Exception as e:
+            logger.error(f"Failed to mark notification sent for alert {alert_id}: {e}")
+            raise
+    
+    async def get_alert_history(self, alert_id, limit=10):
+        """
+        Get history for an alert.
+        Same query as Database.get_alert_history: per-index history since the
+        alert was created plus its legacy alert_history rows.
+        
+        Args:
+            alert_id (int): Alert ID
+            limit (int): Maximum number of history entries to return
+        
+        Returns:
+            list: List of history dictionaries
+        """
+        try:
+            async with self.get_connection() as conn:
+                cursor = conn.cursor(row_factory=dict_row)
+                await cursor.execute("""
+                    (
+                        SELECT
+                            h.id, a.id AS alert_id, a.telegram_id,
+                            h.course_code, h.index_number,
+                            h.vacancy_count, h.waitlist_count, h.checked_at,
+                            EXISTS (
+                                SELECT 1 FROM alert_notifications n
+                                WHERE n.alert_id = a.id AND n.notified_at = h.checked_at
+                            ) AS notification_sent
+                        FROM alerts a
+                        JOIN index_history h
+                            ON h.course_code = a.course_code AND h.index_number = a.index_number
+                            AND h.checked_at >= a.created_at
+                        WHERE a.id = %s
+                        ORDER BY h.checked_at DESC
+                        LIMIT %s
+                    )
+                    UNION ALL
+                    (
+                        SELECT
+                            id, alert_id, telegram_id,
+                            course_code, index_number,
+                            vacancy_count, waitlist_count, checked_at,
+                            notification_sent
+                        FROM alert_history
+                        WHERE alert_id = %s
+                        ORDER BY checked_at DESC
+                        LIMIT %s
+                    )
+                    ORDER BY checked_at DESC
+                    LIMIT %s
+                """, (alert_id, limit, alert_id, limit, limit))
+                return await cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Failed to get history for alert {alert_id}: {e}")
+            return []
+    
+    async def get_course_change_counts(self, course_codes, days):
+        """
+        Count recorded vacancy changes per course, in the unit the poll
+        schedule measures: checks in which any index's vacancy count differed
+        from its previous history row. Waitlist-only changes and each index's
+        first row in the window (no previous row to compare with) do not count,
+        and indexes changing in the same check count once.
+        
+        Every course that has been checked before is returned, so quiet
+        courses count as observed with zero changes rather than unknown.
+        
+        Args:
+            course_codes (list): Course codes to count
+            days (int): How many days back to look
+        
+        Returns:
+            dict: course_code -> (number of checks with a vacancy change in the window,
+                  seconds of the window the course was watched for); courses never
+                  checked are omitted
+        """
+        if not course_codes:
+            return {}
+        
+        try:
+            async with self.get_connection() as conn:
+                # A course is watched from its first history row, or for the
+                # whole window if it only has current state
+                cursor = await conn.execute("""
+                    WITH seen AS (
+                        SELECT course_code, MIN(checked_at) AS first_checked
+                        FROM index_history
+                        WHERE course_code = ANY(%(courses)s::varchar[])
+                        GROUP BY course_code
+                        UNION ALL
+                        SELECT DISTINCT course_code, NULL::timestamp
+                        FROM index_state
+                        WHERE course_code = ANY(%(courses)s::varchar[])
+                    ),
+                    changes AS (
+                        SELECT course_code, COUNT(DISTINCT checked_at) AS changes
+                        FROM (
+                            SELECT course_code, checked_at, vacancy_count,
+                                   LAG(vacancy_count) OVER (
+                                       PARTITION BY course_code, index_number
+                                       ORDER BY checked_at, id
+                                   ) AS previous_count
+                            FROM index_history
+                            WHERE course_code = ANY(%(courses)s::varchar[])
+                              AND checked_at >= CURRENT_TIMESTAMP - make_interval(days => %(days)s)
+                        ) history
+                        WHERE vacancy_count <> previous_count
+                        GROUP BY course_code
+                    )
+                    SELECT seen.course_code,
+                           COALESCE(MAX(changes.changes), 0),
+                           EXTRACT(EPOCH FROM LEAST(
+                               make_interval(days => %(days)s),
+                               CURRENT_TIMESTAMP - MIN(seen.first_checked)
+                           ))
+                    FROM seen
+                    LEFT JOIN changes ON changes.course_code = seen.course_code
+                    GROUP BY seen.course_code
+                """, {'courses': list(course_codes), 'days': days})
+                return {
+                    course_code: (changes, float(observed))
+                    for course_code, changes, observed in await cursor.fetchall()
+                }
+        except Exception as e:
+            logger.error(f"Failed to count changes for {len(course_codes)} courses: {e}")
+            raise
+    
+    # History partition maintenance
+    async def maintain_history_partitions(self):
+        """
+        Pre-create upcoming monthly history partitions and remove expired ones.
+        Same behaviour as Database.maintain_history_partitions.
+        
+        Returns:
+            dict: Lists of 'created' and 'removed' partition names
+        """
+        current_month = date.today().replace(day=1)
+        last_month = _add_months(current_month, config.HISTORY_PARTITIONS_AHEAD)
+        try:
+            async with self.get_connection() as conn:
+                cursor = await conn.execute(HISTORY_PARTITIONS_QUERY)
+                partitions = _history_partition_months(name for (name,) in await cursor.fetchall())
+                cursor = await conn.execute(HISTORY_DEFAULT_MONTHS_QUERY)
+                default_months = [month for (month,) in await cursor.fetchall()]
+                
+                created = []
+                for month in _missing_history_months(partitions, current_month, last_month, default_months):
+                    name, statements = _history_partition_statements(month)
+                    for statement in statements:
+                        await conn.execute(statement)
+                    partitions[month] = name
+                    created.append(name)
+                
+                removed = _expired_history_partitions(partitions, current_month)
+                for name in removed:
+                    await conn.execute(_history_expiry_statement(name))
+            
+            _log_history_maintenance(created, removed)
+            return {'created': created, 'removed': removed}
+        except Exception as e:
+            logger.error(f"Failed to maintain history partitions: {e}")
+            raise
+
+
+# Global async database instance
+adb = AsyncDatabase()
@@ -4,6 +4,7 @@ Main bot implementation with user registration and alert management
 """
 
 import asyncio
+from datetime import datetime
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.helpers import escape_markdown
 from telegram.ext import (
@@ -16,15 +17,20 @@ from telegram.ext import (
     filters
 )
 from .config import config
+from .async_database import adb
 from .database import db
 from .logger import get_logger
 from .vacancy_api import vacancy_api
+from .vacancy_checker import checker
 
 logger = get_logger(__name__)
 
 DATA_SOURCE_URL = "https://wish.wis.ntu.edu.sg/webexe/owa/aus_vacancy.check_vacancy"
 DATA_SOURCE_LINK = f"[{DATA_SOURCE_URL}]({DATA_SOURCE_URL})"
 
+# Errors that mean NTU itself is failing; cached data is shown instead when there is any
+UPSTREAM_ERRORS = ('circuit_open', 'timeout', 'connection_error', 'request_error')
+
 # Conversation states
 (ADD_ALERT_COURSE, ADD_ALERT_INDEX, DISPLAY_VACANCIES_COURSE) = range(3)
 
@@ -65,7 +71,7 @@ class TelegramBot:
         logger.info(f"User {user.id} ({user.username}) started bot")
         
         # Auto-register user
-        db.add_user(update.effective_user.id, update.effective_user.username)
+        await adb.add_user(update.effective_user.id, update.effective_user.username)
         
         safe_first_name = escape_markdown(user.first_name or "there")
         welcome_message = (
@@ -118,10 +124,65 @@ class TelegramBot:
         
         await update.message.reply_text(help_text, parse_mode='Markdown')
     
+    @staticmethod
+    def _format_data_age(fetched_at):
+        """
+        Describe how old a vacancy snapshot is.
+        
+        Args:
+            fetched_at (datetime): When the data was fetched from NTU
+        
+        Returns:
+            str: Human-readable data age line
+        """
+        if fetched_at is None:
+            return "Updated: unknown"
+        
+        age = int((datetime.now() - fetched_at).total_seconds())
+        if age < 5:
+            age_text = "just now"
+        elif age < 60:
+            age_text = f"{age}s ago"
+        else:
+            age_text = f"{age // 60} min ago"
+        
+        return f"Updated: {fetched_at.strftime('%H:%M:%S')} ({age_text})"
+    
+    async def _stale_fallback(self, update, course_code, result):
+        """
+        Fall back to the last cached snapshot when NTU is failing.
+        The user is told the data may be out of date and how old it is.
+        
+        Args:
+            update (Update): Telegram update to reply to
+            course_code (str): Course code
+            result (dict): Failed result from VacancyApiClient.get_course_snapshot_async
+        
+        Returns:
+            dict: Success result with the stale snapshot, or the original result
+                  if the error is not an upstream failure or nothing is cached
+        """
+        upstream_error = (
+            result.get('error') in UPSTREAM_ERRORS
+            or (result.get('error') == 'http_error'
+                and (result.get('status_code', 0) >= 500 or result.get('status_code') == 429))
+        )
+        stale = vacancy_api.cache.peek(course_code) if upstream_error else None
+        if stale is None:
+            return result
+        
+        logger.info(f"Serving stale snapshot for {course_code}: {result.get('error')}")
+        await update.message.reply_text(
+            f"{result['error_message']}\n\n"
+            f"Showing the last known data instead, which may be out of date.\n"
+            f"{self._format_data_age(stale.fetched_at)}"
+        )
+        return {'success': True, 'data': stale}
+    
     async def display_vacancies_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Start display vacancies conversation"""
         # Auto-register user if not exists
-        db.add_user(update.effective_user.id, update.effective_user.username)
+        await adb.add_user(update.effective_user.id, update.effective_user.username)
         
         await update.message.reply_text(
             "*Display Course Vacancies*\n\n"
@@ -138,8 +199,10 @@ class TelegramBot:
         
         await update.message.reply_text(f"Fetching vacancies for {course_code}...")
         
-        # Fetch all indexes for this course
-        result = vacancy_api.get_course_vacancies(course_code)
+        # Fetch all indexes for this course (served from the shared cache when fresh)
+        result = await vacancy_api.get_course_snapshot_async(course_code, max_age=config.SNAPSHOT_CACHE_TTL)
+        if not result['success']:
+            result = await self._stale_fallback(update, course_code, result)
         
         if not result['success']:
             # Show error with details
@@ -154,7 +217,11 @@ class TelegramBot:
             )
             return DISPLAY_VACANCIES_COURSE
         
-        indexes = result['data']
+        snapshot = result['data']
+        indexes = snapshot.indexes
+        
+        # Courses people look at get polled with more priority
+        checker.record_demand(course_code)
         
         if not indexes:
             await update.message.reply_text(
@@ -166,6 +233,7 @@ class TelegramBot:
         
         # Store indexes in user_data for pagination
         context.user_data['display_indexes'] = indexes
+        context.user_data['display_fetched_at'] = snapshot.fetched_at
         context.user_data['display_page'] = 0
         
         # Send first page with pagination
@@ -206,7 +274,8 @@ class TelegramBot:
             
             message += "\n"
         
-        message += f"\nTotal: {len(all_indexes)} indexes\n\n"
+        message += f"\nTotal: {len(all_indexes)} indexes\n"
+        message += f"{self._format_data_age(context.user_data.get('display_fetched_at'))}\n\n"
         message += f"Data source: {DATA_SOURCE_LINK}"
         
         # Create pagination buttons
@@ -268,7 +337,7 @@ class TelegramBot:
     async def add_alert_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Start add alert conversation"""
         # Auto-register user if not exists
-        db.add_user(update.effective_user.id, update.effective_user.username)
+        await adb.add_user(update.effective_user.id, update.effective_user.username)
         
         await update.message.reply_text(
             "*Add Course Alert*\n\n"
@@ -285,8 +354,10 @@ class TelegramBot:
         
         await update.message.reply_text(f"Fetching indexes for {course_code}...")
         
-        # Fetch all indexes for this course
-        result = vacancy_api.get_course_vacancies(course_code)
+        # Fetch all indexes for this course (served from the shared cache when fresh)
+        result = await vacancy_api.get_course_snapshot_async(course_code, max_age=config.SNAPSHOT_CACHE_TTL)
+        if not result['success']:
+            result = await self._stale_fallback(update, course_code, result)
         
         if not result['success']:
             # Show error with details
@@ -301,7 +372,8 @@ class TelegramBot:
             )
             return ADD_ALERT_COURSE
         
-        indexes = result['data']
+        snapshot = result['data']
+        indexes = snapshot.indexes
         
         if not indexes:
             await update.message.reply_text(
@@ -313,6 +385,7 @@ class TelegramBot:
         
         # Store indexes in user_data for pagination
         context.user_data['all_indexes'] = indexes
+        context.user_data['alert_fetched_at'] = snapshot.fetched_at
         context.user_data['current_page'] = 0
         
         # Send first page with pagination
@@ -353,7 +426,8 @@ class TelegramBot:
             
             message += "\n"
         
-        message += "\nEnter the *index number* to monitor, or use buttons to navigate:\n\n"
+        message += f"{self._format_data_age(context.user_data.get('alert_fetched_at'))}\n\n"
+        message += "Enter the *index number* to monitor, or use buttons to navigate:\n\n"
         message += f"Data source: {DATA_SOURCE_LINK}"
         
         # Create pagination buttons
@@ -421,12 +495,12 @@ class TelegramBot:
         
         try:
             # Auto-resume user if they're adding a new alert
-            pause_status = db.check_user_pause_status(update.effective_user.id)
+            pause_status = await adb.check_user_pause_status(update.effective_user.id)
             if pause_status['pause_reason'] == 'stopped':
-                db.resume_user(update.effective_user.id)
+                await adb.resume_user(update.effective_user.id)
                 logger.info(f"User {update.effective_user.id} auto-resumed from stopped state")
             
-            alert_id = db.add_alert(
+            alert_id = await adb.add_alert(
                 telegram_id=update.effective_user.id,
                 course_code=course_code,
                 index_number=index_number
@@ -434,13 +508,17 @@ class TelegramBot:
             
             if alert_id:
                 # Immediately check current vacancy using public API
-                result = vacancy_api.get_index_vacancy(course_code, index_number)
+                result = await vacancy_api.get_index_vacancy_async(
+                    course_code,
+                    index_number,
+                    max_age=config.SNAPSHOT_CACHE_TTL
+                )
                 
                 if result['success']:
                     vacancy_info = result['data']
                     
                     # Update the alert with current vacancy
-                    db.update_alert_check(
+                    await adb.update_alert_check(
                         alert_id,
                         vacancy_info['vacancy'],
                         vacancy_info['waitlist']
@@ -455,7 +533,8 @@ class TelegramBot:
                         f"Alert ID: {alert_id}\n\n"
                         f"*Current Status:*\n"
                         f"   Vacancies: {vacancy_info['vacancy']}\n"
-                        f"   Waitlist: {vacancy_info['waitlist']}\n\n"
+                        f"   Waitlist: {vacancy_info['waitlist']}\n"
+                        f"   {self._format_data_age(result.get('fetched_at'))}\n\n"
                         f"*Class Schedule:*\n"
                     )
                     
@@ -469,7 +548,7 @@ class TelegramBot:
                     else:
                         status_msg += "I'll notify you when a vacancy opens up!\n\n"
                     
-                    status_msg += f"Checking every {config.CHECK_INTERVAL // 60} minutes.\n\n"
+                    status_msg += f"Checking every {config.POLL_MIN_INTERVAL / 60:g}-{config.POLL_MAX_INTERVAL / 60:g} minutes, more often when the course is busy.\n\n"
                     status_msg += f"Data source: {DATA_SOURCE_LINK}"
                     
                     await update.message.reply_text(status_msg, parse_mode='Markdown')
@@ -486,7 +565,7 @@ class TelegramBot:
                         f"Alert ID: {alert_id}\n\n"
                         f"Warning: Could not verify current vacancy:\n{error_msg}\n\n"
                         f"I'll notify you when a vacancy opens up!\n"
-                        f"Checking every {config.CHECK_INTERVAL // 60} minutes.",
+                        f"Checking every {config.POLL_MIN_INTERVAL / 60:g}-{config.POLL_MAX_INTERVAL / 60:g} minutes, more often when the course is busy.",
                         parse_mode='Markdown'
                     )
             else:
@@ -506,12 +585,12 @@ class TelegramBot:
     async def list_alerts(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """List all user alerts"""
         # Auto-register user if not exists
-        db.add_user(update.effective_user.id, update.effective_user.username)
+        await adb.add_user(update.effective_user.id, update.effective_user.username)
         
         # Check pause status
-        pause_status = db.check_user_pause_status(update.effective_user.id)
+        pause_status = await adb.check_user_pause_status(update.effective_user.id)
         
-        alerts = db.get_user_alerts(update.effective_user.id)
+        alerts = await adb.get_user_alerts(update.effective_user.id)
         
         if not alerts:
             message = "You have no active alerts.\n"
@@ -563,7 +642,7 @@ class TelegramBot:
             await update.message.reply_text("Invalid alert ID. Please provide a number.")
             return
         
-        if db.remove_alert(alert_id, update.effective_user.id):
+        if await adb.remove_alert(alert_id, update.effective_user.id):
             await update.message.reply_text(
                 f"Alert {alert_id} has been removed."
             )
@@ -575,7 +654,7 @@ class TelegramBot:
     async def stop_alerts(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Stop all alerts permanently"""
         # Check if user exists
-        user = db.get_user(update.effective_user.id)
+        user = await adb.get_user(update.effective_user.id)
         if not user:
             await update.message.reply_text(
                 "You have no active alerts to stop."
@@ -583,10 +662,10 @@ class TelegramBot:
             return
         
         # Get count of active alerts
-        alerts = db.get_user_alerts(update.effective_user.id)
+        alerts = await adb.get_user_alerts(update.effective_user.id)
         alert_count = len(alerts)
         
-        if db.stop_user(update.effective_user.id):
+        if await adb.stop_user(update.effective_user.id):
             await update.message.reply_text(
                 "*All Alerts Stopped*\n\n"
                 f"Deactivated {alert_count} alert(s).\n\n"
@@ -733,8 +812,9 @@ class TelegramBot:
             # Validate configuration
             config.validate()
             
-            # Initialize database
+            # Initialize database; handlers use the async pool from here on
             db.init_database()
+            db.close()
             
             # Setup and run bot
             self.setup()
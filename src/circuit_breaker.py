@@ -0,0 +1,210 @@
+"""
+Circuit Breaker Module
+Stops calling an upstream host that keeps failing, probing it again with backoff
+"""
+
+import random
+import time
+from collections import deque
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one upstream host.
+    Closed: requests go through and their outcomes are kept in a sliding
+    window; errors and responses slower than `slow_call` count as failures.
+    Once the window holds at least `min_requests` outcomes and the failure
+    rate reaches `error_rate`, the breaker opens.
+    Open: requests are refused immediately for a cooldown that doubles with
+    every consecutive opening (up to `max_cooldown`), with jitter so
+    several processes do not probe in step.
+    Half-open: after the cooldown a single probe request is let through;
+    success closes the breaker, failure opens it again.
+    
+    Every request carries the ticket allow() gave it, and outcomes are only
+    counted for tickets of the current state: a slow response to a request
+    sent before the breaker opened cannot close or reopen it, and only the
+    probe decides a half-open breaker.
+    
+    Attributes:
+        name (str): Host name, for logging
+        state (str): 'closed', 'open' or 'half_open'
+    """
+    
+    def __init__(self, name, error_rate, min_requests, window, slow_call, cooldown, max_cooldown):
+        """
+        Initialize a closed breaker.
+        
+        Args:
+            name (str): Host name, for logging
+            error_rate (float): Failure rate (0-1) in the window that opens the breaker
+            min_requests (int): Outcomes needed in the window before it can open
+            window (int): Number of recent outcomes considered
+            slow_call (float): Seconds after which a successful response counts as a failure
+            cooldown (float): Seconds the breaker stays open the first time
+            max_cooldown (float): Longest cooldown after repeated openings
+        """
+        self.name = name
+        self.error_rate = error_rate
+        self.min_requests = max(1, min_requests)
+        self.slow_call = slow_call
+        self.cooldown = cooldown
+        self.max_cooldown = max(cooldown, max_cooldown)
+        
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=max(self.min_requests, window))  # True = failure
+        self._open_until = 0.0
+        self._openings = 0          # consecutive openings without a successful probe
+        self._probing = False
+        self._generation = 0        # bumped on every state change; tickets of older ones are stale
+        self.stats = {'opened': 0, 'rejected': 0, 'probes': 0, 'stale': 0}
+    
+    def allow(self):
+        """
+        Check whether a request may be sent now.
+        Moves an open breaker to half-open once its cooldown is over and
+        reserves the single probe for the caller.
+        
+        Returns:
+            int: Ticket to report the request's outcome with, or None if the
+                 request may not go ahead
+        """
+        if self.state == CLOSED:
+            return self._generation
+        
+        if self.state == OPEN and time.monotonic() >= self._open_until:
+            self.state = HALF_OPEN
+            self._probing = False
+        
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            self._generation += 1
+            self.stats['probes'] += 1
+            logger.info(f"Circuit for {self.name} half-open, sending a probe request")
+            return self._generation
+        
+        self.stats['rejected'] += 1
+        return None
+    
+    def is_available(self):
+        """
+        Check, without side effects, whether a request could be sent now.
+        
+        Returns:
+            bool: False while open and cooling down or while a probe is in flight
+        """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return time.monotonic() >= self._open_until
+        return not self._probing
+    
+    def retry_in(self):
+        """
+        Get the time left until the next probe.
+        
+        Returns:
+            float: Seconds, 0 if requests can be sent
+        """
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._open_until - time.monotonic())
+    
+    def _is_stale(self, ticket):
+        """
+        Check whether a request was let through before the last state change.
+        
+        Args:
+            ticket (int): Ticket from allow()
+        
+        Returns:
+            bool: True if its outcome must be ignored
+        """
+        if ticket == self._generation:
+            return False
+        self.stats['stale'] += 1
+        return True
+    
+    def record_success(self, ticket, latency):
+        """
+        Record a completed request.
+        
+        Args:
+            ticket (int): Ticket allow() gave the request
+            latency (float): Seconds the request took
+        """
+        if latency > self.slow_call:
+            logger.debug(f"Slow response from {self.name} ({latency:.1f}s) counted as failure")
+            self.record_failure(ticket)
+            return
+        if self._is_stale(ticket):
+            return
+        
+        if self.state == HALF_OPEN:
+            logger.info(f"Circuit for {self.name} closed, upstream recovered")
+            self.state = CLOSED
+            self._generation += 1
+            self._openings = 0
+            self._probing = False
+            self._outcomes.clear()
+        self._outcomes.append(False)
+    
+    def record_failure(self, ticket):
+        """
+        Record a failed (or too slow) request.
+        
+        Args:
+            ticket (int): Ticket allow() gave the request
+        """
+        if self._is_stale(ticket):
+            return
+        
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+        
+        self._outcomes.append(True)
+        if self.state == CLOSED and len(self._outcomes) >= self.min_requests:
+            failures = sum(self._outcomes)
+            if failures / len(self._outcomes) >= self.error_rate:
+                self._open()
+    
+    def _open(self):
+        """Open the breaker with exponential backoff and jitter"""
+        self._openings += 1
+        cooldown = min(self.cooldown * 2 ** (self._openings - 1), self.max_cooldown)
+        
+        # Equal jitter: at least half the cooldown, at most all of it
+        cooldown = cooldown / 2 + random.uniform(0, cooldown / 2)
+        
+        self.state = OPEN
+        self._generation += 1
+        self._open_until = time.monotonic() + cooldown
+        self._probing = False
+        self._outcomes.clear()
+        self.stats['opened'] += 1
+        logger.warning(
+            f"Circuit for {self.name} opened (opening #{self._openings}), "
+            f"requests paused for {cooldown:.0f}s"
+        )
+    
+    def get_stats(self):
+        """
+        Get breaker statistics.
+        
+        Returns:
+            dict: State, seconds until the next probe and counters
+        """
+        return {
+            'state': self.state,
+            'retry_in': self.retry_in(),
+            'failure_rate': sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0,
+            **self.stats
+        }
@@ -45,6 +45,17 @@ class Config:
         self.DB_USER = os.getenv('DB_USER', 'postgres')
         self.DB_PASSWORD = os.getenv('DB_PASSWORD', '')
         
+        # Database connection pool
+        self.DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+        self.DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+        self.DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+        self.DB_POOL_HEALTHCHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTHCHECK_INTERVAL', '60'))
+        
+        # History retention (monthly partitions; 0 months keeps history forever)
+        self.HISTORY_RETENTION_MONTHS = int(os.getenv('HISTORY_RETENTION_MONTHS', '12'))
+        self.HISTORY_RETENTION_MODE = os.getenv('HISTORY_RETENTION_MODE', 'drop').lower()
+        self.HISTORY_PARTITIONS_AHEAD = int(os.getenv('HISTORY_PARTITIONS_AHEAD', '3'))
+        
         # Telegram Bot Configuration
         self.TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
         
@@ -62,10 +73,65 @@ class Config:
         self._cache_duration = 3600  # Cache for 1 hour
         
         # Alert Checker Configuration
-        self.CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', '300'))  # 5 minutes default
+        self.CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', '300'))  # 5 minutes default; starting interval of new courses
         self.MAX_RETRY_ATTEMPTS = int(os.getenv('MAX_RETRY_ATTEMPTS', '3'))
         self.REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', '30'))
         
+        # Fetch scheduling (parallelism and token-bucket politeness budget)
+        self.FETCH_CONCURRENCY = int(os.getenv('FETCH_CONCURRENCY', '3'))
+        self.FETCH_RATE_LIMIT = float(os.getenv('FETCH_RATE_LIMIT', '1.0'))  # requests per second
+        self.FETCH_BURST = int(os.getenv('FETCH_BURST', '3'))
+        
+        # Adaptive per-course polling (intervals follow each course's observed change rate)
+        self.POLL_MIN_INTERVAL = float(os.getenv('POLL_MIN_INTERVAL', '60'))
+        self.POLL_MAX_INTERVAL = float(os.getenv('POLL_MAX_INTERVAL', '1800'))
+        self.POLL_TICK_INTERVAL = float(os.getenv('POLL_TICK_INTERVAL', '15'))  # seconds between due-course checks
+        self.POLL_HALF_LIFE = float(os.getenv('POLL_HALF_LIFE', '21600'))  # seconds for an observation to count half
+        self.POLL_HISTORY_DAYS = int(os.getenv('POLL_HISTORY_DAYS', '7'))  # index history used to seed change rates
+        self.POLL_BUDGET = float(os.getenv('POLL_BUDGET', '0'))  # polls per second shared out between courses; 0 = courses / CHECK_INTERVAL
+        self.POLL_DEMAND_WEIGHT = float(os.getenv('POLL_DEMAND_WEIGHT', '1.0'))  # weight of a recent lookup vs a subscriber
+        
+        # Load spreading: spread = even requests via hash phase and jitter, burst = fetch due courses at once
+        self.LOAD_SPREAD_MODE = os.getenv('LOAD_SPREAD_MODE', 'spread').lower()
+        self.LOAD_SPREAD_JITTER = float(os.getenv('LOAD_SPREAD_JITTER', '0.1'))  # fraction of each interval
+        
+        # Notification delivery (concurrent senders within Telegram's limits)
+        self.NOTIFY_CONCURRENCY = int(os.getenv('NOTIFY_CONCURRENCY', '8'))
+        self.NOTIFY_RATE_LIMIT = float(os.getenv('NOTIFY_RATE_LIMIT', '25'))  # messages per second overall
+        self.NOTIFY_PER_CHAT_INTERVAL = float(os.getenv('NOTIFY_PER_CHAT_INTERVAL', '1.0'))  # seconds between messages to one chat
+        self.NOTIFY_MAX_RETRIES = int(os.getenv('NOTIFY_MAX_RETRIES', '3'))
+        self.NOTIFY_DIGEST_WINDOW = float(os.getenv('NOTIFY_DIGEST_WINDOW', '5'))  # seconds to merge a user's alerts into one message
+        
+        # Notification outbox (delivery retries; rows come from the check transaction)
+        self.OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '100'))  # chats per delivery round
+        self.OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '30'))
+        self.OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '6'))
+        self.OUTBOX_RETRY_DELAY = float(os.getenv('OUTBOX_RETRY_DELAY', '30'))  # doubles each attempt
+        self.OUTBOX_LEASE = float(os.getenv('OUTBOX_LEASE', '300'))
+        
+        # Full reload interval of the in-memory subscription index (changes arrive via LISTEN/NOTIFY)
+        self.SUBSCRIPTION_RECONCILE_INTERVAL = float(os.getenv('SUBSCRIPTION_RECONCILE_INTERVAL', '3600'))
+        
+        # HTML parser backend: auto, selectolax, lxml or html.parser
+        self.PARSER_BACKEND = os.getenv('PARSER_BACKEND', 'auto')
+        
+        # Shared course snapshot cache (bot lookups reuse recent fetches)
+        self.SNAPSHOT_CACHE_TTL = float(os.getenv('SNAPSHOT_CACHE_TTL', '60'))
+        self.SNAPSHOT_CACHE_SIZE = int(os.getenv('SNAPSHOT_CACHE_SIZE', '256'))
+        
+        # Upstream HTTP connection pool
+        self.HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', '10'))
+        self.HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('HTTP_MAX_KEEPALIVE_CONNECTIONS', '5'))
+        self.HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '30'))
+        
+        # Upstream circuit breaker (error rate over recent requests, slow calls count as errors)
+        self.CIRCUIT_ERROR_RATE = float(os.getenv('CIRCUIT_ERROR_RATE', '0.5'))
+        self.CIRCUIT_MIN_REQUESTS = int(os.getenv('CIRCUIT_MIN_REQUESTS', '5'))
+        self.CIRCUIT_WINDOW = int(os.getenv('CIRCUIT_WINDOW', '20'))  # recent requests considered
+        self.CIRCUIT_SLOW_CALL = float(os.getenv('CIRCUIT_SLOW_CALL', '10'))  # seconds
+        self.CIRCUIT_COOLDOWN = float(os.getenv('CIRCUIT_COOLDOWN', '30'))  # first open period, doubles each time
+        self.CIRCUIT_MAX_COOLDOWN = float(os.getenv('CIRCUIT_MAX_COOLDOWN', '600'))
+        
         # Encryption Configuration
         self.ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY', '').encode()
         
@@ -3,20 +3,219 @@ Database module for NTU STARS Alert Bot
 Handles PostgreSQL database operations for user and alert management
 """
 
+import re
+import threading
+import time
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from datetime import date
+from psycopg2 import pool
+from psycopg2.extras import RealDictCursor, execute_values
 from contextlib import contextmanager
 from .config import config
 from .logger import get_logger
 
 logger = get_logger(__name__)
 
+# Monthly index_history partitions are named index_history_YYYY_MM
+HISTORY_PARTITION_PATTERN = re.compile(r'^index_history_(\d{4})_(\d{2})$')
+
+# Catch-all partition for rows outside every monthly partition
+HISTORY_DEFAULT_PARTITION = 'index_history_default'
+
+# Partitions attached to index_history
+HISTORY_PARTITIONS_QUERY = """
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'index_history'::regclass
+"""
+
+# Months the default partition holds rows for
+HISTORY_DEFAULT_MONTHS_QUERY = f"""
+    SELECT DISTINCT date_trunc('month', checked_at)::date
+    FROM {HISTORY_DEFAULT_PARTITION}
+"""
+
+
+# Rows fetched per round trip when streaming subscription groups
+SUBSCRIPTION_BATCH_SIZE = 500
+
+# LISTEN/NOTIFY channel announcing subscription changes ('alert:<id>' or 'user:<telegram_id>')
+SUBSCRIPTION_CHANNEL = 'subscription_changes'
+
+
+def _subscription_group(course_code, index_number, alert_ids, telegram_ids, last_vacancy_counts):
+    """
+    Build a subscription work unit from one aggregated row.
+    
+    Args:
+        course_code (str): Course code
+        index_number (str): Index number
+        alert_ids (list): Alert IDs watching the index
+        telegram_ids (list): Telegram user IDs, aligned with alert_ids
+        last_vacancy_counts (list): Last known vacancy counts, aligned with alert_ids
+    
+    Returns:
+        dict: 'course_code', 'index_number' and 'alerts' (list of alert dicts)
+    """
+    return {
+        'course_code': course_code,
+        'index_number': index_number,
+        'alerts': [
+            {
+                'id': alert_id,
+                'telegram_id': telegram_id,
+                'course_code': course_code,
+                'index_number': index_number,
+                'last_vacancy_count': last_vacancy_count
+            }
+            for alert_id, telegram_id, last_vacancy_count in zip(alert_ids, telegram_ids, last_vacancy_counts)
+        ]
+    }
+
+
+def _add_months(month, months):
+    """
+    Shift the first day of a month by a number of months.
+    
+    Args:
+        month (date): First day of a month
+        months (int): Months to add (may be negative)
+    
+    Returns:
+        date: First day of the resulting month
+    """
+    month_index = month.year * 12 + month.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+# History partition helpers, shared by Database and AsyncDatabase.
+# Statements are plain strings: partition names come from HISTORY_PARTITION_PATTERN
+# and bounds are dates, and DDL cannot take bound parameters in psycopg 3.
+
+def _history_partition_months(names):
+    """
+    Map monthly history partition names to their months.
+    
+    Args:
+        names (iterable): Partition names from HISTORY_PARTITIONS_QUERY
+    
+    Returns:
+        dict: First day of month -> partition name (other partitions are left out)
+    """
+    partitions = {}
+    for name in names:
+        match = HISTORY_PARTITION_PATTERN.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def _missing_history_months(partitions, first_month, last_month, default_months=()):
+    """
+    Get the months that need a partition: those in a range, plus those
+    whose rows ended up in the default partition.
+    
+    Args:
+        partitions (dict): Existing partitions, month -> name
+        first_month (date): First day of the first month to cover
+        last_month (date): First day of the last month to cover
+        default_months (iterable): Months with rows in the default partition
+    
+    Returns:
+        list: First days of the months to create partitions for, oldest first
+    """
+    months = set(default_months)
+    month = first_month
+    while month <= last_month:
+        months.add(month)
+        month = _add_months(month, 1)
+    return sorted(month for month in months if month not in partitions)
+
+
+def _history_partition_statements(month):
+    """
+    Build the statements creating a month's partition. Rows the default
+    partition holds for that month are moved into it before it is attached,
+    as attaching fails while the default partition has rows in its range.
+    
+    Args:
+        month (date): First day of the month
+    
+    Returns:
+        tuple: Partition name and list of SQL statements
+    """
+    name = f"index_history_{month:%Y_%m}"
+    start, end = month.isoformat(), _add_months(month, 1).isoformat()
+    return name, [
+        f"CREATE TABLE {name} (LIKE index_history INCLUDING DEFAULTS)",
+        f"""
+            WITH moved AS (
+                DELETE FROM {HISTORY_DEFAULT_PARTITION}
+                WHERE checked_at >= '{start}' AND checked_at < '{end}'
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """,
+        f"ALTER TABLE index_history ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"
+    ]
+
+
+def _expired_history_partitions(partitions, current_month):
+    """
+    Get the partitions older than the configured retention.
+    
+    Args:
+        partitions (dict): Existing partitions, month -> name
+        current_month (date): First day of the current month
+    
+    Returns:
+        list: Names of the expired partitions, oldest first
+    """
+    if config.HISTORY_RETENTION_MONTHS <= 0:
+        return []
+    cutoff = _add_months(current_month, -config.HISTORY_RETENTION_MONTHS)
+    return [name for month, name in sorted(partitions.items()) if month < cutoff]
+
+
+def _history_expiry_statement(name):
+    """
+    Build the statement dropping an expired partition, or detaching it to
+    keep it as an archive table if HISTORY_RETENTION_MODE is 'detach'.
+    
+    Args:
+        name (str): Partition name
+    
+    Returns:
+        str: SQL statement
+    """
+    if config.HISTORY_RETENTION_MODE == 'detach':
+        return f"ALTER TABLE index_history DETACH PARTITION {name}"
+    return f"DROP TABLE {name}"
+
+
+def _log_history_maintenance(created, removed):
+    """
+    Log the partitions a maintenance run created and removed.
+    
+    Args:
+        created (list): Names of the partitions created
+        removed (list): Names of the partitions removed
+    """
+    if created:
+        logger.info(f"Created history partitions: {', '.join(created)}")
+    if removed:
+        action = 'Detached' if config.HISTORY_RETENTION_MODE == 'detach' else 'Dropped'
+        logger.info(f"{action} expired history partitions: {', '.join(removed)}")
+
 
 class Database:
     """
     Database class implementing the Singleton pattern.
     Handles all PostgreSQL database operations for user and alert management.
     
+    Connections come from a shared pool reused by the bot and the checker.
+    
     Attributes:
         db_config (dict): Database connection configuration
     """
@@ -36,33 +235,178 @@ class Database:
             return
         
         self.db_config = config.get_db_config()
+        
+        # Connection pool, created on first use
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._pool_slots = threading.BoundedSemaphore(config.DB_POOL_MAX_SIZE)
+        self._last_used = {}
+        self.pool_stats = {
+            'checkouts': 0,
+            'in_use': 0,
+            'peak_in_use': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'discarded': 0
+        }
         self._initialized = True
         logger.info("Database instance initialized")
     
+    def _get_pool(self):
+        """
+        Get the connection pool, creating it on first use.
+        
+        Returns:
+            psycopg2.pool.ThreadedConnectionPool: Shared connection pool
+        """
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = pool.ThreadedConnectionPool(
+                        config.DB_POOL_MIN_SIZE,
+                        config.DB_POOL_MAX_SIZE,
+                        **self.db_config
+                    )
+                    logger.info(
+                        f"Database pool created (min={config.DB_POOL_MIN_SIZE}, "
+                        f"max={config.DB_POOL_MAX_SIZE})"
+                    )
+        return self._pool
+    
+    def _is_healthy(self, conn):
+        """
+        Check that a pooled connection is still usable.
+        Connections idle longer than DB_POOL_HEALTHCHECK_INTERVAL are pinged.
+        
+        Args:
+            conn (psycopg2.connection): Pooled connection
+        
+        Returns:
+            bool: True if the connection can be used
+        """
+        if conn.closed:
+            return False
+        
+        # Connections not seen before were just opened by the pool
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < config.DB_POOL_HEALTHCHECK_INTERVAL:
+            return True
+        
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"Discarding broken pooled connection: {e}")
+            return False
+    
+    def _checkout(self):
+        """
+        Take a healthy connection from the pool, replacing broken ones.
+        
+        Returns:
+            psycopg2.connection: Database connection object
+        """
+        db_pool = self._get_pool()
+        while True:
+            conn = db_pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            self._discard(conn)
+    
+    def _discard(self, conn):
+        """
+        Close a connection and remove it from the pool.
+        
+        Args:
+            conn (psycopg2.connection): Connection to discard
+        """
+        self._last_used.pop(id(conn), None)
+        self.pool_stats['discarded'] += 1
+        self._pool.putconn(conn, close=True)
+    
     @contextmanager
     def get_connection(self):
         """
-        Context manager for database connections.
+        Context manager for pooled database connections.
+        Waits up to DB_POOL_TIMEOUT seconds for a free connection, commits
+        on success, rolls back on error and returns the connection to the pool.
         
         Yields:
             psycopg2.connection: Database connection object
         
         Raises:
             psycopg2.Error: If database connection or operation fails
+            psycopg2.pool.PoolError: If no connection became free in time
         """
+        wait_start = time.monotonic()
+        if not self._pool_slots.acquire(timeout=config.DB_POOL_TIMEOUT):
+            self.pool_stats['timeouts'] += 1
+            logger.error(f"Timed out after {config.DB_POOL_TIMEOUT}s waiting for a database connection")
+            raise pool.PoolError("Timed out waiting for a database connection")
+        
         conn = None
         try:
-            conn = psycopg2.connect(**self.db_config)
+            waited = time.monotonic() - wait_start
+            self.pool_stats['wait_time_total'] += waited
+            self.pool_stats['wait_time_max'] = max(self.pool_stats['wait_time_max'], waited)
+            
+            conn = self._checkout()
+            self.pool_stats['checkouts'] += 1
+            self.pool_stats['in_use'] += 1
+            self.pool_stats['peak_in_use'] = max(self.pool_stats['peak_in_use'], self.pool_stats['in_use'])
+            
             yield conn
             conn.commit()
         except psycopg2.Error as e:
-            if conn:
+            if conn and not conn.closed:
                 conn.rollback()
             logger.error(f"Database error: {e}")
             raise
+        except BaseException:
+            # Never hand a connection with an open transaction back to the pool
+            if conn and not conn.closed:
+                conn.rollback()
+            raise
         finally:
             if conn:
-                conn.close()
+                self.pool_stats['in_use'] -= 1
+                if conn.closed:
+                    self._discard(conn)
+                else:
+                    self._last_used[id(conn)] = time.monotonic()
+                    self._pool.putconn(conn)
+            self._pool_slots.release()
+    
+    def get_pool_stats(self):
+        """
+        Get connection pool statistics.
+        
+        Returns:
+            dict: Pool size, utilisation, checkout wait times and error counters
+        """
+        stats = dict(self.pool_stats)
+        checkouts = stats['checkouts']
+        stats['max_size'] = config.DB_POOL_MAX_SIZE
+        stats['utilisation'] = stats['in_use'] / config.DB_POOL_MAX_SIZE
+        stats['wait_time_avg'] = stats['wait_time_total'] / checkouts if checkouts else 0.0
+        return stats
+    
+    def close(self):
+        """Close every pooled connection and log how the pool was used"""
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+            self._last_used.clear()
+            stats = self.get_pool_stats()
+            logger.info(
+                f"Database pool closed ({stats['checkouts']} checkouts, "
+                f"peak {stats['peak_in_use']}/{stats['max_size']} in use, "
+                f"avg wait {stats['wait_time_avg'] * 1000:.1f}ms, "
+                f"{stats['timeouts']} timeouts, {stats['discarded']} discarded)"
+            )
     
     def init_database(self):
         """
@@ -110,7 +454,88 @@ class Database:
                     )
                 """)
                 
-                # Alert history table
+                # Latest known counts per course/index
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS index_state (
+                        course_code VARCHAR(50) NOT NULL,
+                        index_number VARCHAR(50) NOT NULL,
+                        vacancy_count INTEGER NOT NULL,
+                        waitlist_count INTEGER NOT NULL,
+                        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (course_code, index_number)
+                    )
+                """)
+                
+                # Index history table - one row per course/index change, shared by all alerts.
+                # Range-partitioned by month so expired data is dropped a partition at a time
+                legacy_history = self._rename_unpartitioned_history(cursor)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS index_history (
+                        id BIGSERIAL,
+                        course_code VARCHAR(50) NOT NULL,
+                        index_number VARCHAR(50) NOT NULL,
+                        vacancy_count INTEGER NOT NULL,
+                        waitlist_count INTEGER NOT NULL,
+                        checked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (id, checked_at)
+                    ) PARTITION BY RANGE (checked_at)
+                """)
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {HISTORY_DEFAULT_PARTITION} PARTITION OF index_history DEFAULT"
+                )
+                
+                current_month = date.today().replace(day=1)
+                first_month = current_month
+                if legacy_history:
+                    cursor.execute("SELECT MIN(checked_at) FROM index_history_unpartitioned")
+                    oldest = cursor.fetchone()[0]
+                    if oldest:
+                        first_month = min(first_month, oldest.date().replace(day=1))
+                
+                created = self._create_history_partitions(
+                    cursor,
+                    first_month,
+                    _add_months(current_month, config.HISTORY_PARTITIONS_AHEAD)
+                )
+                if legacy_history:
+                    self._copy_unpartitioned_history(cursor)
+                
+                # Alert notifications table - one row per notification sent
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS alert_notifications (
+                        id SERIAL PRIMARY KEY,
+                        alert_id INTEGER REFERENCES alerts(id) ON DELETE CASCADE,
+                        telegram_id BIGINT REFERENCES users(telegram_id) ON DELETE CASCADE,
+                        course_code VARCHAR(50) NOT NULL,
+                        index_number VARCHAR(50) NOT NULL,
+                        vacancy_count INTEGER NOT NULL,
+                        waitlist_count INTEGER NOT NULL,
+                        notified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
+                # Notifications waiting for delivery, written in the same transaction
+                # as the vacancy transition; one row per alert per transition
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS notification_outbox (
+                        id BIGSERIAL PRIMARY KEY,
+                        alert_id INTEGER REFERENCES alerts(id) ON DELETE CASCADE,
+                        telegram_id BIGINT REFERENCES users(telegram_id) ON DELETE CASCADE,
+                        course_code VARCHAR(50) NOT NULL,
+                        index_number VARCHAR(50) NOT NULL,
+                        vacancy_count INTEGER NOT NULL,
+                        waitlist_count INTEGER NOT NULL,
+                        status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                        last_error TEXT,
+                        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                        delivered_at TIMESTAMP,
+                        UNIQUE (alert_id, created_at)
+                    )
+                """)
+                
+                # Legacy per-alert history table (no longer written, kept for existing data)
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS alert_history (
                         id SERIAL PRIMARY KEY,
@@ -131,6 +556,91 @@ class Database:
                     ON alerts(is_active, last_checked)
                 """)
                 
+                # Publish subscription changes for the checker's in-memory index. Only
+                # membership, pause and vacancy changes notify, so routine check
+                # updates (last_checked) stay silent
+                cursor.execute(f"""
+                    CREATE OR REPLACE FUNCTION notify_alert_change() RETURNS trigger AS $$
+                    BEGIN
+                        IF TG_OP = 'DELETE' THEN
+                            PERFORM pg_notify('{SUBSCRIPTION_CHANNEL}', 'alert:' || OLD.id);
+                        ELSE
+                            PERFORM pg_notify('{SUBSCRIPTION_CHANNEL}', 'alert:' || NEW.id);
+                        END IF;
+                        RETURN NULL;
+                    END;
+                    $$ LANGUAGE plpgsql
+                """)
+                
+                cursor.execute(f"""
+                    CREATE OR REPLACE FUNCTION notify_user_change() RETURNS trigger AS $$
+                    BEGIN
+                        PERFORM pg_notify('{SUBSCRIPTION_CHANNEL}', 'user:' || NEW.telegram_id);
+                        RETURN NULL;
+                    END;
+                    $$ LANGUAGE plpgsql
+                """)
+                
+                cursor.execute("""
+                    DROP TRIGGER IF EXISTS alerts_subscription_membership ON alerts;
+                    CREATE TRIGGER alerts_subscription_membership
+                    AFTER INSERT OR DELETE ON alerts
+                    FOR EACH ROW EXECUTE FUNCTION notify_alert_change()
+                """)
+                
+                cursor.execute("""
+                    DROP TRIGGER IF EXISTS alerts_subscription_update ON alerts;
+                    CREATE TRIGGER alerts_subscription_update
+                    AFTER UPDATE ON alerts
+                    FOR EACH ROW
+                    WHEN (
+                        OLD.is_active IS DISTINCT FROM NEW.is_active
+                        OR OLD.telegram_id IS DISTINCT FROM NEW.telegram_id
+                        OR OLD.course_code IS DISTINCT FROM NEW.course_code
+                        OR OLD.index_number IS DISTINCT FROM NEW.index_number
+                        OR OLD.last_vacancy_count IS DISTINCT FROM NEW.last_vacancy_count
+                    )
+                    EXECUTE FUNCTION notify_alert_change()
+                """)
+                
+                # Deleted users cascade to their alerts, which notify on their own
+                cursor.execute("""
+                    DROP TRIGGER IF EXISTS users_subscription_update ON users;
+                    CREATE TRIGGER users_subscription_update
+                    AFTER UPDATE ON users
+                    FOR EACH ROW
+                    WHEN (
+                        OLD.is_active IS DISTINCT FROM NEW.is_active
+                        OR OLD.is_paused IS DISTINCT FROM NEW.is_paused
+                        OR OLD.paused_until IS DISTINCT FROM NEW.paused_until
+                    )
+                    EXECUTE FUNCTION notify_user_change()
+                """)
+                
+                # Covering partial index for the grouped subscription query
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_alerts_active_subscriptions 
+                    ON alerts(course_code, index_number) 
+                    INCLUDE (id, telegram_id, last_vacancy_count) 
+                    WHERE is_active = TRUE
+                """)
+                
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_index_history_lookup 
+                    ON index_history(course_code, index_number, checked_at DESC)
+                """)
+                
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_alert_notifications_alert_id 
+                    ON alert_notifications(alert_id, notified_at DESC)
+                """)
+                
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_notification_outbox_pending 
+                    ON notification_outbox(next_attempt_at) 
+                    WHERE status = 'pending'
+                """)
+                
                 cursor.execute("""
                     CREATE INDEX IF NOT EXISTS idx_alert_history_alert_id 
                     ON alert_history(alert_id, checked_at DESC)
@@ -146,13 +656,148 @@ class Database:
                     ON alert_history(telegram_id, alert_id, checked_at DESC)
                 """)
                 
+                removed = self._expire_history_partitions(cursor, current_month)
+                
                 conn.commit()
+                _log_history_maintenance(created, removed)
                 logger.info("Database tables initialized successfully")
                 return True
         except Exception as e:
             logger.error(f"Failed to initialize database: {e}")
             raise
     
+    # History partition maintenance
+    
+    def _rename_unpartitioned_history(self, cursor):
+        """
+        Move a plain (pre-partitioning) index_history table out of the way.
+        
+        Args:
+            cursor: Cursor of the caller's transaction
+        
+        Returns:
+            bool: True if a plain table was found and renamed
+        """
+        cursor.execute("""
+            SELECT relkind FROM pg_class 
+            WHERE oid = to_regclass('index_history')
+        """)
+        row = cursor.fetchone()
+        if not row or row[0] != 'r':
+            return False
+        
+        # Free the names the partitioned table will use
+        cursor.execute("ALTER TABLE index_history RENAME TO index_history_unpartitioned")
+        cursor.execute("ALTER INDEX IF EXISTS index_history_pkey RENAME TO index_history_unpartitioned_pkey")
+        cursor.execute("ALTER SEQUENCE IF EXISTS index_history_id_seq RENAME TO index_history_unpartitioned_id_seq")
+        cursor.execute("DROP INDEX IF EXISTS idx_index_history_lookup")
+        logger.info("Migrating existing index_history table to monthly partitions")
+        return True
+    
+    def _copy_unpartitioned_history(self, cursor):
+        """
+        Copy rows of the renamed plain index_history table into the
+        partitioned one, then drop it.
+        
+        Args:
+            cursor: Cursor of the caller's transaction
+        """
+        cursor.execute("""
+            INSERT INTO index_history (
+                id, course_code, index_number, vacancy_count, waitlist_count, checked_at
+            )
+            SELECT id, course_code, index_number, vacancy_count, waitlist_count,
+                   COALESCE(checked_at, CURRENT_TIMESTAMP)
+            FROM index_history_unpartitioned
+        """)
+        copied = cursor.rowcount
+        cursor.execute("""
+            SELECT setval(pg_get_serial_sequence('index_history', 'id'), COALESCE(MAX(id), 0) + 1, false)
+            FROM index_history
+        """)
+        cursor.execute("DROP TABLE index_history_unpartitioned")
+        logger.info(f"Copied {copied} history rows into partitioned index_history")
+    
+    def _history_partitions(self, cursor):
+        """
+        List the monthly partitions attached to index_history.
+        
+        Args:
+            cursor: Cursor of the caller's transaction
+        
+        Returns:
+            dict: First day of month -> partition name
+        """
+        cursor.execute(HISTORY_PARTITIONS_QUERY)
+        return _history_partition_months(name for (name,) in cursor.fetchall())
+    
+    def _create_history_partitions(self, cursor, first_month, last_month):
+        """
+        Create any missing monthly partitions in a month range, and for
+        months whose rows ended up in the default partition.
+        
+        Args:
+            cursor: Cursor of the caller's transaction
+            first_month (date): First day of the first month to cover
+            last_month (date): First day of the last month to cover
+        
+        Returns:
+            list: Names of the partitions created
+        """
+        partitions = self._history_partitions(cursor)
+        cursor.execute(HISTORY_DEFAULT_MONTHS_QUERY)
+        default_months = [month for (month,) in cursor.fetchall()]
+        
+        created = []
+        for month in _missing_history_months(partitions, first_month, last_month, default_months):
+            name, statements = _history_partition_statements(month)
+            for statement in statements:
+                cursor.execute(statement)
+            created.append(name)
+        return created
+    
+    def _expire_history_partitions(self, cursor, current_month):
+        """
+        Drop (or detach, to keep them as archive tables) partitions older
+        than the configured retention. Data is never removed row by row.
+        
+        Args:
+            cursor: Cursor of the caller's transaction
+            current_month (date): First day of the current month
+        
+        Returns:
+            list: Names of the partitions removed from index_history
+        """
+        expired = _expired_history_partitions(self._history_partitions(cursor), current_month)
+        for name in expired:
+            cursor.execute(_history_expiry_statement(name))
+        return expired
+    
+    def maintain_history_partitions(self):
+        """
+        Pre-create upcoming monthly history partitions and remove expired ones.
+        Safe to run repeatedly; the checker runs it once a day.
+        
+        Returns:
+            dict: Lists of 'created' and 'removed' partition names
+        """
+        current_month = date.today().replace(day=1)
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                created = self._create_history_partitions(
+                    cursor,
+                    current_month,
+                    _add_months(current_month, config.HISTORY_PARTITIONS_AHEAD)
+                )
+                removed = self._expire_history_partitions(cursor, current_month)
+                conn.commit()
+                _log_history_maintenance(created, removed)
+                return {'created': created, 'removed': removed}
+        except Exception as e:
+            logger.error(f"Failed to maintain history partitions: {e}")
+            raise
+    
     # User operations
     def add_user(self, telegram_id, username):
         """
@@ -511,6 +1156,44 @@ class Database:
             logger.error(f"Failed to get all active alerts: {e}")
             return []
     
+    def get_subscription_groups(self):
+        """
+        Get active alerts pre-grouped by course/index.
+        Aggregated in SQL and streamed through a server-side cursor, so one
+        row is transferred per course/index instead of one per alert.
+        Excludes alerts for paused users.
+        
+        Returns:
+            list: Work units ordered by course, each a dict with 'course_code',
+                  'index_number' and 'alerts' (alert dicts with 'id', 'telegram_id',
+                  'course_code', 'index_number' and 'last_vacancy_count')
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor(name='subscription_groups')
+                cursor.itersize = SUBSCRIPTION_BATCH_SIZE
+                cursor.execute("""
+                    SELECT 
+                        a.course_code, a.index_number,
+                        array_agg(a.id ORDER BY a.id) AS alert_ids,
+                        array_agg(a.telegram_id ORDER BY a.id) AS telegram_ids,
+                        array_agg(a.last_vacancy_count ORDER BY a.id) AS last_vacancy_counts
+                    FROM alerts a
+                    JOIN users u ON a.telegram_id = u.telegram_id
+                    WHERE a.is_active = TRUE 
+                    AND u.is_active = TRUE
+                    AND (
+                        u.is_paused = FALSE 
+                        OR (u.is_paused = TRUE AND u.paused_until IS NOT NULL AND u.paused_until < CURRENT_TIMESTAMP)
+                    )
+                    GROUP BY a.course_code, a.index_number
+                    ORDER BY a.course_code, a.index_number
+                """)
+                return [_subscription_group(*row) for row in cursor]
+        except Exception as e:
+            logger.error(f"Failed to get subscription groups: {e}")
+            return []
+    
     def remove_alert(self, alert_id, telegram_id):
         """
         Remove an alert (soft delete).
@@ -540,9 +1223,56 @@ class Database:
             logger.error(f"Failed to remove alert {alert_id}: {e}")
             raise
     
+    def _record_index_states(self, cursor, states):
+        """
+        Store the latest counts of each course/index and log history rows
+        only for indexes whose vacancy or waitlist actually changed.
+        
+        Args:
+            cursor: Cursor of the caller's transaction
+            states (dict): (course_code, index_number) -> (vacancy_count, waitlist_count)
+        
+        Returns:
+            int: Number of indexes that changed
+        """
+        if not states:
+            return 0
+        
+        rows = [
+            (course_code, index_number, vacancy_count, waitlist_count)
+            for (course_code, index_number), (vacancy_count, waitlist_count) in states.items()
+        ]
+        
+        # The upsert only touches rows whose counts differ, and RETURNING feeds
+        # exactly those rows into the history table
+        execute_values(cursor, """
+            WITH observed (course_code, index_number, vacancy_count, waitlist_count) AS (
+                VALUES %s
+            ),
+            changed AS (
+                INSERT INTO index_state AS s (
+                    course_code, index_number, vacancy_count, waitlist_count, changed_at
+                )
+                SELECT course_code, index_number, vacancy_count, waitlist_count, CURRENT_TIMESTAMP
+                FROM observed
+                ON CONFLICT (course_code, index_number) DO UPDATE
+                SET vacancy_count = EXCLUDED.vacancy_count,
+                    waitlist_count = EXCLUDED.waitlist_count,
+                    changed_at = EXCLUDED.changed_at
+                WHERE (s.vacancy_count, s.waitlist_count)
+                      IS DISTINCT FROM (EXCLUDED.vacancy_count, EXCLUDED.waitlist_count)
+                RETURNING s.course_code, s.index_number, s.vacancy_count, s.waitlist_count, s.changed_at
+            )
+            INSERT INTO index_history (
+                course_code, index_number, vacancy_count, waitlist_count, checked_at
+            )
+            SELECT * FROM changed
+        """, rows, template="(%s, %s, %s::integer, %s::integer)", page_size=len(rows))
+        return cursor.rowcount
+    
     def update_alert_check(self, alert_id, vacancy_count, waitlist_count):
         """
-        Update alert check information and log history.
+        Update alert check information and log index history on change.
         
         Args:
             alert_id (int): Alert ID
@@ -556,46 +1286,122 @@ class Database:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 
-                # Get alert details for history
+                # Update alert
                 cursor.execute("""
-                    SELECT telegram_id, course_code, index_number 
-                    FROM alerts 
+                    UPDATE alerts 
+                    SET last_checked = CURRENT_TIMESTAMP,
+                        last_vacancy_count = %s
                     WHERE id = %s
-                """, (alert_id,))
+                    RETURNING course_code, index_number
+                """, (vacancy_count, alert_id))
                 alert_info = cursor.fetchone()
                 
                 if not alert_info:
                     logger.warning(f"Alert {alert_id} not found for update")
                     return False
                 
-                telegram_id, course_code, index_number = alert_info
+                course_code, index_number = alert_info
+                self._record_index_states(cursor, {(course_code, index_number): (vacancy_count, waitlist_count)})
                 
-                # Update alert
-                cursor.execute("""
-                    UPDATE alerts 
-                    SET last_checked = CURRENT_TIMESTAMP,
-                        last_vacancy_count = %s
-                    WHERE id = %s
-                """, (vacancy_count, alert_id))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Failed to update alert check for {alert_id}: {e}")
+            raise
+    
+    def record_checks(self, results, unchanged_ids=()):
+        """
+        Record a whole check cycle in one transaction.
+        Updates every alert with a single set-based statement, logs index
+        history once per course/index and only on change, and queues an
+        outbox notification for every alert whose vacancies went from 0 to
+        positive. The transition is judged against the stored count, so a
+        notification is queued exactly when the new count is committed.
+        
+        Args:
+            results (list): Check results, each a dict with 'alert_id', 'course_code',
+                            'index_number', 'vacancy' and 'waitlist'
+            unchanged_ids (list): Alerts checked on an unchanged page; only their
+                                  last_checked is bumped
+        
+        Returns:
+            dict: 'recorded' alerts (alerts deleted meanwhile are skipped) and
+                  'queued' notifications
+        """
+        if not results and not unchanged_ids:
+            return {'recorded': 0, 'queued': 0}
+        
+        rows = [(result['alert_id'], result['vacancy'], result['waitlist']) for result in results]
+        states = {
+            (result['course_code'], result['index_number']): (result['vacancy'], result['waitlist'])
+            for result in results
+        }
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
                 
-                # Log history with denormalized data
-                cursor.execute("""
-                    INSERT INTO alert_history (
-                        alert_id, telegram_id, course_code, index_number,
-                        vacancy_count, waitlist_count
+                if unchanged_ids:
+                    cursor.execute(
+                        "UPDATE alerts SET last_checked = CURRENT_TIMESTAMP WHERE id = ANY(%s)",
+                        (list(unchanged_ids),)
+                    )
+                if not rows:
+                    conn.commit()
+                    return {'recorded': 0, 'queued': 0}
+                
+                # Every part of the statement sees the same snapshot, so 'previous'
+                # still holds the counts from before the UPDATE
+                recorded, queued = execute_values(cursor, """
+                    WITH checks (alert_id, vacancy_count, waitlist_count) AS (
+                        VALUES %s
+                    ),
+                    previous AS (
+                        SELECT a.id, a.last_vacancy_count
+                        FROM alerts a
+                        JOIN checks c ON a.id = c.alert_id
+                    ),
+                    updated AS (
+                        UPDATE alerts AS a
+                        SET last_checked = CURRENT_TIMESTAMP,
+                            last_vacancy_count = c.vacancy_count
+                        FROM checks c
+                        WHERE a.id = c.alert_id
+                        RETURNING a.id, a.telegram_id, a.course_code, a.index_number,
+                                  c.vacancy_count, c.waitlist_count
+                    ),
+                    queued AS (
+                        INSERT INTO notification_outbox (
+                            alert_id, telegram_id, course_code, index_number,
+                            vacancy_count, waitlist_count
+                        )
+                        SELECT u.id, u.telegram_id, u.course_code, u.index_number,
+                               u.vacancy_count, u.waitlist_count
+                        FROM updated u
+                        JOIN previous p ON p.id = u.id
+                        WHERE COALESCE(p.last_vacancy_count, 0) = 0 AND u.vacancy_count > 0
+                        ON CONFLICT (alert_id, created_at) DO NOTHING
+                        RETURNING 1
                     )
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, (alert_id, telegram_id, course_code, index_number, vacancy_count, waitlist_count))
+                    SELECT (SELECT COUNT(*) FROM updated), (SELECT COUNT(*) FROM queued)
+                """, rows, template="(%s::integer, %s::integer, %s::integer)",
+                    page_size=len(rows), fetch=True)[0]
+                
+                changed = self._record_index_states(cursor, states)
                 
                 conn.commit()
-                return True
+                logger.debug(
+                    f"Recorded {recorded} alert checks in one transaction "
+                    f"({changed} of {len(states)} indexes changed, {queued} notifications queued)"
+                )
+                return {'recorded': recorded, 'queued': queued}
         except Exception as e:
-            logger.error(f"Failed to update alert check for {alert_id}: {e}")
+            logger.error(f"Failed to record {len(rows)} alert checks: {e}")
             raise
     
     def mark_notification_sent(self, alert_id):
         """
-        Mark the latest history entry as notified.
+        Record that the alert's user was notified about its current counts.
         
         Args:
             alert_id (int): Alert ID
@@ -606,16 +1412,21 @@ class Database:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
+                
+                # Timestamped with the index's last change so it lines up with that history row
                 cursor.execute("""
-                    UPDATE alert_history 
-                    SET notification_sent = TRUE
-                    WHERE alert_id = %s AND id = (
-                        SELECT id FROM alert_history 
-                        WHERE alert_id = %s 
-                        ORDER BY checked_at DESC 
-                        LIMIT 1
+                    INSERT INTO alert_notifications (
+                        alert_id, telegram_id, course_code, index_number,
+                        vacancy_count, waitlist_count, notified_at
                     )
-                """, (alert_id, alert_id))
+                    SELECT a.id, a.telegram_id, a.course_code, a.index_number,
+                           a.last_vacancy_count, COALESCE(s.waitlist_count, 0),
+                           COALESCE(s.changed_at, CURRENT_TIMESTAMP)
+                    FROM alerts a
+                    LEFT JOIN index_state s
+                        ON s.course_code = a.course_code AND s.index_number = a.index_number
+                    WHERE a.id = %s
+                """, (alert_id,))
                 conn.commit()
                 return True
         except Exception as e:
@@ -625,6 +1436,9 @@ class Database:
     def get_alert_history(self, alert_id, limit=10):
         """
         Get history for an alert.
+        Built from the shared per-index history since the alert was created,
+        with the same columns as the former per-alert history rows, which
+        are included too.
         
         Args:
             alert_id (int): Alert ID
@@ -637,11 +1451,38 @@ class Database:
             with self.get_connection() as conn:
                 cursor = conn.cursor(cursor_factory=RealDictCursor)
                 cursor.execute("""
-                    SELECT * FROM alert_history 
-                    WHERE alert_id = %s 
-                    ORDER BY checked_at DESC 
+                    (
+                        SELECT
+                            h.id, a.id AS alert_id, a.telegram_id,
+                            h.course_code, h.index_number,
+                            h.vacancy_count, h.waitlist_count, h.checked_at,
+                            EXISTS (
+                                SELECT 1 FROM alert_notifications n
+                                WHERE n.alert_id = a.id AND n.notified_at = h.checked_at
+                            ) AS notification_sent
+                        FROM alerts a
+                        JOIN index_history h
+                            ON h.course_code = a.course_code AND h.index_number = a.index_number
+                            AND h.checked_at >= a.created_at
+                        WHERE a.id = %s
+                        ORDER BY h.checked_at DESC
+                        LIMIT %s
+                    )
+                    UNION ALL
+                    (
+                        SELECT
+                            id, alert_id, telegram_id,
+                            course_code, index_number,
+                            vacancy_count, waitlist_count, checked_at,
+                            notification_sent
+                        FROM alert_history
+                        WHERE alert_id = %s
+                        ORDER BY checked_at DESC
+                        LIMIT %s
+                    )
+                    ORDER BY checked_at DESC
                     LIMIT %s
-                """, (alert_id, limit))
+                """, (alert_id, limit, alert_id, limit, limit))
                 return cursor.fetchall()
         except Exception as e:
             logger.error(f"Failed to get history for alert {alert_id}: {e}")
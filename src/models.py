@@ -0,0 +1,117 @@
+"""
+Data Models Module
+Compact slotted types for parsed course indexes and class sessions
+"""
+
+import sys
+from collections.abc import Mapping
+
+
+class _RecordView(Mapping):
+    """
+    Read-only dict-compatible view over a slotted record.
+    Lets records be used wherever code expects the original dicts
+    (record['key'], .get(), .items(), comparison with a dict).
+    """
+    
+    __slots__ = ()
+    _fields = ()
+    
+    def __getitem__(self, key):
+        """Get a field by name like a dict"""
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __iter__(self):
+        """Iterate over field names like a dict"""
+        return iter(self._fields)
+    
+    def __len__(self):
+        """Number of fields"""
+        return len(self._fields)
+    
+    def __eq__(self, other):
+        """Compare equal to records or dicts with the same content"""
+        if isinstance(other, _RecordView):
+            other = other.to_dict()
+        elif not isinstance(other, Mapping):
+            return NotImplemented
+        return self.to_dict() == dict(other)
+    
+    __hash__ = None
+    
+    def to_dict(self):
+        """
+        Convert to a plain dictionary.
+        
+        Returns:
+            dict: Field name -> value
+        """
+        return {field: getattr(self, field) for field in self._fields}
+    
+    def __repr__(self):
+        """String representation"""
+        fields = ', '.join(f"{field}={getattr(self, field)!r}" for field in self._fields)
+        return f"{type(self).__name__}({fields})"
+
+
+class ClassSession(_RecordView):
+    """
+    One class session of an index (lecture, tutorial, lab...).
+    Repeated strings are interned so identical values share memory.
+    
+    Attributes:
+        type (str): Class type (e.g., 'LEC')
+        group (str): Group (e.g., 'LE1')
+        day (str): Day (e.g., 'MON')
+        time (str): Time range (e.g., '0830-1030')
+        venue (str): Venue (e.g., 'LT1A')
+    """
+    
+    __slots__ = ('type', 'group', 'day', 'time', 'venue')
+    _fields = __slots__
+    
+    def __init__(self, type, group, day, time, venue):
+        """Initialize a class session"""
+        self.type = sys.intern(type)
+        self.group = sys.intern(group)
+        self.day = sys.intern(day)
+        self.time = sys.intern(time)
+        self.venue = sys.intern(venue)
+
+
+class IndexInfo(_RecordView):
+    """
+    Vacancy information and class sessions of one course index.
+    
+    Attributes:
+        index (str): Index number (e.g., '10294')
+        vacancy (int): Available vacancies
+        waitlist (int): Waitlist length
+        classes (tuple): ClassSession entries
+    """
+    
+    __slots__ = ('index', 'vacancy', 'waitlist', 'classes')
+    _fields = __slots__
+    
+    def __init__(self, index, vacancy, waitlist, classes=()):
+        """Initialize index information"""
+        self.index = index
+        self.vacancy = vacancy
+        self.waitlist = waitlist
+        self.classes = tuple(classes)
+    
+    def to_dict(self):
+        """
+        Convert to a plain dictionary, including the class sessions.
+        
+        Returns:
+            dict: Same layout as the original parser output
+        """
+        return {
+            'index': self.index,
+            'vacancy': self.vacancy,
+            'waitlist': self.waitlist,
+            'classes': [session.to_dict() for session in self.classes]
+        }
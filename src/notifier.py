@@ -0,0 +1,193 @@
+"""
+Notification Dispatcher Module
+Concurrent, rate-limited delivery of Telegram messages
+"""
+
+import asyncio
+import time
+from datetime import timedelta
+from telegram.error import NetworkError, RetryAfter, TimedOut
+from .logger import get_logger
+from .rate_limiter import TokenBucket
+
+logger = get_logger(__name__)
+
+
+class NotificationDispatcher:
+    """
+    Queue of outgoing Telegram messages drained by concurrent senders.
+    Every send takes a token from a global messages/second bucket and
+    respects a minimum spacing per chat, matching Telegram's bot limits.
+    RetryAfter (flood control) pauses all senders for the requested time
+    before the message is retried; timeouts and network errors are retried
+    with backoff.
+    
+    Attributes:
+        concurrency (int): Number of concurrent senders
+        per_chat_interval (float): Minimum seconds between messages to one chat
+        max_retries (int): Retries per message after the first attempt
+    """
+    
+    def __init__(self, concurrency, rate, per_chat_interval, max_retries):
+        """
+        Initialize the dispatcher.
+        
+        Args:
+            concurrency (int): Number of concurrent senders
+            rate (float): Global messages per second
+            per_chat_interval (float): Minimum seconds between messages to one chat
+            max_retries (int): Retries per message after the first attempt
+        """
+        self.concurrency = max(1, concurrency)
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max(0, max_retries)
+        self.bucket = TokenBucket(rate, max(1, int(rate)))
+        
+        self.bot = None
+        self._queue = asyncio.Queue()
+        self._workers = []
+        self._next_slot = {}   # chat id -> monotonic time its next message may go out
+        self._paused_until = 0.0
+        self.stats = {
+            'sent': 0,
+            'failed': 0,
+            'retried': 0,
+            'rate_limited': 0,
+            'max_delay': 0.0
+        }
+    
+    def start(self, bot):
+        """
+        Start the senders.
+        
+        Args:
+            bot (telegram.Bot): Bot used to send messages
+        """
+        self.bot = bot
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+            logger.info(f"Notification dispatcher started ({self.concurrency} senders)")
+    
+    async def stop(self):
+        """Stop the senders; messages still queued are reported as not delivered"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        
+        while not self._queue.empty():
+            _, _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_result(False)
+    
+    def submit(self, chat_id, **message):
+        """
+        Queue a message for delivery.
+        
+        Args:
+            chat_id (int): Telegram chat ID
+            **message: Keyword arguments for Bot.send_message (text, parse_mode, reply_markup...)
+        
+        Returns:
+            asyncio.Future: Resolves to True once delivered, False if delivery failed
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((chat_id, dict(message, chat_id=chat_id), future, time.monotonic()))
+        return future
+    
+    async def _wait_for_chat(self, chat_id):
+        """
+        Reserve the chat's next send slot and sleep until it arrives.
+        
+        Args:
+            chat_id (int): Telegram chat ID
+        """
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(chat_id, 0.0))
+        self._next_slot[chat_id] = slot + self.per_chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        
+        # Forget chats that have been idle long enough
+        if len(self._next_slot) > 10000:
+            self._next_slot = {chat: t for chat, t in self._next_slot.items() if t > now}
+    
+    async def _deliver(self, chat_id, message):
+        """
+        Send one message, retrying flood control and transient errors.
+        
+        Args:
+            chat_id (int): Telegram chat ID
+            message (dict): Keyword arguments for Bot.send_message
+        
+        Returns:
+            bool: True if the message was delivered
+        """
+        for attempt in range(self.max_retries + 1):
+            # Global pause after flood control
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            
+            await self._wait_for_chat(chat_id)
+            await self.bucket.acquire()
+            
+            try:
+                await self.bot.send_message(**message)
+                return True
+            except RetryAfter as e:
+                # retry_after is an int (seconds) or a timedelta depending on the library version
+                delay = e.retry_after
+                if isinstance(delay, timedelta):
+                    delay = delay.total_seconds()
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                self.stats['rate_limited'] += 1
+                logger.warning(f"Telegram flood control: pausing notifications for {delay}s")
+            except (TimedOut, NetworkError) as e:
+                logger.warning(f"Transient error sending to {chat_id} (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(min(2 ** attempt, 30))
+            except Exception as e:
+                # Blocked bot, deleted chat, bad request... retrying will not help
+                logger.error(f"Failed to send message to {chat_id}: {e}")
+                return False
+            
+            if attempt < self.max_retries:
+                self.stats['retried'] += 1
+        
+        logger.error(f"Giving up on message to {chat_id} after {self.max_retries + 1} attempts")
+        return False
+    
+    async def _worker(self):
+        """Sender loop"""
+        while True:
+            chat_id, message, future, queued_at = await self._queue.get()
+            # The submitter gave up on this message (e.g. the outbox is shutting down)
+            if future.cancelled():
+                self._queue.task_done()
+                continue
+            
+            try:
+                delivered = await self._deliver(chat_id, message)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.set_result(False)
+                raise
+            except Exception as e:
+                logger.error(f"Notification sender error: {e}")
+                delivered = False
+            finally:
+                self._queue.task_done()
+            
+            self.stats['sent' if delivered else 'failed'] += 1
+            self.stats['max_delay'] = max(self.stats['max_delay'], time.monotonic() - queued_at)
+            if not future.done():
+                future.set_result(delivered)
+    
+    def get_stats(self):
+        """
+        Get dispatcher statistics.
+        
+        Returns:
+            dict: Sent/failed/retried counters, queue length and longest time from submit to delivery
+        """
+        return {**self.stats, 'queued': self._queue.qsize()}
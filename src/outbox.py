@@ -0,0 +1,208 @@
+"""
+Notification Outbox Module
+Delivers queued vacancy notifications from the database with retries
+"""
+
+import asyncio
+from .async_database import adb
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Days delivered and failed outbox rows are kept before purging
+OUTBOX_RETENTION_DAYS = 7
+
+# Seconds stop() waits for the delivery round in flight before cancelling it
+OUTBOX_STOP_TIMEOUT = 30
+
+
+class NotificationOutbox:
+    """
+    Worker that drains the notification_outbox table.
+    Rows are written by AsyncDatabase.record_checks in the same transaction
+    as the vacancy transition, so a notification exists exactly when the
+    new count is stored. The worker claims due rows, sends them through the
+    dispatcher and marks them delivered; failed sends are retried with
+    exponential backoff. Delivery is at-least-once: a crash between sending
+    and marking resends that batch once its lease expires.
+    
+    All pending notifications of a chat are coalesced into one message, so
+    a course opening several watched indexes costs one send per user. After
+    a wake-up the worker waits `digest_window` seconds so notifications
+    queued in quick succession end up in the same message.
+    
+    Attributes:
+        batch_size (int): Chats claimed per round
+        poll_interval (float): Seconds between rounds when idle
+        digest_window (float): Seconds to collect notifications after a wake-up
+        max_attempts (int): Attempts before a notification is given up on
+        retry_delay (float): Delay before the second attempt; doubles each attempt
+        lease (float): Seconds a claimed row stays reserved for this worker
+    """
+    
+    def __init__(self, dispatcher, render, batch_size, poll_interval, digest_window,
+                 max_attempts, retry_delay, lease):
+        """
+        Initialize the worker.
+        
+        Args:
+            dispatcher (NotificationDispatcher): Sends the messages
+            render (callable): Builds Bot.send_message kwargs (without chat_id) from
+                               the outbox rows of one chat
+            batch_size (int): Chats claimed per round
+            poll_interval (float): Seconds between rounds when idle
+            digest_window (float): Seconds to collect notifications after a wake-up
+            max_attempts (int): Attempts before a notification is given up on
+            retry_delay (float): Delay before the second attempt; doubles each attempt
+            lease (float): Seconds a claimed row stays reserved for this worker
+        """
+        self.dispatcher = dispatcher
+        self.render = render
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self.digest_window = max(0.0, digest_window)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self.lease = lease
+        
+        self._wake = asyncio.Event()
+        self._task = None
+        self._stopping = False
+        self.stats = {'delivered': 0, 'messages': 0, 'coalesced': 0, 'retried': 0, 'given_up': 0}
+    
+    def start(self):
+        """Start draining in the background; rows left from a previous run go first"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info("Notification outbox worker started")
+    
+    async def stop(self, timeout=OUTBOX_STOP_TIMEOUT):
+        """
+        Stop the worker once the delivery round in flight has been recorded.
+        A round still running after `timeout` seconds is cancelled; what it
+        already sent is marked delivered and the rest is picked up again on
+        the next start.
+        
+        Args:
+            timeout (float): Seconds to wait for the round in flight
+        """
+        if self._task is None:
+            return
+        
+        self._stopping = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Outbox round still running after {timeout}s, cancelling it")
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        except Exception:
+            pass  # Errors of the last round are already logged
+        finally:
+            self._task = None
+            self._stopping = False
+    
+    def wake(self):
+        """Drain now instead of waiting for the next poll, e.g. right after new rows were queued"""
+        self._wake.set()
+    
+    async def _run(self):
+        """Drain loop"""
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                claimed = await self.drain_once()
+            except Exception as e:
+                logger.error(f"Outbox delivery round failed: {e}")
+                claimed = 0
+            
+            # A full batch means more rows are probably due
+            if claimed >= self.batch_size or self._stopping:
+                continue
+            
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                continue
+            
+            # New rows were queued; give related ones a moment to join them
+            if self.digest_window and not self._stopping:
+                await asyncio.sleep(self.digest_window)
+    
+    async def drain_once(self):
+        """
+        Claim the due notifications of one batch of chats and send each
+        chat a single message.
+        
+        Returns:
+            int: Number of chats claimed
+        """
+        rows = await adb.claim_outbox(self.batch_size, self.lease)
+        if not rows:
+            return 0
+        
+        by_chat = {}
+        for row in rows:
+            by_chat.setdefault(row['telegram_id'], []).append(row)
+        
+        futures = [
+            self.dispatcher.submit(chat_id, **self.render(chat_rows))
+            for chat_id, chat_rows in by_chat.items()
+        ]
+        try:
+            results = await asyncio.gather(*(asyncio.shield(future) for future in futures))
+        except asyncio.CancelledError:
+            # Drop messages not sent yet, but record the ones that went out
+            # so they are not sent again once the lease expires
+            for future in futures:
+                future.cancel()
+            sent = [
+                row['id']
+                for chat_rows, future in zip(by_chat.values(), futures)
+                if not future.cancelled() and future.result()
+                for row in chat_rows
+            ]
+            await asyncio.shield(adb.mark_outbox_delivered(sent))
+            raise
+        
+        delivered, failed = [], []
+        for chat_rows, ok in zip(by_chat.values(), results):
+            (delivered if ok else failed).extend(row['id'] for row in chat_rows)
+        
+        await adb.mark_outbox_delivered(delivered)
+        given_up = await adb.mark_outbox_failed(
+            failed, 'delivery failed', self.max_attempts, self.retry_delay
+        )
+        
+        self.stats['delivered'] += len(delivered)
+        self.stats['messages'] += sum(results)
+        self.stats['coalesced'] += len(delivered) - sum(results)
+        self.stats['retried'] += len(failed) - given_up
+        self.stats['given_up'] += given_up
+        
+        logger.info(
+            f"Delivered {len(delivered)}/{len(rows)} outbox notifications "
+            f"in {sum(results)}/{len(by_chat)} messages"
+            f"{f' ({len(failed) - given_up} to retry, {given_up} given up)' if failed else ''}"
+        )
+        return len(by_chat)
+    
+    async def purge(self):
+        """Delete finished rows older than OUTBOX_RETENTION_DAYS"""
+        try:
+            removed = await adb.purge_outbox(OUTBOX_RETENTION_DAYS)
+            if removed:
+                logger.info(f"Purged {removed} finished outbox notifications")
+        except Exception as e:
+            logger.error(f"Outbox purge failed: {e}")
+    
+    def get_stats(self):
+        """
+        Get outbox statistics.
+        
+        Returns:
+            dict: Delivered notifications, messages they were sent in, notifications
+                  merged into another message, retried and given-up counters
+        """
+        return dict(self.stats)
@@ -0,0 +1,443 @@
+"""
+Poll Schedule Module
+Per-course polling intervals adapted to how often each course's vacancies change
+"""
+
+import hashlib
+import heapq
+import math
+import random
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class PollSchedule:
+    """
+    Priority queue of courses ordered by the time they are next due.
+    Each course's change rate is an exponentially decayed average: decayed
+    count of polls that saw a change over decayed observed time.
+    
+    The poll budget is shared out so that the total subscriber-weighted
+    detection delay is smallest: a course with weight w (subscribers plus
+    recent lookups) changing at rate r is polled at a rate proportional to
+    sqrt(w * r). Every course is still polled at least every max_interval
+    (the fairness floor) and at most every min_interval. A budget too small
+    for the floor lowers it to half the budget spread evenly, and the other
+    half still goes by priority.
+    
+    The budget scales with the number of courses unless set: by default it
+    is what polling every course once per default_interval would cost,
+    capped at max_budget.
+    
+    A course with no history is due at once. With `spread` on, polls are
+    spread evenly over time instead of bunching: a new course with history
+    starts at a deterministic phase within its interval (a hash of its
+    code), and every interval is jittered by up to `jitter` of its length
+    so courses do not fall back into step.
+    
+    Attributes:
+        min_interval (float): Shortest seconds between polls of a course
+        max_interval (float): Longest seconds between polls of a course
+        default_interval (float): A course with nothing observed yet is assumed
+                                  to change once per this many seconds
+        half_life (float): Seconds after which an observation counts half
+        budget (float): Polls per second to share out between all courses; 0 for
+                        one poll per course per default_interval
+        max_budget (float): Upper bound on the budget, e.g. the fetch rate limit
+        demand_weight (float): Weight of one recent lookup relative to one subscriber
+        spread (bool): Spread first polls by hash phase and jitter every interval
+        jitter (float): Largest jitter as a fraction of the interval
+    """
+    
+    def __init__(self, min_interval, max_interval, default_interval, half_life, budget, demand_weight,
+                 spread=True, jitter=0.1, max_budget=None):
+        """
+        Initialize an empty schedule.
+        
+        Args:
+            min_interval (float): Shortest seconds between polls of a course
+            max_interval (float): Longest seconds between polls of a course
+            default_interval (float): Assumed seconds between changes of a new course
+            half_life (float): Seconds after which an observation counts half
+            budget (float): Polls per second to share out between all courses; 0 for
+                            one poll per course per default_interval
+            demand_weight (float): Weight of one recent lookup relative to one subscriber
+            spread (bool): Spread first polls by hash phase and jitter every interval
+            jitter (float): Largest jitter as a fraction of the interval
+            max_budget (float, optional): Upper bound on the budget, e.g. the fetch rate limit
+        """
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.default_interval = default_interval
+        self.half_life = half_life
+        self.budget = budget
+        self.max_budget = max_budget
+        self.demand_weight = demand_weight
+        self.spread = spread
+        self.jitter = min(max(jitter, 0.0), 1.0) if spread else 0.0
+        
+        self._heap = []          # (due time, course code); stale entries are skipped
+        self._due = {}           # course code -> due time of its live heap entry
+        self._popped = set()     # handed out by pop_due, not rescheduled yet
+        self._changes = {}       # course code -> decayed number of polls that saw a change
+        self._observed = {}      # course code -> decayed seconds observed
+        self._last_poll = {}     # course code -> time of the last successful poll
+        self._weights = {}       # course code -> number of subscribers
+        self._demand = {}        # course code -> (decayed lookups, time of last update)
+        self._scale = 0.0        # poll rate per unit of sqrt(weight * change rate)
+        self._floor = 1 / self.max_interval   # poll rate every course gets at least
+    
+    def __len__(self):
+        """Number of scheduled courses"""
+        return len(self._due)
+    
+    def _push(self, course_code, due):
+        """
+        (Re)schedule a course.
+        
+        Args:
+            course_code (str): Course code
+            due (float): Time the course is due
+        """
+        self._popped.discard(course_code)
+        self._due[course_code] = due
+        heapq.heappush(self._heap, (due, course_code))
+    
+    def seed(self, course_code, rate):
+        """
+        Start a course's change rate from an estimate, e.g. from history.
+        The estimate weighs as much as one half-life of observations.
+        
+        Args:
+            course_code (str): Course code
+            rate (float): Changes per second
+        """
+        self._changes[course_code] = rate * self.half_life
+        self._observed[course_code] = self.half_life
+    
+    def record_demand(self, course_code, now):
+        """
+        Count a user looking up a course; recent lookups add to its weight.
+        
+        Args:
+            course_code (str): Course code
+            now (float): Current time
+        """
+        self._demand[course_code] = (self._decayed_demand(course_code, now) + 1, now)
+    
+    def _decayed_demand(self, course_code, now):
+        """
+        Get a course's lookups, decayed to now.
+        
+        Args:
+            course_code (str): Course code
+            now (float): Current time
+        
+        Returns:
+            float: Decayed number of lookups
+        """
+        demand, updated = self._demand.get(course_code, (0.0, now))
+        return demand * 0.5 ** (max(0.0, now - updated) / self.half_life)
+    
+    def sync(self, subscribers, now):
+        """
+        Match the schedule to the watched courses: new courses are added
+        (due now, or at their phase if they were seeded), courses nobody
+        watches any more are dropped, and the budget is shared out again for
+        the current weights.
+        
+        Args:
+            subscribers (dict): Currently watched course code -> number of subscribers
+            now (float): Current time
+        
+        Returns:
+            list: Course codes that were added
+        """
+        self._weights = dict(subscribers)
+        for course_code in list(self._due):
+            if course_code not in self._weights:
+                for state in (self._due, self._changes, self._observed, self._last_poll):
+                    state.pop(course_code, None)
+                self._popped.discard(course_code)
+        
+        added = [course_code for course_code in self._weights if course_code not in self._due]
+        unseen = set()
+        for course_code in added:
+            if course_code not in self._changes:
+                # Nothing known yet: assume one change per default interval and look now
+                self.seed(course_code, 1 / self.default_interval)
+                unseen.add(course_code)
+            self._due[course_code] = now
+        
+        # Forget lookups that have decayed away
+        for course_code in list(self._demand):
+            if self._decayed_demand(course_code, now) < 0.01:
+                del self._demand[course_code]
+        
+        self.rebalance(now)
+        for course_code in added:
+            self._push(course_code, now if course_code in unseen else now + self._phase(course_code, now))
+        
+        # Drop stale heap entries once they dominate
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [(due, course_code) for course_code, due in self._due.items()
+                          if course_code not in self._popped]
+            heapq.heapify(self._heap)
+        return added
+    
+    def _phase(self, course_code, now):
+        """
+        Get the offset of the first poll of a new course with history.
+        
+        Args:
+            course_code (str): Course code
+            now (float): Current time
+        
+        Returns:
+            float: Seconds from now; always 0 unless spreading
+        """
+        if not self.spread:
+            return 0.0
+        digest = hashlib.blake2b(course_code.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') / 2 ** 64 * self.interval(course_code, now)
+    
+    def _jittered(self, interval):
+        """
+        Apply the configured jitter to an interval.
+        
+        Args:
+            interval (float): Seconds
+        
+        Returns:
+            float: Seconds, within +/- jitter of the interval
+        """
+        if not self.jitter:
+            return interval
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+    
+    def change_rate(self, course_code):
+        """
+        Get a course's estimated change rate.
+        
+        Args:
+            course_code (str): Course code
+        
+        Returns:
+            float: Changes per second
+        """
+        observed = self._observed.get(course_code, 0.0)
+        if observed <= 0:
+            return 1 / self.default_interval
+        return self._changes.get(course_code, 0.0) / observed
+    
+    def weight(self, course_code, now):
+        """
+        Get a course's weight: subscribers plus weighted recent lookups.
+        
+        Args:
+            course_code (str): Course code
+            now (float): Current time
+        
+        Returns:
+            float: Weight
+        """
+        return self._weights.get(course_code, 0) + self.demand_weight * self._decayed_demand(course_code, now)
+    
+    def _priority(self, course_code, now):
+        """
+        Get sqrt(weight * change rate), the quantity poll rates are proportional to.
+        
+        Args:
+            course_code (str): Course code
+            now (float): Current time
+        
+        Returns:
+            float: Priority
+        """
+        return math.sqrt(max(0.0, self.weight(course_code, now) * self.change_rate(course_code)))
+    
+    def _poll_rate(self, priority, scale):
+        """
+        Get the poll rate for a priority, within the interval bounds.
+        
+        Args:
+            priority (float): sqrt(weight * change rate)
+            scale (float): Poll rate per unit of priority
+        
+        Returns:
+            float: Polls per second
+        """
+        return min(max(scale * priority, self._floor), 1 / self.min_interval)
+    
+    def total_budget(self, courses):
+        """
+        Get the polls per second to share out between a number of courses.
+        
+        Args:
+            courses (int): Number of scheduled courses
+        
+        Returns:
+            float: The configured budget, or one poll per course per
+                   default_interval if none is set; at most max_budget
+        """
+        budget = self.budget if self.budget > 0 else courses / self.default_interval
+        if self.max_budget:
+            budget = min(budget, self.max_budget)
+        return budget
+    
+    def rebalance(self, now):
+        """
+        Share the budget out again: find the scale at which the bounded poll
+        rates of all courses add up to it (bisection; the total only grows
+        with the scale).
+        
+        Args:
+            now (float): Current time
+        """
+        priorities = [self._priority(course_code, now) for course_code in self._due]
+        if not priorities:
+            return
+        
+        # Keep at least half the budget for ranking by priority, even if
+        # that stretches the fairness floor beyond max_interval
+        budget = self.total_budget(len(priorities))
+        self._floor = min(1 / self.max_interval, budget / (2 * len(priorities)))
+        
+        low, high = 0.0, 1.0
+        while sum(self._poll_rate(p, high) for p in priorities) < budget and high < 1e12:
+            high *= 2
+        for _ in range(40):
+            middle = (low + high) / 2
+            if sum(self._poll_rate(p, middle) for p in priorities) < budget:
+                low = middle
+            else:
+                high = middle
+        self._scale = low
+    
+    def interval(self, course_code, now):
+        """
+        Get the polling interval a course currently warrants.
+        
+        Args:
+            course_code (str): Course code
+            now (float): Current time
+        
+        Returns:
+            float: Seconds until the course should be polled again
+        """
+        return 1 / self._poll_rate(self._priority(course_code, now), self._scale)
+    
+    def pop_due(self, now):
+        """
+        Take every course that is due by `now`, earliest first.
+        Each must be handed back via record, retry or restore.
+        
+        Args:
+            now (float): Current time, or a later time to also take courses due before it
+        
+        Returns:
+            list: Due course codes, most overdue first
+        """
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due_time, course_code = heapq.heappop(self._heap)
+            if self._due.get(course_code) == due_time and course_code not in self._popped:
+                self._popped.add(course_code)
+                due.append(course_code)
+        return due
+    
+    def due_at(self, course_code):
+        """
+        Get the time a course is due.
+        
+        Args:
+            course_code (str): Course code
+        
+        Returns:
+            float: Due time, or None if the course is not scheduled
+        """
+        return self._due.get(course_code)
+    
+    def record(self, course_code, changed, now):
+        """
+        Record a successful poll and schedule the next one.
+        
+        Args:
+            course_code (str): Course code
+            changed (bool): Whether the poll saw any watched vacancy change
+            now (float): Current time
+        
+        Returns:
+            float: Seconds until the next poll
+        """
+        if course_code not in self._due:
+            return 0.0
+        
+        last = self._last_poll.get(course_code)
+        if last is not None and now > last:
+            elapsed = now - last
+            decay = 0.5 ** (elapsed / self.half_life)
+            self._changes[course_code] = self._changes.get(course_code, 0.0) * decay + (1 if changed else 0)
+            self._observed[course_code] = self._observed.get(course_code, 0.0) * decay + elapsed
+        self._last_poll[course_code] = now
+        
+        interval = self._jittered(self.interval(course_code, now))
+        self._push(course_code, now + interval)
+        return interval
+    
+    def retry(self, course_code, now):
+        """
+        Schedule a course whose poll failed for another try after min_interval.
+        
+        Args:
+            course_code (str): Course code
+            now (float): Current time
+        """
+        if course_code in self._due:
+            self._push(course_code, now + self._jittered(self.min_interval))
+    
+    def restore(self, course_code):
+        """
+        Put a course that was popped but not polled back with its original due time.
+        
+        Args:
+            course_code (str): Course code
+        """
+        if course_code in self._due:
+            self._push(course_code, self._due[course_code])
+    
+    def release(self, now):
+        """
+        Reschedule popped courses nobody handed back (e.g. their check raised).
+        
+        Args:
+            now (float): Current time
+        """
+        for course_code in list(self._popped):
+            self.retry(course_code, now)
+    
+    def get_stats(self, now):
+        """
+        Get schedule statistics.
+        
+        Args:
+            now (float): Current time
+        
+        Returns:
+            dict: Number of courses, the spread of their current intervals, the
+                  poll rate they add up to and the budget it is shared out from
+        """
+        intervals = sorted(self.interval(course_code, now) for course_code in self._due)
+        if not intervals:
+            return {'courses': 0}
+        return {
+            'courses': len(intervals),
+            'min_interval': intervals[0],
+            'median_interval': intervals[len(intervals) // 2],
+            'max_interval': intervals[-1],
+            'at_min': sum(1 for interval in intervals if interval <= self.min_interval),
+            'at_max': sum(1 for interval in intervals if interval >= self.max_interval),
+            'polls_per_second': sum(1 / interval for interval in intervals),
+            'budget': self.total_budget(len(intervals))
+        }
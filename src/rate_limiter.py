@@ -0,0 +1,55 @@
+"""
+Rate Limiter Module
+Token-bucket rate limiting for outgoing requests
+"""
+
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Asynchronous token bucket.
+    Tokens refill continuously at `rate` per second up to `burst`; each
+    acquire() consumes one token, waiting until one is available.
+    
+    Attributes:
+        rate (float): Tokens added per second
+        burst (int): Maximum number of tokens held at once
+    """
+    
+    def __init__(self, rate, burst):
+        """
+        Initialize the bucket full.
+        
+        Args:
+            rate (float): Tokens added per second (must be > 0)
+            burst (int): Bucket capacity (at least 1)
+        """
+        if rate <= 0:
+            raise ValueError("Token bucket rate must be positive")
+        
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        """Add tokens accrued since the last refill"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    async def acquire(self):
+        """
+        Take one token, sleeping until one is available.
+        Waiters are served in arrival order.
+        """
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
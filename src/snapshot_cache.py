@@ -0,0 +1,208 @@
+"""
+Snapshot Cache Module
+In-process cache of recent course vacancy snapshots shared by the bot and checker
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+from .logger import get_logger
+from .vacancy_parser import VacancyParser
+
+logger = get_logger(__name__)
+
+
+class CourseSnapshot:
+    """
+    Vacancy data for one course as fetched at a point in time.
+    Vacancy and waitlist counts are extracted eagerly with the fast path;
+    the full index list with class sessions is parsed from the raw page
+    only when something (e.g. bot display) first asks for it.
+    
+    Attributes:
+        course_code (str): Course code
+        counts (dict): Index number -> (vacancy, waitlist)
+        fingerprint (str): Hash of the raw page
+        fetched_at (datetime): When the page was fetched
+    """
+    
+    __slots__ = ('course_code', 'counts', 'fingerprint', 'fetched_at', '_html', '_indexes', '_index_map')
+    
+    def __init__(self, course_code, counts, fingerprint, html=None, indexes=None, fetched_at=None):
+        """
+        Initialize a snapshot.
+        
+        Args:
+            course_code (str): Course code
+            counts (dict): Index number -> (vacancy, waitlist)
+            fingerprint (str): Hash of the raw page
+            html (str, optional): Raw page, parsed on first access to indexes
+            indexes (list, optional): Already parsed index list
+            fetched_at (datetime, optional): Fetch time (defaults to now)
+        """
+        self.course_code = course_code.upper()
+        self.counts = counts
+        self.fingerprint = fingerprint
+        self.fetched_at = fetched_at or datetime.now()
+        self._html = html
+        self._indexes = indexes
+        self._index_map = None
+    
+    @property
+    def indexes(self):
+        """
+        Full index list with class sessions, parsed on first access.
+        
+        Returns:
+            list: List of index dictionaries (empty if the page cannot be parsed)
+        """
+        if self._indexes is None:
+            indexes = VacancyParser.parse_vacancy_html(self._html or '', self.course_code)
+            self._indexes = indexes if indexes is not None else []
+            self._html = None
+        return self._indexes
+    
+    @property
+    def index_map(self):
+        """
+        Index number -> IndexInfo map, built once per snapshot.
+        
+        Returns:
+            dict: Index number -> IndexInfo
+        """
+        if self._index_map is None:
+            self._index_map = {index_info['index']: index_info for index_info in self.indexes}
+        return self._index_map
+    
+    def get_index(self, index_number):
+        """
+        Look up one index in constant time.
+        
+        Args:
+            index_number (str): Index number
+        
+        Returns:
+            IndexInfo: Index information, or None if the course has no such index
+        """
+        return self.index_map.get(str(index_number))
+    
+    @property
+    def age(self):
+        """
+        Returns:
+            float: Seconds since the snapshot was fetched
+        """
+        return max(0.0, (datetime.now() - self.fetched_at).total_seconds())
+    
+    def refetched(self, fetched_at=None):
+        """
+        Create a snapshot for a byte-identical re-fetch of this page.
+        Shares the already extracted data instead of parsing again.
+        
+        Args:
+            fetched_at (datetime, optional): Time of the new fetch (defaults to now)
+        
+        Returns:
+            CourseSnapshot: New snapshot with the same content
+        """
+        return CourseSnapshot(
+            self.course_code,
+            self.counts,
+            self.fingerprint,
+            html=self._html,
+            indexes=self._indexes,
+            fetched_at=fetched_at
+        )
+
+
+class SnapshotCache:
+    """
+    Bounded LRU cache of course snapshots keyed by course code.
+    Every successful fetch is stored, so bot lookups can be served from
+    the checker's latest fetch while it is still fresh.
+    
+    Attributes:
+        ttl (float): Default maximum age in seconds for a cache hit
+        max_size (int): Maximum number of courses kept
+    """
+    
+    def __init__(self, ttl, max_size):
+        """
+        Initialize an empty cache.
+        
+        Args:
+            ttl (float): Default maximum age in seconds for a cache hit
+            max_size (int): Maximum number of courses kept
+        """
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, course_code, max_age=None):
+        """
+        Get a cached snapshot if it is fresh enough.
+        
+        Args:
+            course_code (str): Course code
+            max_age (float, optional): Maximum accepted age in seconds (defaults to ttl)
+        
+        Returns:
+            CourseSnapshot: Cached snapshot, or None on a miss
+        """
+        if max_age is None:
+            max_age = self.ttl
+        
+        key = course_code.upper()
+        snapshot = self._entries.get(key)
+        
+        if snapshot is None or snapshot.age > max_age:
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return snapshot
+    
+    def peek(self, course_code):
+        """
+        Get the latest cached snapshot regardless of age.
+        Does not count as a hit or miss and does not refresh LRU order.
+        
+        Args:
+            course_code (str): Course code
+        
+        Returns:
+            CourseSnapshot: Cached snapshot, or None if the course is not cached
+        """
+        return self._entries.get(course_code.upper())
+    
+    def put(self, snapshot):
+        """
+        Store a snapshot, evicting the least recently used course if full.
+        
+        Args:
+            snapshot (CourseSnapshot): Snapshot to store
+        """
+        key = snapshot.course_code
+        self._entries[key] = snapshot
+        self._entries.move_to_end(key)
+        
+        while len(self._entries) > self.max_size:
+            evicted, _ = self._entries.popitem(last=False)
+            logger.debug(f"Evicted cached snapshot for {evicted}")
+    
+    def get_stats(self):
+        """
+        Get cache statistics.
+        
+        Returns:
+            dict: Entry count, hits, misses and hit rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
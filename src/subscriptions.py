@@ -0,0 +1,269 @@
+"""
+Subscription Index Module
+In-memory map of which users watch which course indexes, kept current via LISTEN/NOTIFY
+"""
+
+import asyncio
+import math
+import time
+import psycopg
+from .async_database import adb
+from .database import SUBSCRIPTION_CHANNEL
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class SubscriptionIndex:
+    """
+    In-memory subscription index: (course_code, index_number) -> alerts.
+    Loaded once, then kept current by applying only the alerts and users
+    that Postgres triggers announce on SUBSCRIPTION_CHANNEL. A full reload
+    runs periodically as a safety net and whenever the listener reconnects;
+    while the listener is down, groups are read straight from the database.
+    
+    Attributes:
+        reconcile_interval (float): Seconds between full reloads
+        live (bool): True while the change listener is connected
+    """
+    
+    def __init__(self, reconcile_interval):
+        """
+        Initialize an empty index.
+        
+        Args:
+            reconcile_interval (float): Seconds between full reloads
+        """
+        self.reconcile_interval = reconcile_interval
+        self.live = False
+        
+        self._alerts = {}        # alert id -> alert dict
+        self._by_index = {}      # (course_code, index_number) -> set of alert ids
+        self._by_user = {}       # telegram id -> set of alert ids
+        self._paused_until = {}  # telegram id -> epoch seconds when the pause ends
+        
+        self._pending_alerts = set()
+        self._pending_users = set()
+        self._needs_reload = True
+        self._last_reload = None
+        self._listener = None
+        self.stats = {'full_loads': 0, 'incremental_loads': 0, 'changes_applied': 0, 'notifications': 0}
+    
+    def start(self):
+        """Start the change listener in the background"""
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+    
+    def stop(self):
+        """Stop the change listener"""
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        self.live = False
+    
+    async def _listen(self):
+        """Receive change notifications, reconnecting with backoff"""
+        delay = 1
+        while True:
+            try:
+                conn = await psycopg.AsyncConnection.connect(adb.conninfo, autocommit=True)
+                async with conn:
+                    await conn.execute(f"LISTEN {SUBSCRIPTION_CHANNEL}")
+                    
+                    # Changes may have been missed while disconnected
+                    self._needs_reload = True
+                    self.live = True
+                    delay = 1
+                    logger.info(f"Listening for subscription changes on '{SUBSCRIPTION_CHANNEL}'")
+                    
+                    async for notify in conn.notifies():
+                        self._on_notify(notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Subscription listener disconnected: {e}")
+            finally:
+                self.live = False
+            
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+    
+    def _on_notify(self, payload):
+        """
+        Queue the alert or user named in a notification for reloading.
+        
+        Args:
+            payload (str): 'alert:<id>' or 'user:<telegram_id>'
+        """
+        self.stats['notifications'] += 1
+        kind, _, key = payload.partition(':')
+        try:
+            if kind == 'alert':
+                self._pending_alerts.add(int(key))
+            elif kind == 'user':
+                self._pending_users.add(int(key))
+            else:
+                raise ValueError(payload)
+        except ValueError:
+            logger.warning(f"Ignoring unexpected subscription notification: {payload}")
+    
+    def _remove(self, alert_id):
+        """
+        Drop an alert from the index.
+        
+        Args:
+            alert_id (int): Alert ID
+        """
+        alert = self._alerts.pop(alert_id, None)
+        if alert is None:
+            return
+        
+        key = (alert['course_code'], alert['index_number'])
+        for mapping, map_key in ((self._by_index, key), (self._by_user, alert['telegram_id'])):
+            members = mapping.get(map_key)
+            if members is not None:
+                members.discard(alert_id)
+                if not members:
+                    del mapping[map_key]
+    
+    def _add(self, row, now):
+        """
+        Add an alert row from the database and record its owner's pause state.
+        
+        Args:
+            row (dict): Row from AsyncDatabase.get_subscriptions
+            now (float): Current epoch time
+        """
+        alert_id = row['id']
+        telegram_id = row['telegram_id']
+        self._remove(alert_id)
+        
+        self._alerts[alert_id] = {
+            'id': alert_id,
+            'telegram_id': telegram_id,
+            'course_code': row['course_code'],
+            'index_number': row['index_number'],
+            'last_vacancy_count': row['last_vacancy_count']
+        }
+        self._by_index.setdefault((row['course_code'], row['index_number']), set()).add(alert_id)
+        self._by_user.setdefault(telegram_id, set()).add(alert_id)
+        
+        if row['is_paused']:
+            remaining = row['pause_remaining']
+            self._paused_until[telegram_id] = math.inf if remaining is None else now + remaining
+        else:
+            self._paused_until.pop(telegram_id, None)
+    
+    async def _full_reload(self):
+        """Replace the whole index with the database's active alerts"""
+        # Changes announced from here on are applied on top of this load
+        self._pending_alerts.clear()
+        self._pending_users.clear()
+        
+        rows = await adb.get_subscriptions()
+        now = time.time()
+        
+        self._alerts = {}
+        self._by_index = {}
+        self._by_user = {}
+        self._paused_until = {}
+        for row in rows:
+            self._add(row, now)
+        
+        self._needs_reload = False
+        self._last_reload = time.monotonic()
+        self.stats['full_loads'] += 1
+        logger.info(f"Loaded subscription index ({len(self._alerts)} alerts, {len(self._by_index)} indexes)")
+    
+    async def _apply_changes(self):
+        """Reload only the alerts and users announced since the last refresh"""
+        alert_ids, self._pending_alerts = self._pending_alerts, set()
+        telegram_ids, self._pending_users = self._pending_users, set()
+        
+        try:
+            rows = await adb.get_subscriptions(alert_ids, telegram_ids)
+        except Exception:
+            # Retry these changes on the next refresh
+            self._pending_alerts |= alert_ids
+            self._pending_users |= telegram_ids
+            raise
+        now = time.time()
+        
+        # Drop everything the changes touch; whatever is still active comes back in rows
+        for alert_id in alert_ids:
+            self._remove(alert_id)
+        for telegram_id in telegram_ids:
+            for alert_id in list(self._by_user.get(telegram_id, ())):
+                self._remove(alert_id)
+            self._paused_until.pop(telegram_id, None)
+        
+        for row in rows:
+            self._add(row, now)
+        
+        self.stats['incremental_loads'] += 1
+        self.stats['changes_applied'] += len(alert_ids) + len(telegram_ids)
+        logger.debug(
+            f"Applied {len(alert_ids)} alert and {len(telegram_ids)} user changes "
+            f"to subscription index ({len(rows)} rows read)"
+        )
+    
+    async def get_groups(self):
+        """
+        Get the current work units, refreshing the index first.
+        
+        Returns:
+            list: Same shape as AsyncDatabase.get_subscription_groups: dicts with
+                  'course_code', 'index_number' and 'alerts', excluding paused users
+        """
+        if not self.live:
+            # Without notifications the index cannot be trusted; read groups directly
+            self._needs_reload = True
+            return await adb.get_subscription_groups()
+        
+        reconcile_due = (
+            self._last_reload is None
+            or time.monotonic() - self._last_reload >= self.reconcile_interval
+        )
+        if self._needs_reload or reconcile_due:
+            await self._full_reload()
+        elif self._pending_alerts or self._pending_users:
+            await self._apply_changes()
+        
+        now = time.time()
+        groups = []
+        for (course_code, index_number), alert_ids in self._by_index.items():
+            alerts = [
+                self._alerts[alert_id] for alert_id in sorted(alert_ids)
+                if self._paused_until.get(self._alerts[alert_id]['telegram_id'], 0) <= now
+            ]
+            if alerts:
+                groups.append({'course_code': course_code, 'index_number': index_number, 'alerts': alerts})
+        return groups
+    
+    def update_vacancies(self, results):
+        """
+        Apply vacancy counts the checker just stored, without waiting for
+        the resulting notifications.
+        
+        Args:
+            results (list): Check results with 'alert_id' and 'vacancy'
+        """
+        for result in results:
+            alert = self._alerts.get(result['alert_id'])
+            if alert is not None:
+                alert['last_vacancy_count'] = result['vacancy']
+    
+    def get_stats(self):
+        """
+        Get index statistics.
+        
+        Returns:
+            dict: Sizes, load counters and listener state
+        """
+        return {
+            'alerts': len(self._alerts),
+            'indexes': len(self._by_index),
+            'live': self.live,
+            'pending_changes': len(self._pending_alerts) + len(self._pending_users),
+            **self.stats
+        }
@@ -3,14 +3,24 @@ NTU STARS Public Vacancy API Client
 Handles fetching course vacancy information from the public API
 """
 
-import requests
+import asyncio
+import bisect
+import hashlib
+import time
+import httpx
+from contextlib import contextmanager
 from datetime import datetime
+from .circuit_breaker import CircuitBreaker
 from .config import config
 from .logger import get_logger
+from .snapshot_cache import CourseSnapshot, SnapshotCache
 from .vacancy_parser import VacancyParser
 
 logger = get_logger(__name__)
 
+# Upper bounds (seconds) of the inter-request spacing histogram buckets; the last bucket is open
+SPACING_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60)
+
 
 class VacancyApiClient:
     """
@@ -41,6 +51,34 @@ class VacancyApiClient:
             "Referer": "https://wish.wis.ntu.edu.sg/webexe/owa/aus_vacancy.check_vacancy",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
         }
+        self.limits = httpx.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY
+        )
+        
+        # Pooled keep-alive clients, created lazily on first use
+        self._async_client = None
+        self._sync_client = None
+        
+        # Latest snapshot per course, shared by the bot and the checker
+        self.cache = SnapshotCache(config.SNAPSHOT_CACHE_TTL, config.SNAPSHOT_CACHE_SIZE)
+        
+        # Single-flight: course code -> in-flight fetch task awaited by every concurrent caller
+        self._inflight = {}
+        self.stats = {
+            'fetches': 0,
+            'coalesced': 0,
+            'parsed': 0,
+            'unchanged': 0
+        }
+        
+        # Circuit breaker per upstream host
+        self._breakers = {}
+        
+        # Time between consecutive upstream requests, to see how evenly load is spread
+        self._last_request_at = None
+        self._spacing = [0] * (len(SPACING_BUCKETS) + 1)
         self._initialized = True
         logger.info("Vacancy API client initialized")
     
@@ -63,9 +101,328 @@ class VacancyApiClient:
         else:
             return False, f"NTU STARS vacancy service is only available from 8:00 AM to 10:00 PM (Singapore time). Current time: {now.strftime('%I:%M %p')}"
     
+    def _get_async_client(self):
+        """
+        Get the shared async HTTP client, creating it on first use.
+        
+        Returns:
+            httpx.AsyncClient: Client with a persistent keep-alive connection pool
+        """
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=self.limits
+            )
+        return self._async_client
+    
+    def _get_sync_client(self):
+        """
+        Get the shared blocking HTTP client, creating it on first use.
+        
+        Returns:
+            httpx.Client: Client with a persistent keep-alive connection pool
+        """
+        if self._sync_client is None or self._sync_client.is_closed:
+            self._sync_client = httpx.Client(
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=self.limits
+            )
+        return self._sync_client
+    
+    async def aclose(self):
+        """Close the pooled HTTP clients and release their connections"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        self.close()
+    
+    def close(self):
+        """Close the pooled blocking HTTP client"""
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+    
+    def _record_request(self):
+        """Count an upstream request and its spacing from the previous one"""
+        self.stats['fetches'] += 1
+        now = time.monotonic()
+        if self._last_request_at is not None:
+            self._spacing[bisect.bisect_right(SPACING_BUCKETS, now - self._last_request_at)] += 1
+        self._last_request_at = now
+    
+    def _get_breaker(self, url=None):
+        """
+        Get the circuit breaker of an upstream host, creating it on first use.
+        
+        Args:
+            url (str, optional): Request URL (defaults to the vacancy endpoint)
+        
+        Returns:
+            CircuitBreaker: Breaker for the URL's host
+        """
+        host = httpx.URL(url or self.base_url).host
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                host,
+                config.CIRCUIT_ERROR_RATE,
+                config.CIRCUIT_MIN_REQUESTS,
+                config.CIRCUIT_WINDOW,
+                config.CIRCUIT_SLOW_CALL,
+                config.CIRCUIT_COOLDOWN,
+                config.CIRCUIT_MAX_COOLDOWN
+            )
+            self._breakers[host] = breaker
+        return breaker
+    
+    def upstream_available(self):
+        """
+        Check whether requests to NTU would currently be sent at all.
+        
+        Returns:
+            bool: False while the circuit breaker is open or probing
+        """
+        return self._get_breaker().is_available()
+    
+    def _circuit_open_result(self, breaker, course_code):
+        """
+        Build the error result for a request refused by the circuit breaker.
+        
+        Args:
+            breaker (CircuitBreaker): Breaker that refused the request
+            course_code (str): Course code that was requested
+        
+        Returns:
+            dict: Error dictionary with 'error' 'circuit_open' and 'retry_in'
+        """
+        retry_in = breaker.retry_in()
+        logger.debug(f"Circuit open, not fetching {course_code} (retry in {retry_in:.0f}s)")
+        return {
+            'success': False,
+            'error': 'circuit_open',
+            'error_message': (
+                "NTU server is not responding - requests are paused"
+                f"{f' for another {retry_in:.0f}s' if retry_in else ''}"
+            ),
+            'retry_in': retry_in
+        }
+    
+    def _start_request(self, course_code):
+        """
+        Check whether an upstream request for a course may be sent, and count it if so.
+        Shared by the async and blocking fetch paths.
+        
+        Args:
+            course_code (str): Course code to fetch
+        
+        Returns:
+            tuple: Circuit breaker ticket for the request, and an error result
+                   (None if the request may go ahead) if outside service hours
+                   or the circuit breaker refuses it
+        """
+        unavailable = self._check_service_hours()
+        if unavailable:
+            return None, unavailable
+        
+        breaker = self._get_breaker()
+        ticket = breaker.allow()
+        if ticket is None:
+            return None, self._circuit_open_result(breaker, course_code)
+        
+        self._record_request()
+        logger.debug(f"Fetching vacancies for course: {course_code}")
+        return ticket, None
+    
+    @contextmanager
+    def _track_request(self, course_code, ticket):
+        """
+        Time an upstream request and feed its outcome into the circuit breaker.
+        Server errors and rate limiting count as failures, and so does any
+        exception, including cancellation, so a half-open probe is never left
+        outstanding.
+        
+        Args:
+            course_code (str): Course code being fetched
+            ticket (int): Circuit breaker ticket from _start_request
+        
+        Yields:
+            dict: The caller stores the httpx.Response it received under 'response'
+        """
+        breaker = self._get_breaker()
+        request = {}
+        started = time.monotonic()
+        try:
+            yield request
+        except BaseException:
+            breaker.record_failure(ticket)
+            raise
+        
+        response = request['response']
+        if response.status_code >= 500 or response.status_code == 429:
+            logger.debug(f"Upstream failure for {course_code}: status {response.status_code}")
+            breaker.record_failure(ticket)
+        else:
+            breaker.record_success(ticket, time.monotonic() - started)
+    
+    def _check_service_hours(self):
+        """
+        Build an error result if the vacancy service is outside its hours.
+        
+        Returns:
+            dict: Error dictionary, or None if the service is available
+        """
+        is_available, message = self.is_service_available()
+        if is_available:
+            return None
+        
+        logger.warning(f"Service not available: {message}")
+        return {
+            'success': False,
+            'error': 'time_restriction',
+            'error_message': message
+        }
+    
+    def _handle_response(self, response, course_code):
+        """
+        Convert an HTTP response into a snapshot result and cache it.
+        
+        Args:
+            response (httpx.Response): Response from the vacancy endpoint
+            course_code (str): Course code that was requested
+        
+        Returns:
+            dict: Same format as get_course_snapshot()
+        """
+        # Check for HTTP errors
+        if response.status_code != 200:
+            error_msg = f"Server Error (Status {response.status_code})"
+            if response.status_code == 503:
+                error_msg += " - Service Unavailable (Server may be down or under maintenance)"
+            elif response.status_code == 500:
+                error_msg += " - Internal Server Error"
+            elif response.status_code == 403:
+                error_msg += " - Access Forbidden"
+            elif response.status_code == 404:
+                error_msg += " - Endpoint Not Found"
+            
+            logger.error(f"HTTP error {response.status_code} for {course_code}")
+            return {
+                'success': False,
+                'error': 'http_error',
+                'error_message': error_msg,
+                'status_code': response.status_code
+            }
+        
+        # Skip parsing when the page is byte-identical to the last one seen
+        fingerprint = hashlib.blake2b(response.content, digest_size=16).hexdigest()
+        previous = self.cache.peek(course_code)
+        
+        if previous is not None and previous.fingerprint == fingerprint:
+            self.stats['unchanged'] += 1
+            logger.debug(f"Page unchanged for course {course_code}, reusing parsed data")
+            snapshot = previous.refetched()
+        else:
+            # Extract vacancy counts only; the full index list is parsed on demand
+            self.stats['parsed'] += 1
+            html = response.text
+            counts = VacancyParser.parse_vacancy_counts(html, course_code)
+            
+            if counts is None:
+                # Parsing error occurred
+                return {
+                    'success': False,
+                    'error': 'parse_error',
+                    'error_message': 'Failed to parse response from server'
+                }
+            
+            logger.info(f"Found {len(counts)} indexes for course {course_code}")
+            snapshot = CourseSnapshot(course_code, counts, fingerprint, html=html)
+        
+        self.cache.put(snapshot)
+        return {
+            'success': True,
+            'data': snapshot
+        }
+    
+    def _handle_request_error(self, error, course_code):
+        """
+        Convert a transport exception into an error result dictionary.
+        
+        Args:
+            error (Exception): Exception raised while fetching
+            course_code (str): Course code that was requested
+        
+        Returns:
+            dict: Error dictionary with 'error' and 'error_message'
+        """
+        if isinstance(error, httpx.TimeoutException):
+            logger.error(f"Timeout fetching vacancies for {course_code}")
+            return {
+                'success': False,
+                'error': 'timeout',
+                'error_message': "Request Timeout - Server took too long to respond"
+            }
+        if isinstance(error, httpx.ConnectError):
+            logger.error(f"Connection error fetching vacancies for {course_code}")
+            return {
+                'success': False,
+                'error': 'connection_error',
+                'error_message': "Connection Error - Unable to reach NTU server. Check your internet connection."
+            }
+        if isinstance(error, httpx.HTTPError):
+            logger.error(f"Request error fetching vacancies for {course_code}: {error}")
+            return {
+                'success': False,
+                'error': 'request_error',
+                'error_message': f"Network Error - {str(error)}"
+            }
+        
+        logger.error(f"Unexpected error fetching vacancies for {course_code}: {error}")
+        return {
+            'success': False,
+            'error': 'unknown_error',
+            'error_message': f"Unexpected Error - {str(error)}"
+        }
+    
+    def _to_index_list(self, result):
+        """
+        Convert a snapshot result into a get_course_vacancies() result.
+        
+        Args:
+            result (dict): Result from get_course_snapshot()
+        
+        Returns:
+            dict: Result whose 'data' is the full list of indexes
+        """
+        if not result['success']:
+            return result
+        
+        return {
+            'success': True,
+            'data': result['data'].indexes
+        }
+    
+    async def get_course_vacancies_async(self, course_code):
+        """
+        Get vacancy information for all indexes of a course without blocking
+        the event loop. Uses the pooled async client.
+        
+        Args:
+            course_code (str): Course code (e.g., 'SC2103')
+        
+        Returns:
+            dict: Same format as get_course_vacancies()
+        """
+        result = await self.get_course_snapshot_async(course_code)
+        return self._to_index_list(result)
+    
     def get_course_vacancies(self, course_code):
         """
         Get vacancy information for all indexes of a course.
+        Blocking wrapper for scripts; async code should use
+        get_course_vacancies_async().
         
         Args:
             course_code (str): Course code (e.g., 'SC2103')
@@ -97,126 +454,171 @@ class VacancyApiClient:
                 'status_code': 503
             }
         """
+        result = self.get_course_snapshot(course_code)
+        return self._to_index_list(result)
+    
+    def _get_cached_snapshot(self, course_code, max_age):
+        """
+        Look up a cached snapshot result.
+        
+        Args:
+            course_code (str): Course code
+            max_age (float): Maximum accepted age in seconds; 0 always misses
+        
+        Returns:
+            dict: Snapshot result, or None if nothing fresh enough is cached
+        """
+        if max_age <= 0:
+            return None
+        
+        snapshot = self.cache.get(course_code, max_age)
+        if snapshot is None:
+            return None
+        
+        logger.debug(f"Serving cached snapshot for {course_code}")
+        return {
+            'success': True,
+            'data': snapshot
+        }
+    
+    async def get_course_snapshot_async(self, course_code, max_age=0):
+        """
+        Fetch a course page once and return a snapshot of all its indexes.
+        Used by the checker to fan a single upstream request out to every
+        watched index of the course. Every fetch refreshes the shared cache.
+        
+        Args:
+            course_code (str): Course code (e.g., 'SC2103')
+            max_age (float): Serve a cached snapshot up to this many seconds old
+                             (default 0 always fetches)
+        
+        Returns:
+            dict: Dictionary with 'success', 'data' or 'error', 'error_message'
+                  On success: {'success': True, 'data': CourseSnapshot}
+                  On error: same error dict as get_course_vacancies()
+        """
+        cached = self._get_cached_snapshot(course_code, max_age)
+        if cached:
+            return cached
+        
+        # Join an identical fetch that is already running instead of starting another
+        key = course_code.upper()
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats['coalesced'] += 1
+            logger.debug(f"Joining in-flight fetch for {key}")
+            return await asyncio.shield(inflight)
+        
+        task = asyncio.ensure_future(self._fetch_snapshot_async(key))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        
+        # Shield so a cancelled caller does not cancel the fetch for everyone else
+        return await asyncio.shield(task)
+    
+    async def _fetch_snapshot_async(self, course_code):
+        """
+        Fetch a course from upstream with the pooled async client.
+        
+        Args:
+            course_code (str): Course code
+        
+        Returns:
+            dict: Same format as get_course_snapshot_async()
+        """
         try:
-            # Check if service is available
-            is_available, message = self.is_service_available()
-            if not is_available:
-                logger.warning(f"Service not available: {message}")
-                return {
-                    'success': False,
-                    'error': 'time_restriction',
-                    'error_message': message
-                }
-            
-            logger.debug(f"Fetching vacancies for course: {course_code}")
-            
-            # Make POST request
-            data = {"subj": course_code.upper()}
-            response = requests.post(
-                self.base_url,
-                headers=self.headers,
-                data=data,
-                timeout=self.timeout
-            )
+            ticket, refused = self._start_request(course_code)
+            if refused:
+                return refused
             
-            # Check for HTTP errors
-            if response.status_code != 200:
-                error_msg = f"Server Error (Status {response.status_code})"
-                if response.status_code == 503:
-                    error_msg += " - Service Unavailable (Server may be down or under maintenance)"
-                elif response.status_code == 500:
-                    error_msg += " - Internal Server Error"
-                elif response.status_code == 403:
-                    error_msg += " - Access Forbidden"
-                elif response.status_code == 404:
-                    error_msg += " - Endpoint Not Found"
-                
-                logger.error(f"HTTP error {response.status_code} for {course_code}")
-                return {
-                    'success': False,
-                    'error': 'http_error',
-                    'error_message': error_msg,
-                    'status_code': response.status_code
-                }
-            
-            # Parse HTML response
-            indexes = VacancyParser.parse_vacancy_html(response.text, course_code)
-            
-            if indexes is None:
-                # Parsing error occurred
-                return {
-                    'success': False,
-                    'error': 'parse_error',
-                    'error_message': 'Failed to parse response from server'
-                }
-            
-            logger.info(f"Found {len(indexes)} indexes for course {course_code}")
-            return {
-                'success': True,
-                'data': indexes
-            }
-            
-        except requests.Timeout:
-            error_msg = "Request Timeout - Server took too long to respond"
-            logger.error(f"Timeout fetching vacancies for {course_code}")
-            return {
-                'success': False,
-                'error': 'timeout',
-                'error_message': error_msg
-            }
-        except requests.ConnectionError:
-            error_msg = "Connection Error - Unable to reach NTU server. Check your internet connection."
-            logger.error(f"Connection error fetching vacancies for {course_code}")
-            return {
-                'success': False,
-                'error': 'connection_error',
-                'error_message': error_msg
-            }
-        except requests.RequestException as e:
-            error_msg = f"Network Error - {str(e)}"
-            logger.error(f"Request error fetching vacancies for {course_code}: {e}")
-            return {
-                'success': False,
-                'error': 'request_error',
-                'error_message': error_msg
-            }
+            with self._track_request(course_code, ticket) as request:
+                request['response'] = await self._get_async_client().post(
+                    self.base_url,
+                    data={"subj": course_code.upper()}
+                )
+            return self._handle_response(request['response'], course_code)
         except Exception as e:
-            error_msg = f"Unexpected Error - {str(e)}"
-            logger.error(f"Unexpected error fetching vacancies for {course_code}: {e}")
-            return {
-                'success': False,
-                'error': 'unknown_error',
-                'error_message': error_msg
-            }
+            return self._handle_request_error(e, course_code)
     
-    def get_index_vacancy(self, course_code, index_number):
+    def get_course_snapshot(self, course_code, max_age=0):
         """
-        Get vacancy information for a specific course index.
+        Blocking version of get_course_snapshot_async().
         
         Args:
             course_code (str): Course code (e.g., 'SC2103')
-            index_number (str): Index number (e.g., '10294')
+            max_age (float): Serve a cached snapshot up to this many seconds old
         
         Returns:
-            dict: Dictionary with 'success', 'data' or 'error', 'error_message'
-                  On success: {'success': True, 'data': {index info dict}}
-                  On error: {'success': False, 'error': error_type, 'error_message': message}
+            dict: Same format as get_course_snapshot_async()
         """
+        cached = self._get_cached_snapshot(course_code, max_age)
+        if cached:
+            return cached
+        
         try:
-            result = self.get_course_vacancies(course_code)
+            ticket, refused = self._start_request(course_code)
+            if refused:
+                return refused
             
+            with self._track_request(course_code, ticket) as request:
+                request['response'] = self._get_sync_client().post(
+                    self.base_url,
+                    data={"subj": course_code.upper()}
+                )
+            return self._handle_response(request['response'], course_code)
+        except Exception as e:
+            return self._handle_request_error(e, course_code)
+    
+    def get_stats(self):
+        """
+        Get upstream request statistics.
+        
+        Returns:
+            dict: Upstream fetches, coalesced requests, unchanged-page hit rate,
+                  inter-request spacing histogram, circuit breaker and cache statistics
+        """
+        responses = self.stats['parsed'] + self.stats['unchanged']
+        return {
+            'fetches': self.stats['fetches'],
+            'coalesced': self.stats['coalesced'],
+            'parsed': self.stats['parsed'],
+            'unchanged': self.stats['unchanged'],
+            'unchanged_rate': self.stats['unchanged'] / responses if responses else 0.0,
+            'in_flight': len(self._inflight),
+            'spacing_histogram': {
+                **{f'<{bound}s': count for bound, count in zip(SPACING_BUCKETS, self._spacing)},
+                f'>={SPACING_BUCKETS[-1]}s': self._spacing[-1]
+            },
+            'circuit': self._get_breaker().get_stats(),
+            'cache': self.cache.get_stats()
+        }
+    
+    def _find_index(self, result, course_code, index_number):
+        """
+        Pick a single index out of a course snapshot result.
+        
+        Args:
+            result (dict): Result from get_course_snapshot()
+            course_code (str): Course code
+            index_number (str): Index number to look for
+        
+        Returns:
+            dict: Same format as get_index_vacancy()
+        """
+        try:
             if not result['success']:
                 return result
             
-            all_indexes = result['data']
+            snapshot = result['data']
+            index_info = snapshot.get_index(index_number)
             
-            for index_info in all_indexes:
-                if index_info['index'] == str(index_number):
-                    logger.debug(f"Found vacancy for {course_code}/{index_number}: {index_info['vacancy']}")
-                    return {
-                        'success': True,
-                        'data': index_info
-                    }
+            if index_info is not None:
+                logger.debug(f"Found vacancy for {course_code}/{index_number}: {index_info['vacancy']}")
+                return {
+                    'success': True,
+                    'data': index_info,
+                    'fetched_at': snapshot.fetched_at
+                }
             
             logger.warning(f"Index {index_number} not found for course {course_code}")
             return {
@@ -233,6 +635,100 @@ class VacancyApiClient:
                 'error_message': f"Error: {str(e)}"
             }
     
+    def _select_indexes(self, result, index_numbers):
+        """
+        Pick several indexes out of a course snapshot result.
+        
+        Args:
+            result (dict): Result from get_course_snapshot()
+            index_numbers (iterable): Index numbers to look up
+        
+        Returns:
+            dict: Same format as get_indexes()
+        """
+        if not result['success']:
+            return result
+        
+        snapshot = result['data']
+        found = {str(index_number): snapshot.get_index(index_number) for index_number in index_numbers}
+        
+        return {
+            'success': True,
+            'data': found,
+            'not_found': [index_number for index_number, index_info in found.items() if index_info is None],
+            'fetched_at': snapshot.fetched_at
+        }
+    
+    async def get_indexes_async(self, course_code, index_numbers, max_age=0):
+        """
+        Get several indexes of one course with a single fetch.
+        
+        Args:
+            course_code (str): Course code (e.g., 'SC2103')
+            index_numbers (iterable): Index numbers (e.g., ['10294', '10295'])
+            max_age (float): Serve cached data up to this many seconds old
+        
+        Returns:
+            dict: Same format as get_indexes()
+        """
+        result = await self.get_course_snapshot_async(course_code, max_age)
+        return self._select_indexes(result, index_numbers)
+    
+    def get_indexes(self, course_code, index_numbers, max_age=0):
+        """
+        Get several indexes of one course with a single fetch.
+        Indexes the course does not have are reported as not found rather
+        than failing the whole lookup.
+        
+        Args:
+            course_code (str): Course code (e.g., 'SC2103')
+            index_numbers (iterable): Index numbers (e.g., ['10294', '10295'])
+            max_age (float): Serve cached data up to this many seconds old
+        
+        Returns:
+            dict: Dictionary with 'success', 'data' or 'error', 'error_message'
+                  On success: {'success': True,
+                               'data': {index_number: IndexInfo or None if not found},
+                               'not_found': [index numbers not found],
+                               'fetched_at': datetime}
+                  On error (course could not be fetched): same error dict as get_course_vacancies()
+        """
+        result = self.get_course_snapshot(course_code, max_age)
+        return self._select_indexes(result, index_numbers)
+    
+    async def get_index_vacancy_async(self, course_code, index_number, max_age=0):
+        """
+        Get vacancy information for a specific course index without blocking
+        the event loop.
+        
+        Args:
+            course_code (str): Course code (e.g., 'SC2103')
+            index_number (str): Index number (e.g., '10294')
+            max_age (float): Serve cached data up to this many seconds old
+        
+        Returns:
+            dict: Same format as get_index_vacancy()
+        """
+        result = await self.get_course_snapshot_async(course_code, max_age)
+        return self._find_index(result, course_code, index_number)
+    
+    def get_index_vacancy(self, course_code, index_number, max_age=0):
+        """
+        Get vacancy information for a specific course index.
+        
+        Args:
+            course_code (str): Course code (e.g., 'SC2103')
+            index_number (str): Index number (e.g., '10294')
+            max_age (float): Serve cached data up to this many seconds old
+        
+        Returns:
+            dict: Dictionary with 'success', 'data' or 'error', 'error_message'
+                  On success: {'success': True, 'data': {index info dict}, 'fetched_at': datetime}
+                  On error: {'success': False, 'error': error_type, 'error_message': message}
+        """
+        result = self.get_course_snapshot(course_code, max_age)
+        return self._find_index(result, course_code, index_number)
+    
     def format_index_display(self, index_info):
         """
         Format index information for display to users.
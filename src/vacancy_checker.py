@@ -7,8 +7,13 @@ import asyncio
 import time
 from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
 from .config import config
-from .database import db
+from .async_database import adb
 from .logger import get_logger
+from .rate_limiter import TokenBucket
+from .notifier import NotificationDispatcher
+from .poll_schedule import PollSchedule
+from .outbox import NotificationOutbox
+from .subscriptions import SubscriptionIndex
 from .vacancy_api import vacancy_api
 
 logger = get_logger(__name__)
@@ -16,6 +21,76 @@ logger = get_logger(__name__)
 DATA_SOURCE_URL = "https://wish.wis.ntu.edu.sg/webexe/owa/aus_vacancy.check_vacancy"
 DATA_SOURCE_LINK = f"[{DATA_SOURCE_URL}]({DATA_SOURCE_URL})"
 
+# Most indexes listed in one digest message (keeps it under Telegram's length limit)
+DIGEST_MAX_INDEXES = 30
+
+# Seconds between history partition maintenance runs
+HISTORY_MAINTENANCE_INTERVAL = 24 * 60 * 60
+
+# Seconds between statistics log lines
+STATS_LOG_INTERVAL = 15 * 60
+
+# Per-fetch decay of the slowest recent fetch time, the margin spread-mode ticks leave before their deadline
+FETCH_LATENCY_DECAY = 0.98
+
+
+class FetchScheduler:
+    """
+    Runs upstream fetches with bounded parallelism.
+    A fixed number of workers pull items from a shared queue, and every
+    fetch first takes a token from a rate-limiting bucket so the load on
+    NTU stays within the configured budget.
+    """
+    
+    def __init__(self, concurrency, rate, burst):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            concurrency (int): Maximum number of fetches in flight
+            rate (float): Sustained fetches per second
+            burst (int): Fetches allowed back-to-back after an idle period
+        """
+        self.concurrency = max(1, concurrency)
+        self.bucket = TokenBucket(rate, burst)
+    
+    async def run(self, items, worker, should_continue=lambda: True, not_before=None):
+        """
+        Run `worker(item)` for every item.
+        
+        Args:
+            items (iterable): Work items
+            worker (coroutine function): Called once per item
+            should_continue (callable): Checked before each item; stops the run when False
+            not_before (callable): Maps an item to the time.monotonic() it may start at
+                                   (None = as soon as a token is available)
+        
+        Returns:
+            list: Items that were never started because the run was stopped
+        """
+        pending = iter(items)
+        skipped = []
+        
+        async def consume():
+            # Each worker pulls the next item from the shared iterator
+            for item in pending:
+                if not should_continue():
+                    skipped.append(item)
+                    return
+                if not_before is not None:
+                    delay = not_before(item) - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                await self.bucket.acquire()
+                try:
+                    await worker(item)
+                except Exception as e:
+                    logger.error(f"Scheduled fetch failed: {e}")
+        
+        await asyncio.gather(*(consume() for _ in range(self.concurrency)))
+        skipped.extend(pending)
+        return skipped
+
 
 class VacancyChecker:
     """
@@ -39,209 +114,594 @@ class VacancyChecker:
         
         self.bot = None
         self.running = False
+        self.scheduler = FetchScheduler(
+            config.FETCH_CONCURRENCY,
+            config.FETCH_RATE_LIMIT,
+            config.FETCH_BURST
+        )
+        
+        self.dispatcher = NotificationDispatcher(
+            config.NOTIFY_CONCURRENCY,
+            config.NOTIFY_RATE_LIMIT,
+            config.NOTIFY_PER_CHAT_INTERVAL,
+            config.NOTIFY_MAX_RETRIES
+        )
+        
+        # Vacancy notifications are queued in the database and delivered from there
+        self.outbox = NotificationOutbox(
+            self.dispatcher,
+            self._outbox_message,
+            config.OUTBOX_BATCH_SIZE,
+            config.OUTBOX_POLL_INTERVAL,
+            config.NOTIFY_DIGEST_WINDOW,
+            config.OUTBOX_MAX_ATTEMPTS,
+            config.OUTBOX_RETRY_DELAY,
+            config.OUTBOX_LEASE
+        )
+        
+        # Who watches which index, kept current from database change notifications
+        self.subscriptions = SubscriptionIndex(config.SUBSCRIPTION_RECONCILE_INTERVAL)
+        
+        # course code -> (page fingerprint, alert state) last processed successfully
+        self._processed_pages = {}
+        
+        # Check results and processed pages of the running cycle, written in one batch at its end
+        self._pending_checks = []
+        self._pending_unchanged = []
+        self._cycle_pages = {}
+        self.cycle_stats = {'courses': 0, 'unchanged': 0, 'shed': 0, 'postponed': 0}
+        self._last_maintenance = None
+        self._last_stats_log = None
+        self._fetch_latency = None
+        
+        # When each course is next due, from how often its vacancies change and how many care
+        self.poll_schedule = PollSchedule(
+            config.POLL_MIN_INTERVAL,
+            config.POLL_MAX_INTERVAL,
+            config.CHECK_INTERVAL,
+            config.POLL_HALF_LIFE,
+            config.POLL_BUDGET,
+            config.POLL_DEMAND_WEIGHT,
+            spread=config.LOAD_SPREAD_MODE == 'spread',
+            jitter=config.LOAD_SPREAD_JITTER,
+            max_budget=config.FETCH_RATE_LIMIT
+        )
+        self.schedule_stats = {
+            'cycles': 0,
+            'overruns': 0,
+            'skipped_ticks': 0,
+            'shed_courses': 0,
+            'last_lateness': 0.0,
+            'max_lateness': 0.0,
+            'last_duration': 0.0,
+            'max_duration': 0.0,
+            'fetch_latency': 0.0
+        }
         self._initialized = True
         logger.info("Vacancy checker instance created")
     
-    async def check_alert(self, alert):
+    def _notification_message(self, alert, vacancy_info):
         """
-        Check a single alert for vacancy changes.
+        Build the vacancy notification for an alert.
         
         Args:
-            alert (dict): Alert information from database
+            alert (dict): Alert information
+            vacancy_info (dict): Current vacancy information
         
         Returns:
-            bool: True if check was successful
+            dict: Keyword arguments for Bot.send_message (without chat_id)
         """
-        try:
-            # Get vacancy info using public API
-            result = vacancy_api.get_index_vacancy(
-                alert['course_code'],
-                alert['index_number']
-            )
-            
-            if not result['success']:
-                # Log the error but don't fail completely
-                logger.warning(
-                    f"Could not get vacancy for alert {alert['id']} "
-                    f"({alert['course_code']}/{alert['index_number']}): {result.get('error_message', 'Unknown error')}"
-                )
-                return False
-            
-            vacancy_info = result['data']
-            
-            # Update database
-            db.update_alert_check(
-                alert['id'],
-                vacancy_info['vacancy'],
-                vacancy_info['waitlist']
+        message = (
+            "*VACANCY ALERT!*\n\n"
+            f"*Course:* {alert['course_code']}\n"
+            f"*Index:* {alert['index_number']}\n"
+            f"*Vacancies:* {vacancy_info['vacancy']}\n"
+            f"*Waitlist:* {vacancy_info['waitlist']}\n\n"
+            "Hurry! Slots may fill up quickly!\n\n"
+            f"Data source: {DATA_SOURCE_LINK}"
+        )
+        
+        return {
+            'text': message,
+            'parse_mode': 'Markdown',
+            'reply_markup': self._register_keyboard()
+        }
+    
+    def _register_keyboard(self):
+        """
+        Build the "Register Now" button shown under vacancy notifications.
+        
+        Returns:
+            InlineKeyboardMarkup: Keyboard with the STARS registration link
+        """
+        keyboard = [
+            [InlineKeyboardButton("Register Now", url="https://wish.wis.ntu.edu.sg/pls/webexe/ldap_login.login?w_url=https://wish.wis.ntu.edu.sg/pls/webexe/aus_stars_planner.main")]
+        ]
+        return InlineKeyboardMarkup(keyboard)
+    
+    def _outbox_message(self, rows):
+        """
+        Build one vacancy notification for all outbox rows of a chat.
+        A single row gets the usual alert; several are listed per course.
+        
+        Args:
+            rows (list): Outbox rows of one chat from AsyncDatabase.claim_outbox
+        
+        Returns:
+            dict: Keyword arguments for Bot.send_message (without chat_id)
+        """
+        if len(rows) == 1:
+            return self._notification_message(
+                rows[0],
+                {'vacancy': rows[0]['vacancy_count'], 'waitlist': rows[0]['waitlist_count']}
             )
-            
-            # Check if we should send notification
-            old_vacancy = alert.get('last_vacancy_count', 0)
-            new_vacancy = vacancy_info['vacancy']
-            
-            # Send notification if vacancy opened up (was 0, now > 0)
-            if old_vacancy == 0 and new_vacancy > 0:
-                await self.send_notification(alert, vacancy_info)
-                db.mark_notification_sent(alert['id'])
-            
-            logger.info(
-                f"Checked alert {alert['id']}: "
-                f"{alert['course_code']}/{alert['index_number']} - "
-                f"Vacancy: {new_vacancy}, Waitlist: {vacancy_info['waitlist']}"
+        
+        # Latest counts per course/index, in case a transition was queued twice
+        latest = {}
+        for row in rows:
+            latest[(row['course_code'], row['index_number'])] = row
+        
+        lines = [f"*VACANCY ALERT!* ({len(latest)} indexes)"]
+        current_course = None
+        for (course_code, index_number), row in sorted(latest.items())[:DIGEST_MAX_INDEXES]:
+            if course_code != current_course:
+                lines.append(f"\n*Course:* {course_code}")
+                current_course = course_code
+            lines.append(
+                f"*Index:* {index_number} - Vacancies: {row['vacancy_count']}, "
+                f"Waitlist: {row['waitlist_count']}"
             )
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error checking alert {alert['id']}: {e}")
-            return False
+        if len(latest) > DIGEST_MAX_INDEXES:
+            lines.append(f"\n...and {len(latest) - DIGEST_MAX_INDEXES} more")
+        
+        lines.append("\nHurry! Slots may fill up quickly!\n")
+        lines.append(f"Data source: {DATA_SOURCE_LINK}")
+        
+        return {
+            'text': "\n".join(lines),
+            'parse_mode': 'Markdown',
+            'reply_markup': self._register_keyboard()
+        }
     
-    async def send_notification(self, alert, vacancy_info):
+    async def _update_index_alerts(self, course_code, index_number, alert_list, vacancy_info):
         """
-        Send vacancy notification to user.
+        Queue the check results of alerts watching one course/index for the
+        end-of-cycle batch write, which also queues their notifications.
         
         Args:
-            alert (dict): Alert information
-            vacancy_info (dict): Current vacancy information
+            course_code (str): Course code
+            index_number (str): Index number
+            alert_list (list): Alerts watching this course/index
+            vacancy_info (dict): Current vacancy information for the index
+        """
+        new_vacancy = vacancy_info['vacancy']
+        
+        for alert in alert_list:
+            self._pending_checks.append({
+                'alert_id': alert['id'],
+                'course_code': course_code,
+                'index_number': index_number,
+                'vacancy': new_vacancy,
+                'waitlist': vacancy_info['waitlist']
+            })
+        
+        logger.info(
+            f"Checked {course_code}/{index_number}: "
+            f"Vacancy: {new_vacancy}, Waitlist: {vacancy_info['waitlist']} "
+            f"({len(alert_list)} alerts)"
+        )
+    
+    async def _flush_checks(self):
         """
+        Write the cycle's queued check results in one transaction and start
+        delivering the notifications it queued.
+        Pages processed this cycle are only remembered once their results are stored.
+        
+        Returns:
+            bool: True if the results were stored
+        """
+        pending, self._pending_checks = self._pending_checks, []
+        unchanged, self._pending_unchanged = self._pending_unchanged, []
+        cycle_pages, self._cycle_pages = self._cycle_pages, {}
+        
         try:
-            message = (
-                "*VACANCY ALERT!*\n\n"
-                f"*Course:* {alert['course_code']}\n"
-                f"*Index:* {alert['index_number']}\n"
-                f"*Vacancies:* {vacancy_info['vacancy']}\n"
-                f"*Waitlist:* {vacancy_info['waitlist']}\n\n"
-                "Hurry! Slots may fill up quickly!\n\n"
-                f"Data source: {DATA_SOURCE_LINK}"
+            recorded = await adb.record_checks(pending, unchanged)
+        except Exception as e:
+            logger.error(f"Failed to record {len(pending)} alert checks: {e}")
+            for course_code in cycle_pages:
+                self._processed_pages.pop(course_code, None)
+            return False
+        
+        self._processed_pages.update(cycle_pages)
+        self.subscriptions.update_vacancies(pending)
+        if recorded['queued']:
+            self.outbox.wake()
+        if pending:
+            logger.info(
+                f"Recorded {recorded['recorded']} alert checks in one batch "
+                f"({recorded['queued']} notifications queued)"
             )
+        return True
+    
+    async def _check_course(self, course_group):
+        """
+        Fetch one course and update every alert watching its indexes.
+        
+        Args:
+            course_group (tuple): (course_code, {index_number: [alerts]})
+        """
+        course_code, index_groups = course_group
+        started = time.monotonic()
+        result = await vacancy_api.get_course_snapshot_async(course_code)
+        if result.get('error') not in ('circuit_open', 'time_restriction'):
+            self._record_fetch_latency(time.monotonic() - started)
+        
+        if not result['success']:
+            if result.get('error') in ('circuit_open', 'time_restriction'):
+                # Upstream is down or closed; keep the course due for when it is back
+                self.poll_schedule.restore(course_code)
+                return
             
-            # Create button for registration link
-            keyboard = [
-                [InlineKeyboardButton("Register Now", url="https://wish.wis.ntu.edu.sg/pls/webexe/ldap_login.login?w_url=https://wish.wis.ntu.edu.sg/pls/webexe/aus_stars_planner.main")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await self.bot.send_message(
-                chat_id=alert['telegram_id'],
-                text=message,
-                parse_mode='Markdown',
-                reply_markup=reply_markup
+            logger.warning(
+                f"Could not get vacancies for {course_code}: "
+                f"{result.get('error_message', 'Unknown error')}"
             )
+            self.poll_schedule.retry(course_code, time.monotonic())
+            return
+        
+        snapshot = result['data']
+        self.cycle_stats['courses'] += 1
+        
+        # Same page and same alert state as the last successful pass: nothing can
+        # have changed, so skip parsing results, notifications and history writes
+        alert_state = frozenset(
+            (alert['id'], alert.get('last_vacancy_count', 0))
+            for alert_list in index_groups.values()
+            for alert in alert_list
+        )
+        page_state = (snapshot.fingerprint, alert_state)
+        if self._processed_pages.get(course_code) == page_state:
+            self.cycle_stats['unchanged'] += 1
+            # Still checked: only last_checked is written for these alerts
+            self._pending_unchanged.extend(alert_id for alert_id, _ in alert_state)
+            self.poll_schedule.record(course_code, False, time.monotonic())
+            logger.debug(f"No change for {course_code}, skipping")
+            return
+        
+        # Only vacancy/waitlist counts are needed here, so use the fast-path extraction
+        updated_state = set()
+        
+        for index_number, alert_list in index_groups.items():
+            counts = snapshot.counts.get(str(index_number))
             
-            logger.info(f"Notification sent to user {alert['telegram_id']} for alert {alert['id']}")
+            if counts is None:
+                logger.warning(
+                    f"Index {index_number} not found for course {course_code} "
+                    f"({len(alert_list)} alerts skipped)"
+                )
+                updated_state.update((alert['id'], alert.get('last_vacancy_count', 0)) for alert in alert_list)
+                continue
             
+            vacancy_info = {
+                'index': str(index_number),
+                'vacancy': counts[0],
+                'waitlist': counts[1]
+            }
+            await self._update_index_alerts(course_code, index_number, alert_list, vacancy_info)
+            updated_state.update((alert['id'], vacancy_info['vacancy']) for alert in alert_list)
+        
+        # Keyed by the alert state the database will hold once the cycle is flushed
+        updated_state = frozenset(updated_state)
+        self._cycle_pages[course_code] = (snapshot.fingerprint, updated_state)
+        
+        interval = self.poll_schedule.record(course_code, updated_state != alert_state, time.monotonic())
+        logger.debug(f"Next poll of {course_code} in {interval:.0f}s")
+    
+    def _record_fetch_latency(self, latency):
+        """
+        Track the slowest recent fetch time: it jumps to a slower fetch and
+        decays by FETCH_LATENCY_DECAY per fetch otherwise.
+        
+        Args:
+            latency (float): Seconds the fetch took
+        """
+        if self._fetch_latency is None:
+            self._fetch_latency = latency
+        else:
+            self._fetch_latency = max(latency, self._fetch_latency * FETCH_LATENCY_DECAY)
+        self.schedule_stats['fetch_latency'] = self._fetch_latency
+    
+    async def _seed_poll_schedule(self, course_codes):
+        """
+        Start courses about to join the poll schedule from their recorded
+        change history; courses without any are polled right away instead.
+        
+        Args:
+            course_codes (list): Courses not in the poll schedule yet
+        """
+        try:
+            counts = await adb.get_course_change_counts(course_codes, config.POLL_HISTORY_DAYS)
         except Exception as e:
-            logger.error(f"Failed to send notification for alert {alert['id']}: {e}")
+            logger.warning(f"Could not seed poll schedule from history: {e}")
+            return
+        
+        for course_code, (changes, observed) in counts.items():
+            # A course first seen moments ago says little yet; count at least one interval
+            self.poll_schedule.seed(course_code, changes / max(observed, config.CHECK_INTERVAL))
+        logger.debug(f"Seeded poll schedule for {len(course_codes)} courses ({len(counts)} with history)")
+    
+    def record_demand(self, course_code):
+        """
+        Note that a user looked up a course, so it is polled with more priority for a while.
+        
+        Args:
+            course_code (str): Course code
+        """
+        self.poll_schedule.record_demand(course_code, time.monotonic())
     
-    async def check_all_alerts(self):
-        """Check all active alerts"""
+    async def check_all_alerts(self, deadline=None):
+        """
+        Check the alerts of every course that is due.
+        Each course is polled at its own interval from the poll schedule,
+        weighted by its number of subscribers.
+        Due courses are checked most overdue first; once the deadline passes
+        no new fetches are started and the remaining courses keep their due
+        time, so they go first next time.
+        
+        Outside the NTU service hours and while the upstream circuit breaker
+        is open the tick is skipped; courses not yet fetched when the breaker
+        opens are postponed, not shed.
+        
+        In 'spread' load mode the courses due before the deadline are taken
+        too, less the slowest recent fetch time so their fetches still end
+        within the tick, and each fetch waits for its course's due time, so
+        requests go out evenly instead of in a burst at the start of the tick.
+        
+        Args:
+            deadline (float): time.monotonic() by which the cycle should end (None = no limit)
+        """
         try:
-            alerts = db.get_all_active_alerts()
+            # Alerts grouped by course/index, from the in-memory subscription index
+            groups = await self.subscriptions.get_groups()
+            
+            # Nest the index groups under their course so each course page is fetched once
+            grouped_alerts = {}
+            alert_count = 0
+            for group in groups:
+                grouped_alerts.setdefault(group['course_code'], {})[group['index_number']] = group['alerts']
+                alert_count += len(group['alerts'])
             
-            if not alerts:
+            # Forget pages of courses nobody watches any more
+            for course_code in list(self._processed_pages):
+                if course_code not in grouped_alerts:
+                    del self._processed_pages[course_code]
+            
+            subscribers = {
+                course_code: sum(len(alert_list) for alert_list in index_groups.values())
+                for course_code, index_groups in grouped_alerts.items()
+            }
+            new_courses = [
+                course_code for course_code in subscribers
+                if self.poll_schedule.due_at(course_code) is None
+            ]
+            if new_courses:
+                await self._seed_poll_schedule(new_courses)
+            self.poll_schedule.sync(subscribers, time.monotonic())
+            
+            if not groups:
                 logger.debug("No active alerts to check")
                 return
             
-            logger.info(f"Checking {len(alerts)} active alerts...")
+            # Outside service hours every fetch would be refused; courses stay due
+            service_available, _ = vacancy_api.is_service_available()
+            if not service_available:
+                logger.debug("NTU vacancy service outside its hours, skipping tick")
+                return
             
-            # Group alerts by (course_code, index_number) to avoid duplicate API calls
-            grouped_alerts = {}
-            for alert in alerts:
-                key = (alert['course_code'], alert['index_number'])
-                if key not in grouped_alerts:
-                    grouped_alerts[key] = []
-                grouped_alerts[key].append(alert)
+            # While the circuit breaker is open every fetch would be refused; courses stay due
+            if not vacancy_api.upstream_available():
+                logger.debug("NTU upstream unavailable (circuit open), skipping tick")
+                return
+            
+            spread = self.poll_schedule.spread and deadline is not None
+            horizon = time.monotonic()
+            if spread and self._fetch_latency is not None:
+                # Courses due later could not finish by the deadline; they go next tick
+                horizon = max(horizon, deadline - self._fetch_latency)
+            due = [(course_code, grouped_alerts[course_code])
+                   for course_code in self.poll_schedule.pop_due(horizon)]
+            if not due:
+                logger.debug(f"No courses due ({len(grouped_alerts)} watched)")
+                return
             
-            logger.info(f"Grouped into {len(grouped_alerts)} unique course/index combinations")
+            logger.info(
+                f"Checking {sum(len(a) for _, index_groups in due for a in index_groups.values())} alerts "
+                f"in {len(due)} due courses ({alert_count} alerts in {len(grouped_alerts)} courses watched)"
+            )
+            
+            # Fetch each course once and fan the result out to every watched index
+            self.cycle_stats = {'courses': 0, 'unchanged': 0, 'shed': 0, 'postponed': 0}
+            self._pending_checks = []
+            self._pending_unchanged = []
+            self._cycle_pages = {}
+            cycle_start = time.monotonic()
+            shed = []
+            try:
+                shed = await self.scheduler.run(
+                    due,
+                    self._check_course,
+                    lambda: (
+                        self.running
+                        and (deadline is None or time.monotonic() < deadline)
+                        and vacancy_api.upstream_available()
+                    ),
+                    (lambda item: self.poll_schedule.due_at(item[0]) or 0.0) if spread else None
+                )
+            finally:
+                # One transaction for the whole cycle
+                await self._flush_checks()
+                for course_code, _ in shed:
+                    self.poll_schedule.restore(course_code)
+                self.poll_schedule.release(time.monotonic())
             
-            # Check each unique course/index combination once
-            for (course_code, index_number), alert_list in grouped_alerts.items():
-                if not self.running:
-                    break
-                
-                # Get vacancy info once for this course/index
-                result = vacancy_api.get_index_vacancy(course_code, index_number)
-                
-                if not result['success']:
-                    logger.warning(
-                        f"Could not get vacancy for {course_code}/{index_number}: "
-                        f"{result.get('error_message', 'Unknown error')}"
-                    )
-                    # Small delay before next check
-                    await asyncio.sleep(2)
-                    continue
-                
-                vacancy_info = result['data']
-                
-                # Update all alerts for this course/index
-                for alert in alert_list:
-                    try:
-                        # Update database
-                        db.update_alert_check(
-                            alert['id'],
-                            vacancy_info['vacancy'],
-                            vacancy_info['waitlist']
-                        )
-                        
-                        # Check if we should send notification
-                        old_vacancy = alert.get('last_vacancy_count', 0)
-                        new_vacancy = vacancy_info['vacancy']
-                        
-                        # Send notification if vacancy opened up (was 0, now > 0)
-                        if old_vacancy == 0 and new_vacancy > 0:
-                            await self.send_notification(alert, vacancy_info)
-                            db.mark_notification_sent(alert['id'])
-                        
-                        logger.debug(
-                            f"Updated alert {alert['id']}: "
-                            f"{course_code}/{index_number} - "
-                            f"Vacancy: {new_vacancy}, Waitlist: {vacancy_info['waitlist']}"
-                        )
-                    except Exception as e:
-                        logger.error(f"Error updating alert {alert['id']}: {e}")
-                
-                logger.info(
-                    f"Checked {course_code}/{index_number}: "
-                    f"Vacancy: {vacancy_info['vacancy']}, Waitlist: {vacancy_info['waitlist']} "
-                    f"({len(alert_list)} alerts updated)"
+            if shed and self.running and not vacancy_api.upstream_available():
+                self.cycle_stats['postponed'] = len(shed)
+                logger.warning(
+                    f"NTU upstream unavailable (circuit open): postponed {len(shed)} of {len(due)} "
+                    f"due courses until it recovers"
+                )
+            elif shed and self.running:
+                self.cycle_stats['shed'] = len(shed)
+                self.schedule_stats['shed_courses'] += len(shed)
+                logger.warning(
+                    f"Cycle deadline reached: shed {len(shed)} of {len(due)} due courses "
+                    f"({sum(len(a) for _, index_groups in shed for a in index_groups.values())} alerts), "
+                    f"they stay due"
                 )
-                
-                # Small delay between checks to avoid rate limiting
-                await asyncio.sleep(2)
             
-            logger.info("Completed alert check cycle")
+            stats = vacancy_api.get_stats()
+            checked = self.cycle_stats['courses']
+            unchanged = self.cycle_stats['unchanged']
+            logger.info(
+                f"Completed alert check cycle in {time.monotonic() - cycle_start:.1f}s "
+                f"(unchanged courses: {unchanged}/{checked}"
+                f"{f' = {unchanged / checked:.0%}' if checked else ''}, "
+                f"upstream fetches: {stats['fetches']}, coalesced: {stats['coalesced']}, "
+                f"unchanged pages: {stats['unchanged_rate']:.0%})"
+            )
             
         except Exception as e:
             logger.error(f"Error in check_all_alerts: {e}")
     
+    async def maintain_history(self):
+        """
+        Pre-create and expire history partitions and purge finished outbox
+        rows, at most once per HISTORY_MAINTENANCE_INTERVAL.
+        """
+        now = time.monotonic()
+        if self._last_maintenance is not None and now - self._last_maintenance < HISTORY_MAINTENANCE_INTERVAL:
+            return
+        
+        self._last_maintenance = now
+        try:
+            result = await adb.maintain_history_partitions()
+            logger.debug(
+                f"History maintenance done (created: {len(result['created'])}, "
+                f"removed: {len(result['removed'])})"
+            )
+        except Exception as e:
+            logger.error(f"History maintenance failed: {e}")
+        
+        await self.outbox.purge()
+    
+    def log_stats(self):
+        """Log the statistics of the checker's components, at most once per STATS_LOG_INTERVAL"""
+        now = time.monotonic()
+        if self._last_stats_log is not None and now - self._last_stats_log < STATS_LOG_INTERVAL:
+            return
+        
+        self._last_stats_log = now
+        logger.info(f"Database pool stats: {adb.get_pool_stats()}")
+        logger.info(f"Subscription index stats: {self.subscriptions.get_stats()}")
+        logger.info(f"Notification dispatcher stats: {self.dispatcher.get_stats()}")
+        logger.info(f"Notification outbox stats: {self.outbox.get_stats()}")
+        logger.info(f"Poll schedule stats: {self.poll_schedule.get_stats(now)}")
+        
+        upstream = vacancy_api.get_stats()
+        spacing = ', '.join(f"{bucket}: {count}" for bucket, count in upstream['spacing_histogram'].items())
+        logger.info(f"Upstream request spacing: {spacing}")
+        logger.info(f"Circuit breaker stats: {upstream['circuit']}")
+    
+    def _record_cycle_timing(self, lateness, duration, interval):
+        """
+        Update the scheduling metrics after a cycle.
+        
+        Args:
+            lateness (float): Seconds the cycle started after its scheduled tick
+            duration (float): Seconds the cycle took
+            interval (float): Scheduled seconds between cycle starts
+        """
+        stats = self.schedule_stats
+        stats['cycles'] += 1
+        stats['last_lateness'] = lateness
+        stats['max_lateness'] = max(stats['max_lateness'], lateness)
+        stats['last_duration'] = duration
+        stats['max_duration'] = max(stats['max_duration'], duration)
+        
+        if duration > interval:
+            stats['overruns'] += 1
+            logger.warning(
+                f"Check cycle overran its {interval}s slot: took {duration:.1f}s "
+                f"(started {lateness:.1f}s late, {stats['overruns']}/{stats['cycles']} cycles overran)"
+            )
+        else:
+            logger.debug(
+                f"Check cycle used {duration / interval:.0%} of its {interval}s slot "
+                f"(started {lateness:.1f}s late)"
+            )
+    
     async def run_forever(self):
         """
         Run the checker loop indefinitely.
-        Checks all alerts at regular intervals defined in config.
+        Cycles start at a fixed rate: every POLL_TICK_INTERVAL seconds
+        measured from the first start, not from the end of the previous
+        cycle, and check the courses that are due. Each cycle has to finish
+        by the next tick and sheds the rest of its courses when it runs out
+        of time; ticks missed entirely are skipped rather than run back to back.
         """
         self.running = True
         self.bot = Bot(token=config.TELEGRAM_BOT_TOKEN)
         
-        logger.info(f"Starting vacancy checker (interval: {config.CHECK_INTERVAL}s)")
+        logger.info(
+            f"Starting vacancy checker (tick: {config.POLL_TICK_INTERVAL}s, "
+            f"course intervals: {config.POLL_MIN_INTERVAL}-{config.POLL_MAX_INTERVAL}s)"
+        )
+        self.subscriptions.start()
+        self.dispatcher.start(self.bot)
+        self.outbox.start()
         
-        while self.running:
-            try:
-                await self.check_all_alerts()
-                
-                # Wait for next check interval
-                if self.running:
-                    logger.debug(f"Sleeping for {config.CHECK_INTERVAL}s")
-                    await asyncio.sleep(config.CHECK_INTERVAL)
-                
-            except Exception as e:
-                logger.error(f"Error in checker loop: {e}")
-                # Wait a bit before retrying
-                await asyncio.sleep(60)
+        interval = config.POLL_TICK_INTERVAL
+        next_tick = time.monotonic()
+        
+        try:
+            while self.running:
+                try:
+                    cycle_start = time.monotonic()
+                    lateness = cycle_start - next_tick
+                    
+                    await self.maintain_history()
+                    await self.check_all_alerts(deadline=next_tick + interval)
+                    self._record_cycle_timing(lateness, time.monotonic() - cycle_start, interval)
+                    self.log_stats()
+                    
+                    # Next tick on the fixed grid; ticks already over are skipped
+                    next_tick += interval
+                    now = time.monotonic()
+                    missed = int((now - next_tick) // interval) if now > next_tick else 0
+                    if missed:
+                        next_tick += missed * interval
+                        self.schedule_stats['skipped_ticks'] += missed
+                        logger.warning(f"Skipped {missed} missed check cycles")
+                    
+                    # Wait for the next tick
+                    if self.running and next_tick > now:
+                        logger.debug(f"Sleeping for {next_tick - now:.1f}s")
+                        await asyncio.sleep(next_tick - now)
+                    
+                except Exception as e:
+                    logger.error(f"Error in checker loop: {e}")
+                    # Wait a bit before retrying, then start a fresh grid
+                    await asyncio.sleep(60)
+                    next_tick = time.monotonic()
+        finally:
+            self.subscriptions.stop()
+            await self.outbox.stop()
+            await self.dispatcher.stop()
     
     def stop(self):
         """Stop the vacancy checker"""
         self.running = False
+        self.subscriptions.stop()
         logger.info("Vacancy checker stopped")
 
 
@@ -4,33 +4,204 @@ Handles parsing of HTML responses from the NTU STARS vacancy API
 """
 
 from bs4 import BeautifulSoup
+from .config import config
 from .logger import get_logger
+from .models import ClassSession, IndexInfo
+
+# Optional C-based HTML parsers, used when installed
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html as lxml_html
+except ImportError:
+    lxml_html = None
 
 logger = get_logger(__name__)
 
 
+# Data rows have 8 cells: index, vacancy, waitlist, type, group, day, time, venue
+ROW_CELLS = 8
+
+
+def _collect_rows(rows, cells_of, text_of, columns, index_rows_only):
+    """
+    Extract cell texts from table rows with a backend's node accessors.
+    
+    Args:
+        rows (iterable): Table row nodes after the header row
+        cells_of (callable): Returns the cell nodes of a row
+        text_of (callable): Returns the stripped text of a cell node
+        columns (int): Number of leading cells to extract text from
+        index_rows_only (bool): Skip continuation rows (empty index cell)
+    
+    Returns:
+        list: Rows as lists of the first `columns` stripped cell texts
+    """
+    extracted = []
+    for row in rows:
+        cells = cells_of(row)
+        if len(cells) < ROW_CELLS:
+            continue
+        
+        first = text_of(cells[0])
+        if index_rows_only and not first:
+            continue
+        
+        extracted.append([first] + [text_of(cell) for cell in cells[1:columns]])
+    return extracted
+
+
+def _table_rows_selectolax(html, columns=ROW_CELLS, index_rows_only=False):
+    """
+    Extract vacancy table rows using selectolax (lexbor).
+    
+    Args:
+        html (str): HTML response from API
+        columns (int): Number of leading cells to extract text from
+        index_rows_only (bool): Skip continuation rows (empty index cell)
+    
+    Returns:
+        list: Data rows as lists of stripped cell texts,
+              or None if there is no vacancy table
+    """
+    table = LexborHTMLParser(html).css_first('table[border]')
+    if table is None:
+        return None
+    
+    return _collect_rows(
+        table.css('tr')[1:],
+        lambda row: row.css('td'),
+        lambda cell: cell.text(deep=True, separator='', strip=True),
+        columns,
+        index_rows_only
+    )
+
+
+def _table_rows_lxml(html, columns=ROW_CELLS, index_rows_only=False):
+    """
+    Extract vacancy table rows using lxml.
+    
+    Args:
+        html (str): HTML response from API
+        columns (int): Number of leading cells to extract text from
+        index_rows_only (bool): Skip continuation rows (empty index cell)
+    
+    Returns:
+        list: Data rows as lists of stripped cell texts,
+              or None if there is no vacancy table
+    """
+    if not html.strip():
+        return None
+    
+    tables = lxml_html.fromstring(html).xpath('//table[@border]')
+    if not tables:
+        return None
+    
+    # Join stripped text nodes like BeautifulSoup's get_text(strip=True)
+    return _collect_rows(
+        list(tables[0].iter('tr'))[1:],
+        lambda row: list(row.iter('td')),
+        lambda cell: ''.join(text.strip() for text in cell.itertext()),
+        columns,
+        index_rows_only
+    )
+
+
+def _table_rows_html_parser(html, columns=ROW_CELLS, index_rows_only=False):
+    """
+    Extract vacancy table rows using BeautifulSoup's pure-Python html.parser.
+    
+    Args:
+        html (str): HTML response from API
+        columns (int): Number of leading cells to extract text from
+        index_rows_only (bool): Skip continuation rows (empty index cell)
+    
+    Returns:
+        list: Data rows as lists of stripped cell texts,
+              or None if there is no vacancy table
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    table = soup.find('table', {'border': True})
+    if not table:
+        return None
+    
+    return _collect_rows(
+        table.find_all('tr')[1:],
+        lambda row: row.find_all('td'),
+        lambda cell: cell.get_text(strip=True),
+        columns,
+        index_rows_only
+    )
+
+
+# Available parser backends, fastest first
+PARSER_BACKENDS = {}
+if LexborHTMLParser is not None:
+    PARSER_BACKENDS['selectolax'] = _table_rows_selectolax
+if lxml_html is not None:
+    PARSER_BACKENDS['lxml'] = _table_rows_lxml
+PARSER_BACKENDS['html.parser'] = _table_rows_html_parser
+
+
 class VacancyParser:
-    """Parser for NTU STARS vacancy HTML responses"""
+    """
+    Parser for NTU STARS vacancy HTML responses.
+    The HTML backend is pluggable: 'auto' picks the fastest installed one
+    (selectolax, then lxml) and falls back to BeautifulSoup's html.parser.
+    """
+    
+    backend = 'html.parser'
+    
+    @staticmethod
+    def set_backend(name):
+        """
+        Select the HTML parser backend.
+        
+        Args:
+            name (str): 'auto', 'selectolax', 'lxml' or 'html.parser'
+        
+        Returns:
+            str: Name of the backend now in use
+        
+        Raises:
+            ValueError: If the backend is unknown or not installed
+        """
+        if name == 'auto':
+            name = next(iter(PARSER_BACKENDS))
+        elif name not in PARSER_BACKENDS:
+            raise ValueError(
+                f"Parser backend '{name}' is not available "
+                f"(installed: {', '.join(PARSER_BACKENDS)})"
+            )
+        
+        VacancyParser.backend = name
+        logger.info(f"Using '{name}' HTML parser backend")
+        return name
     
     @staticmethod
-    def parse_vacancy_html(html, course_code):
+    def parse_vacancy_html(html, course_code, backend=None):
         """
         Parse HTML response to extract vacancy information.
         
         Args:
             html (str): HTML response from API
             course_code (str): Course code being parsed
+            backend (str, optional): Parser backend to use (defaults to the selected one)
         
         Returns:
-            list: List of index dictionaries, or None if parsing fails
+            list: List of IndexInfo records (usable as dicts), or None if parsing fails
             
-        Example return:
+        Example return (shown as the equivalent dicts):
             [
                 {
                     'index': '10294',
                     'vacancy': 0,
                     'waitlist': 5,
-                    'classes': [
+                    'classes': (
                         {
                             'type': 'LEC',
                             'group': 'LE1',
@@ -39,40 +210,27 @@ class VacancyParser:
                             'venue': 'LT1A'
                         },
                         ...
-                    ]
+                    )
                 },
                 ...
             ]
         """
         try:
-            soup = BeautifulSoup(html, 'html.parser')
+            extract_rows = PARSER_BACKENDS[backend or VacancyParser.backend]
             
-            # Find the vacancy table
-            table = soup.find('table', {'border': True})
-            if not table:
+            # Find the vacancy table and its rows (header row skipped)
+            rows = extract_rows(html)
+            if rows is None:
                 logger.warning(f"No vacancy table found for course {course_code}")
                 return []
             
-            indexes = []
-            current_index = None
-            
-            # Skip header row
-            rows = table.find_all('tr')[1:]
+            # (index, vacancy, waitlist, sessions) collected before building records
+            pending = []
+            current_classes = None
             
-            for row in rows:
-                cells = row.find_all('td')
-                if len(cells) < 8:
-                    continue
-                
+            for cells in rows:
                 # Get cell values
-                index_num = cells[0].get_text(strip=True)
-                vacancy_text = cells[1].get_text(strip=True)
-                waitlist_text = cells[2].get_text(strip=True)
-                class_type = cells[3].get_text(strip=True)
-                group = cells[4].get_text(strip=True)
-                day = cells[5].get_text(strip=True)
-                time = cells[6].get_text(strip=True)
-                venue = cells[7].get_text(strip=True)
+                index_num, vacancy_text, waitlist_text, class_type, group, day, time, venue = cells
                 
                 # Check if this is a new index or continuation
                 if index_num and index_num not in ['', '&nbsp;']:
@@ -80,30 +238,58 @@ class VacancyParser:
                     vacancy = VacancyParser._parse_number(vacancy_text)
                     waitlist = VacancyParser._parse_number(waitlist_text)
                     
-                    current_index = {
-                        'index': index_num,
-                        'vacancy': vacancy,
-                        'waitlist': waitlist,
-                        'classes': []
-                    }
-                    indexes.append(current_index)
+                    current_classes = []
+                    pending.append((index_num, vacancy, waitlist, current_classes))
                 
                 # Add class session to current index
-                if current_index and class_type:
-                    current_index['classes'].append({
-                        'type': class_type,
-                        'group': group,
-                        'day': day,
-                        'time': time,
-                        'venue': venue
-                    })
+                if current_classes is not None and class_type:
+                    current_classes.append(ClassSession(class_type, group, day, time, venue))
             
-            return indexes
+            return [
+                IndexInfo(index_num, vacancy, waitlist, classes)
+                for index_num, vacancy, waitlist, classes in pending
+            ]
             
         except Exception as e:
             logger.error(f"Error parsing HTML for {course_code}: {e}")
             return None
     
+    @staticmethod
+    def parse_vacancy_counts(html, course_code, backend=None):
+        """
+        Fast path that extracts only vacancy and waitlist counts per index.
+        Reads just the first three cells of rows that start an index and
+        skips class sessions entirely; used by the background checker.
+        
+        Args:
+            html (str): HTML response from API
+            course_code (str): Course code being parsed
+            backend (str, optional): Parser backend to use (defaults to the selected one)
+        
+        Returns:
+            dict: Mapping of index number to (vacancy, waitlist), or None if parsing fails
+        
+        Example return:
+            {'10294': (0, 5), '10295': (3, 0)}
+        """
+        try:
+            extract_rows = PARSER_BACKENDS[backend or VacancyParser.backend]
+            
+            rows = extract_rows(html, columns=3, index_rows_only=True)
+            if rows is None:
+                logger.warning(f"No vacancy table found for course {course_code}")
+                return {}
+            
+            return {
+                index_num: (VacancyParser._parse_number(vacancy_text), VacancyParser._parse_number(waitlist_text))
+                for index_num, vacancy_text, waitlist_text in rows
+                if index_num != '&nbsp;'
+            }
+            
+        except Exception as e:
+            logger.error(f"Error parsing vacancy counts for {course_code}: {e}")
+            return None
+    
     @staticmethod
     def _parse_number(text):
         """
@@ -130,7 +316,7 @@ class VacancyParser:
         Format index information for display to users.
         
         Args:
-            index_info (dict): Index information dictionary
+            index_info (IndexInfo or dict): Index information
         
         Returns:
             str: Formatted string for display
@@ -178,5 +364,12 @@ class VacancyParser:
         return '\n'.join(lines)
 
 
+# Select the configured backend, falling back to the fastest installed one
+try:
+    VacancyParser.set_backend(config.PARSER_BACKEND)
+except ValueError as e:
+    logger.warning(f"{e}; using automatic selection")
+    VacancyParser.set_backend('auto')
+
 # Convenience instance
 parser = VacancyParser()
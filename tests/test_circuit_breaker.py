@@ -0,0 +1,126 @@
+"""
+Tests for the upstream circuit breaker state machine.
+"""
+
+import pytest
+
+from src import circuit_breaker
+from src.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    """Stands in for the time module; advanced by hand"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freeze the breaker's clock"""
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker, 'time', fake)
+    return fake
+
+
+def _breaker():
+    """Opens at 50% failures over at least 4 requests; 10 s first cooldown, 40 s at most"""
+    return CircuitBreaker('upstream', error_rate=0.5, min_requests=4, window=10,
+                          slow_call=5.0, cooldown=10.0, max_cooldown=40.0)
+
+
+def _open(breaker):
+    """Fail enough requests to open a closed breaker"""
+    for _ in range(4):
+        breaker.record_failure(breaker.allow())
+    assert breaker.state == OPEN
+
+
+def test_opens_at_error_rate(clock):
+    """Failures below min_requests or the error rate keep it closed"""
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_failure(breaker.allow())
+    assert breaker.state == CLOSED
+    
+    breaker.record_success(breaker.allow(), 0.1)
+    assert breaker.state == CLOSED
+    
+    breaker.record_failure(breaker.allow())
+    assert breaker.state == OPEN
+    assert breaker.allow() is None
+    assert not breaker.is_available()
+    assert 5.0 <= breaker.retry_in() <= 10.0
+    assert breaker.get_stats()['rejected'] == 1
+
+
+def test_slow_responses_count_as_failures(clock):
+    """A success slower than slow_call counts against the window"""
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record_success(breaker.allow(), 6.0)
+    assert breaker.state == OPEN
+
+
+def test_single_probe_closes_on_success(clock):
+    """After the cooldown one probe goes through and its success closes the breaker"""
+    breaker = _breaker()
+    _open(breaker)
+    clock.now += 10.0
+    
+    assert breaker.is_available()
+    probe = breaker.allow()
+    assert probe is not None
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is None
+    assert not breaker.is_available()
+    
+    breaker.record_success(probe, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.allow() is not None
+
+
+def test_failed_probe_reopens_with_backoff(clock):
+    """Each failed probe doubles the cooldown, up to max_cooldown"""
+    breaker = _breaker()
+    _open(breaker)
+    
+    for cooldown in (20.0, 40.0, 40.0):
+        clock.now += 40.0
+        breaker.record_failure(breaker.allow())
+        assert breaker.state == OPEN
+        assert cooldown / 2 <= breaker.retry_in() <= cooldown
+
+
+def test_late_outcomes_do_not_decide_half_open(clock):
+    """Requests sent before the breaker opened cannot close or reopen it; only the probe can"""
+    breaker = _breaker()
+    early = [breaker.allow() for _ in range(2)]
+    _open(breaker)
+    clock.now += 10.0
+    probe = breaker.allow()
+    
+    breaker.record_success(early[0], 0.1)
+    assert breaker.state == HALF_OPEN
+    breaker.record_failure(early[1])
+    assert breaker.state == HALF_OPEN
+    assert breaker.get_stats()['stale'] == 2
+    
+    breaker.record_success(probe, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_late_failures_do_not_count_after_recovery(clock):
+    """Failures of requests from before an opening do not count towards the next one"""
+    breaker = _breaker()
+    early = [breaker.allow() for _ in range(4)]
+    _open(breaker)
+    clock.now += 10.0
+    breaker.record_success(breaker.allow(), 0.1)
+    
+    for ticket in early:
+        breaker.record_failure(ticket)
+    assert breaker.state == CLOSED
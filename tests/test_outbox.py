@@ -0,0 +1,202 @@
+"""
+Tests for the notification outbox worker.
+The worker runs against an in-memory stand-in for the outbox table; the
+claim/lease SQL itself runs against PostgreSQL when TEST_DATABASE_URL is set.
+"""
+
+import asyncio
+import os
+
+import pytest
+import pytest_asyncio
+
+from src import outbox as outbox_module
+from src.async_database import adb
+from src.database import db
+from src.notifier import NotificationDispatcher
+from src.outbox import NotificationOutbox
+
+
+class FakeBot:
+    """Records sent messages; chats in `blocked` fail, `delay` slows every send"""
+    
+    def __init__(self, delay=0.0, blocked=()):
+        self.delay = delay
+        self.blocked = set(blocked)
+        self.sent = []
+    
+    async def send_message(self, chat_id, **message):
+        await asyncio.sleep(self.delay)
+        if chat_id in self.blocked:
+            raise RuntimeError("Forbidden: bot was blocked by the user")
+        self.sent.append(chat_id)
+
+
+class FakeOutboxTable:
+    """Pending outbox rows plus the delivered/failed marks the worker makes"""
+    
+    def __init__(self, rows):
+        self.rows = rows
+        self.delivered = []
+        self.failed = []
+    
+    async def claim_outbox(self, limit, lease_seconds):
+        rows, self.rows = self.rows, []
+        return rows
+    
+    async def mark_outbox_delivered(self, outbox_ids):
+        self.delivered.extend(outbox_ids)
+        return len(outbox_ids)
+    
+    async def mark_outbox_failed(self, outbox_ids, error, max_attempts, retry_delay):
+        self.failed.extend(outbox_ids)
+        return 0
+
+
+def _row(outbox_id, telegram_id):
+    """Build a claimed outbox row"""
+    return {
+        'id': outbox_id, 'alert_id': outbox_id, 'telegram_id': telegram_id,
+        'course_code': 'SC2103', 'index_number': str(10000 + outbox_id),
+        'vacancy_count': 1, 'waitlist_count': 0, 'attempts': 1, 'created_at': None
+    }
+
+
+@pytest.fixture
+def table(monkeypatch):
+    """Route the worker's adb calls to an in-memory table"""
+    fake = FakeOutboxTable([])
+    for name in ('claim_outbox', 'mark_outbox_delivered', 'mark_outbox_failed'):
+        monkeypatch.setattr(outbox_module.adb, name, getattr(fake, name))
+    return fake
+
+
+def _worker(dispatcher):
+    """Outbox worker rendering each chat's rows as their count"""
+    return NotificationOutbox(
+        dispatcher, lambda rows: {'text': str(len(rows))},
+        batch_size=100, poll_interval=60, digest_window=0,
+        max_attempts=3, retry_delay=1, lease=300
+    )
+
+
+def _dispatcher(bot, concurrency=4):
+    """Started dispatcher without rate limits or retries"""
+    dispatcher = NotificationDispatcher(
+        concurrency=concurrency, rate=1000, per_chat_interval=0, max_retries=0
+    )
+    dispatcher.start(bot)
+    return dispatcher
+
+
+@pytest.mark.asyncio
+async def test_drain_sends_one_message_per_chat(table):
+    """Rows of a chat are coalesced; each chat's rows are marked by its send result"""
+    bot = FakeBot(blocked={2})
+    dispatcher = _dispatcher(bot)
+    worker = _worker(dispatcher)
+    table.rows = [_row(1, 1), _row(2, 2), _row(3, 1), _row(4, 3)]
+    
+    assert await worker.drain_once() == 3
+    await dispatcher.stop()
+    
+    assert sorted(bot.sent) == [1, 3]
+    assert sorted(table.delivered) == [1, 3, 4]
+    assert table.failed == [2]
+    assert worker.get_stats() == {
+        'delivered': 3, 'messages': 2, 'coalesced': 1, 'retried': 1, 'given_up': 0
+    }
+
+
+@pytest.mark.asyncio
+async def test_stop_waits_for_round_in_flight(table):
+    """Stopping mid-round lets the round finish and record its deliveries"""
+    bot = FakeBot(delay=0.05)
+    dispatcher = _dispatcher(bot)
+    worker = _worker(dispatcher)
+    table.rows = [_row(i, i) for i in range(1, 6)]
+    
+    worker.start()
+    await asyncio.sleep(0.01)
+    await worker.stop()
+    await dispatcher.stop()
+    
+    assert sorted(table.delivered) == [1, 2, 3, 4, 5]
+    assert sorted(bot.sent) == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_stop_timeout_records_what_was_sent(table):
+    """A round cut short by the timeout marks its sent rows and drops the rest"""
+    bot = FakeBot(delay=0.05)
+    dispatcher = _dispatcher(bot, concurrency=1)
+    worker = _worker(dispatcher)
+    table.rows = [_row(i, i) for i in range(1, 11)]
+    
+    worker.start()
+    await asyncio.sleep(0.12)
+    await worker.stop(timeout=0.01)
+    await asyncio.sleep(0.1)
+    await dispatcher.stop()
+    
+    # Sent rows are marked; the message being sent at cancellation may still go
+    # out and is resent after the lease, but queued ones are never sent
+    assert table.delivered and set(table.delivered) <= set(bot.sent)
+    assert len(bot.sent) <= len(table.delivered) + 1
+    assert len(bot.sent) < 10
+    assert table.failed == []
+
+
+@pytest_asyncio.fixture
+async def database():
+    """Fresh schema and a test user in the PostgreSQL database at TEST_DATABASE_URL"""
+    url = os.getenv('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    
+    db.db_config = {'dsn': url}
+    adb.conninfo = url
+    db.init_database()
+    await adb.add_user(990000001, 'outbox_test')
+    yield adb
+    await adb.delete_user(990000001)
+    await adb.close()
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_claim_lease_and_mark(database):
+    """Claimed rows are leased, delivered rows leave the queue, failed rows come back later"""
+    alert_ids = [
+        await database.add_alert(990000001, 'SC2103', index_number)
+        for index_number in ('10294', '10295')
+    ]
+    recorded = await database.record_checks([
+        {'alert_id': alert_id, 'course_code': 'SC2103', 'index_number': index_number,
+         'vacancy': 2, 'waitlist': 0}
+        for alert_id, index_number in zip(alert_ids, ('10294', '10295'))
+    ])
+    assert recorded == {'recorded': 2, 'queued': 2}
+    
+    rows = await database.claim_outbox(100, 300)
+    assert sorted(row['alert_id'] for row in rows) == sorted(alert_ids)
+    assert await database.claim_outbox(100, 300) == []
+    
+    await database.mark_outbox_delivered([rows[0]['id']])
+    assert await database.mark_outbox_failed([rows[1]['id']], 'delivery failed', 3, 0) == 0
+    retried = await database.claim_outbox(100, 300)
+    assert [row['id'] for row in retried] == [rows[1]['id']]
+    assert retried[0]['attempts'] == 2
+
+
+@pytest.mark.asyncio
+async def test_claim_skips_paused_users(database):
+    """Notifications of a user who paused after they were queued are cancelled"""
+    alert_id = await database.add_alert(990000001, 'SC2103', '10296')
+    await database.record_checks([{
+        'alert_id': alert_id, 'course_code': 'SC2103', 'index_number': '10296',
+        'vacancy': 1, 'waitlist': 0
+    }])
+    await database.pause_user(990000001, 20)
+    
+    assert await database.claim_outbox(100, 300) == []
@@ -0,0 +1,119 @@
+"""
+Tests for the adaptive per-course poll schedule.
+"""
+
+import pytest
+
+from src.poll_schedule import PollSchedule
+
+DAY = 24 * 60 * 60
+
+
+def _schedule(budget=1.0, spread=False, **kwargs):
+    """Schedule with 60 s - 1800 s intervals and a 300 s default"""
+    return PollSchedule(60, 1800, 300, 6 * 60 * 60, budget, 1.0, spread=spread, jitter=0.0, **kwargs)
+
+
+def test_unseen_courses_are_due_at_once():
+    """Courses without history are polled right away; seeded ones start at their phase"""
+    schedule = _schedule(spread=True)
+    schedule.seed('SEEN', 0.0)
+    
+    added = schedule.sync({'SEEN': 1, 'NEW': 1}, 1000.0)
+    
+    assert sorted(added) == ['NEW', 'SEEN']
+    assert schedule.pop_due(1000.0) == ['NEW']
+    assert 1000.0 < schedule.due_at('SEEN') <= 1000.0 + schedule.interval('SEEN', 1000.0)
+
+
+def test_quiet_history_polls_at_fairness_floor():
+    """A course seeded with no changes is polled at max_interval, not the default"""
+    schedule = _schedule()
+    schedule.seed('QUIET', 0.0)
+    schedule.sync({'QUIET': 1, 'NEW': 1}, 0.0)
+    
+    assert schedule.change_rate('QUIET') == 0.0
+    assert schedule.change_rate('NEW') == pytest.approx(1 / 300)
+    assert schedule.interval('QUIET', 0.0) == 1800
+    assert schedule.interval('NEW', 0.0) == 60
+
+
+def test_change_rate_follows_polls():
+    """Polls that see changes raise the rate; unchanged polls lower it"""
+    schedule = _schedule()
+    schedule.sync({'BUSY': 1, 'CALM': 1}, 0.0)
+    now = 0.0
+    for _ in range(50):
+        now += 120
+        schedule.record('BUSY', True, now)
+        schedule.record('CALM', False, now)
+    
+    assert schedule.change_rate('BUSY') > 1 / 300 > schedule.change_rate('CALM')
+
+
+def test_removed_courses_are_dropped():
+    """Courses nobody watches any more leave the schedule and its history"""
+    schedule = _schedule()
+    schedule.sync({'A': 1, 'B': 1}, 0.0)
+    schedule.sync({'A': 1}, 10.0)
+    
+    assert len(schedule) == 1
+    assert schedule.due_at('B') is None
+    assert schedule.pop_due(10.0) == ['A']
+
+
+def _subscribers(schedule, count, busy=()):
+    """Watch `count` quiet single-subscriber courses plus busy ones"""
+    subscribers = {f'C{i}': 1 for i in range(count)}
+    subscribers.update({course_code: 50 for course_code in busy})
+    for course_code in subscribers:
+        schedule.seed(course_code, 1 / 3000)
+    for course_code in busy:
+        schedule.seed(course_code, 1 / 100)
+    schedule.sync(subscribers, 0.0)
+    return subscribers
+
+
+def _total_rate(schedule, subscribers):
+    """Polls per second the schedule adds up to"""
+    return sum(1 / schedule.interval(course_code, 0.0) for course_code in subscribers)
+
+
+def test_budget_is_shared_by_priority():
+    """Poll rates add up to the budget and grow with sqrt(weight x change rate)"""
+    schedule = _schedule(budget=0.1)
+    subscribers = _subscribers(schedule, 20, busy=('BUSY',))
+    
+    assert _total_rate(schedule, subscribers) == pytest.approx(0.1, rel=1e-6)
+    assert schedule.interval('BUSY', 0.0) == 60
+    # BUSY is capped at min_interval; the 20 equal courses share the rest evenly
+    assert schedule.interval('C0', 0.0) == pytest.approx(20 / (0.1 - 1 / 60), rel=1e-6)
+    
+    # Four times the change rate, twice the poll rate
+    schedule.seed('C1', 4 / 3000)
+    schedule.rebalance(0.0)
+    assert schedule.interval('C1', 0.0) == pytest.approx(schedule.interval('C0', 0.0) / 2, rel=1e-6)
+
+
+def test_default_budget_scales_with_courses():
+    """Without a budget every course costs one poll per default interval, up to max_budget"""
+    schedule = _schedule(budget=0)
+    subscribers = _subscribers(schedule, 300)
+    
+    assert schedule.total_budget(300) == pytest.approx(1.0)
+    assert schedule.interval('C0', 0.0) == pytest.approx(300)
+    
+    capped = _schedule(budget=0, max_budget=0.5)
+    subscribers = _subscribers(capped, 300)
+    assert _total_rate(capped, subscribers) == pytest.approx(0.5, rel=1e-6)
+    assert capped.interval('C0', 0.0) == pytest.approx(600)
+
+
+def test_small_budget_still_ranks_by_priority():
+    """A budget below the fairness floor lowers the floor but keeps ranking courses"""
+    schedule = _schedule(budget=0.1)
+    subscribers = _subscribers(schedule, 400, busy=('BUSY',))
+    
+    assert _total_rate(schedule, subscribers) == pytest.approx(0.1, rel=1e-6)
+    assert schedule.interval('BUSY', 0.0) < schedule.interval('C0', 0.0)
+    assert schedule.interval('C0', 0.0) <= 2 * 401 / 0.1
@@ -0,0 +1,110 @@
+"""
+Tests for coalescing concurrent fetches of the same course.
+Upstream is replaced by an httpx mock transport that holds every response
+until the test releases it.
+"""
+
+import asyncio
+from pathlib import Path
+
+import httpx
+import pytest
+
+from src.snapshot_cache import SnapshotCache
+from src.vacancy_api import vacancy_api
+
+PAGE = (Path(__file__).parent / 'fixtures' / 'vacancy_sc2103.html').read_text()
+
+
+class Upstream:
+    """Mock NTU endpoint counting requests; responses wait for `release`"""
+    
+    def __init__(self):
+        self.requests = []
+        self.release = asyncio.Event()
+    
+    async def handle(self, request):
+        self.requests.append(request.content.decode())
+        await self.release.wait()
+        return httpx.Response(200, text=PAGE)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Fresh client state talking to a mock upstream, always within service hours"""
+    mock = Upstream()
+    monkeypatch.setattr(vacancy_api, '_async_client', httpx.AsyncClient(transport=httpx.MockTransport(mock.handle)))
+    monkeypatch.setattr(vacancy_api, '_inflight', {})
+    monkeypatch.setattr(vacancy_api, '_breakers', {})
+    monkeypatch.setattr(vacancy_api, 'stats', dict.fromkeys(vacancy_api.stats, 0))
+    monkeypatch.setattr(vacancy_api, 'cache', SnapshotCache(60, 100))
+    monkeypatch.setattr(type(vacancy_api), 'is_service_available', lambda self: (True, 'Service available'))
+    return mock
+
+
+async def _settle():
+    """Let started tasks reach the mock transport"""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fetches_share_one_request(upstream):
+    """Callers asking for a course while it is being fetched wait for that fetch"""
+    callers = [asyncio.create_task(vacancy_api.get_course_snapshot_async(code))
+               for code in ('SC2103', 'sc2103', 'SC2103', 'SC2103')]
+    await _settle()
+    upstream.release.set()
+    results = await asyncio.gather(*callers)
+    
+    assert len(upstream.requests) == 1
+    assert all(result['success'] for result in results)
+    assert all(result['data'] is results[0]['data'] for result in results)
+    assert vacancy_api.get_stats()['coalesced'] == 3
+    assert vacancy_api.get_stats()['in_flight'] == 0
+
+
+@pytest.mark.asyncio
+async def test_later_fetch_is_not_coalesced(upstream):
+    """Once a fetch is done the next caller starts a new one"""
+    upstream.release.set()
+    await vacancy_api.get_course_snapshot_async('SC2103')
+    await vacancy_api.get_course_snapshot_async('SC2103')
+    
+    assert len(upstream.requests) == 2
+    assert vacancy_api.get_stats()['coalesced'] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_fetch(upstream):
+    """A caller giving up leaves the fetch running for the others"""
+    first = asyncio.create_task(vacancy_api.get_course_snapshot_async('SC2103'))
+    second = asyncio.create_task(vacancy_api.get_course_snapshot_async('SC2103'))
+    await _settle()
+    
+    first.cancel()
+    await _settle()
+    upstream.release.set()
+    
+    result = await second
+    assert first.cancelled()
+    assert result['success']
+    assert len(upstream.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_fetch_completes_when_every_caller_cancels(upstream):
+    """A fetch nobody waits for any more still finishes and fills the cache"""
+    caller = asyncio.create_task(vacancy_api.get_course_snapshot_async('SC2103'))
+    await _settle()
+    caller.cancel()
+    await _settle()
+    upstream.release.set()
+    for _ in range(100):
+        if not vacancy_api.get_stats()['in_flight']:
+            break
+        await asyncio.sleep(0.01)
+    
+    cached = await vacancy_api.get_course_snapshot_async('SC2103', max_age=60)
+    assert cached['success']
+    assert len(upstream.requests) == 1
@@ -0,0 +1,136 @@
+"""
+Equivalence tests for the pluggable HTML parser backends.
+Every installed backend must give the same results as BeautifulSoup's
+html.parser, for both the full parse and the vacancy-count fast path.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from src.vacancy_parser import PARSER_BACKENDS, VacancyParser
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+
+HEADER = (
+    "<TR><TH>Index</TH><TH>Vacancy</TH><TH>Waitlist</TH><TH>Class Type</TH>"
+    "<TH>Group</TH><TH>Day</TH><TH>Time</TH><TH>Venue</TH></TR>"
+)
+
+
+def _page(*rows):
+    """Wrap data rows in a vacancy table"""
+    return f"<HTML><BODY><TABLE border>{HEADER}{''.join(rows)}</TABLE></BODY></HTML>"
+
+
+def _row(*cells):
+    """Build a table row from cell contents"""
+    return "<TR>" + "".join(f"<TD>{cell}</TD>" for cell in cells) + "</TR>"
+
+
+NBSP = ('&nbsp;', '&nbsp;', '&nbsp;')
+
+PAGES = {
+    'sc2103_page': (FIXTURES / 'vacancy_sc2103.html').read_text(),
+    'empty_body': '',
+    'whitespace_body': '   \n  ',
+    'no_bordered_table': "<HTML><BODY><TABLE><TR><TD>Course not found</TD></TR></TABLE></BODY></HTML>",
+    'header_only': _page(),
+    'short_rows': _page(
+        _row('10100', '2', '0', 'LEC/STUDIO', 'LE', 'MON', '0830-0920', 'LT1'),
+        _row('10101', '4', '1'),
+        _row('&nbsp;', 'TUT'),
+        _row('10102', '0', '3', 'LAB', 'L1', 'TUE', '1030-1220', 'HWLAB1')
+    ),
+    'nbsp_continuation_rows': _page(
+        _row('10200', '0', '0', 'LEC/STUDIO', 'LE', 'MON', '0830-1020', 'LT2A'),
+        _row(*NBSP, 'TUT', 'T1', 'WED', '1030-1120', 'TR+1'),
+        _row(*NBSP, '&nbsp;', '&nbsp;', '&nbsp;', '&nbsp;', '&nbsp;'),
+        _row('10201', '7', '0', 'LEC/STUDIO', 'LE', 'MON', '0830-1020', 'LT2A'),
+        _row(*NBSP, 'LAB', 'L1', 'THU', '1430-1620', 'HWLAB2')
+    ),
+    'leading_continuation_row': _page(
+        _row(*NBSP, 'TUT', 'T0', 'WED', '1030-1120', 'TR+0'),
+        _row('10300', '1', '2', 'LEC/STUDIO', 'LE', 'MON', '0830-1020', 'LT2A')
+    ),
+    'nested_markup': _page(
+        _row('<B>10400</B>', '<FONT color="red">3</FONT>', ' 1 ', 'LEC/<I>STUDIO</I>',
+             'LE', 'MON', ' 0830-1020 ', 'HWLAB <B>2</B>'),
+        _row(*NBSP, 'TUT', '<SPAN>T4</SPAN>', 'WED', '1030-1120', 'TR+<B>4</B>')
+    ),
+    'non_numeric_counts': _page(
+        _row('10500', 'N/A', '', 'LEC/STUDIO', 'LE', 'MON', '0830-1020', 'LT2A'),
+        _row('10501', '-', '2', 'LEC/STUDIO', 'LE', 'MON', '0830-1020', 'LT2A')
+    ),
+}
+
+BACKENDS = list(PARSER_BACKENDS)
+
+
+def _as_dicts(indexes):
+    """Convert parsed indexes to plain data for comparison"""
+    return None if indexes is None else [index.to_dict() for index in indexes]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('page', PAGES)
+def test_full_parse_matches_html_parser(page, backend):
+    """Every backend gives the same full parse as html.parser"""
+    expected = VacancyParser.parse_vacancy_html(PAGES[page], 'SC2103', backend='html.parser')
+    actual = VacancyParser.parse_vacancy_html(PAGES[page], 'SC2103', backend=backend)
+    assert _as_dicts(actual) == _as_dicts(expected)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('page', PAGES)
+def test_counts_match_html_parser(page, backend):
+    """Every backend gives the same vacancy counts as html.parser"""
+    expected = VacancyParser.parse_vacancy_counts(PAGES[page], 'SC2103', backend='html.parser')
+    actual = VacancyParser.parse_vacancy_counts(PAGES[page], 'SC2103', backend=backend)
+    assert actual == expected
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('page', PAGES)
+def test_counts_match_full_parse(page, backend):
+    """The fast path agrees with the full parse on every index"""
+    indexes = VacancyParser.parse_vacancy_html(PAGES[page], 'SC2103', backend=backend)
+    counts = VacancyParser.parse_vacancy_counts(PAGES[page], 'SC2103', backend=backend)
+    assert counts == {index.index: (index.vacancy, index.waitlist) for index in indexes}
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_sc2103_page(backend):
+    """The SC2103 page parses into its five indexes with all class sessions"""
+    indexes = VacancyParser.parse_vacancy_html(PAGES['sc2103_page'], 'SC2103', backend=backend)
+    
+    assert [index.index for index in indexes] == ['10294', '10295', '10296', '10297', '10298']
+    assert [(index.vacancy, index.waitlist) for index in indexes] == [(0, 5), (12, 0), (3, 0), (0, 0), (1, 21)]
+    assert all(len(index.classes) == 4 for index in indexes)
+    assert indexes[2].classes[3].to_dict() == {
+        'type': 'LAB', 'group': 'TE3', 'day': 'WED', 'time': '1330-1520', 'venue': 'HWLAB2'
+    }
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_edge_cases(backend):
+    """Missing tables give no indexes; short rows and stray continuation rows are skipped"""
+    for page in ('empty_body', 'whitespace_body', 'no_bordered_table', 'header_only'):
+        assert VacancyParser.parse_vacancy_html(PAGES[page], 'SC2103', backend=backend) == []
+        assert VacancyParser.parse_vacancy_counts(PAGES[page], 'SC2103', backend=backend) == {}
+    
+    counts = VacancyParser.parse_vacancy_counts(PAGES['short_rows'], 'SC2103', backend=backend)
+    assert counts == {'10100': (2, 0), '10102': (0, 3)}
+    
+    indexes = VacancyParser.parse_vacancy_html(PAGES['leading_continuation_row'], 'SC2103', backend=backend)
+    assert [(index.index, len(index.classes)) for index in indexes] == [('10300', 1)]
+    
+    indexes = VacancyParser.parse_vacancy_html(PAGES['nbsp_continuation_rows'], 'SC2103', backend=backend)
+    assert [(index.index, len(index.classes)) for index in indexes] == [('10200', 2), ('10201', 2)]
+    
+    nested = VacancyParser.parse_vacancy_html(PAGES['nested_markup'], 'SC2103', backend=backend)[0]
+    assert (nested.index, nested.vacancy, nested.waitlist) == ('10400', 3, 1)
+    assert nested.classes[0].to_dict() == {
+        'type': 'LEC/STUDIO', 'group': 'LE', 'day': 'MON', 'time': '0830-1020', 'venue': 'HWLAB2'
+    }
+    assert nested.classes[1].venue == 'TR+4'